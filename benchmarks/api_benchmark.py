@@ -0,0 +1,225 @@
+"""
+Benchmark for the HTTP API in modules/api.py.
+
+Starts the API on a generated database, unless --port points at one that
+is already running, and has many simulated patients use it at once over
+keep-alive connections. Most requests read their moods, journal and
+appointments, revalidating with If-None-Match, and some record a mood.
+Reports the requests per second and the latency percentiles of each
+endpoint.
+
+Run from the repository root with:
+    python -m benchmarks.api_benchmark [--clients 32] [--requests 200]
+    python -m benchmarks.api_benchmark --cache-seconds 0 --no-etags
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+from benchmarks.load_test import active_patients, free_port, peak_memory_mb
+from database.generator import build_database
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Endpoints requested by the simulated patients, and how often
+REQUEST_MIX = (
+    ("GET", "/moods", 40),
+    ("GET", "/journals", 25),
+    ("GET", "/appointments", 25),
+    ("POST", "/moods", 10),
+)
+
+
+class Client:
+    def __init__(self, host: str, port: int, use_etags: bool) -> None:
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+        self.token = None
+        self.use_etags = use_etags
+        self.etags: dict[str, str] = {}
+
+    def request(self, method: str, path: str, body: dict = None) -> tuple[int, bytes]:
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if method == "GET" and self.use_etags and path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+
+        self.connection.request(
+            method, path, json.dumps(body) if body is not None else None, headers
+        )
+        response = self.connection.getresponse()
+        data = response.read()
+        if response.getheader("ETag"):
+            self.etags[path] = response.getheader("ETag")
+        return response.status, data
+
+    def log_in(self, username: str, password: str) -> None:
+        status, data = self.request(
+            "POST", "/login", {"username": username, "password": password}
+        )
+        if status != 200:
+            raise RuntimeError(f"Could not log in as {username}: {data}")
+        self.token = json.loads(data)["token"]
+
+
+def simulate_patient(
+    host: str,
+    port: int,
+    username: str,
+    password: str,
+    requests: int,
+    use_etags: bool,
+    seed: int,
+    results: list,
+) -> None:
+    rng = random.Random(seed)
+    client = Client(host, port, use_etags)
+    endpoints = [(method, path) for method, path, _ in REQUEST_MIX]
+    weights = [weight for _, _, weight in REQUEST_MIX]
+    try:
+        client.log_in(username, password)
+        for _ in range(requests):
+            method, path = rng.choices(endpoints, weights)[0]
+            body = {"mood": rng.randint(1, 6), "text": "Benchmark"}
+            started = time.perf_counter()
+            status, _ = client.request(method, path, body if method == "POST" else None)
+            results.append((f"{method} {path}", status, time.perf_counter() - started))
+    except (OSError, RuntimeError, http.client.HTTPException) as e:
+        results.append(("error", 0, 0))
+        print(f"{username}: {e}", file=sys.stderr)
+    finally:
+        client.connection.close()
+
+
+def start_api(database: str, port: int, pool_size: int, cache_seconds: float):
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "modules.api",
+            "--port",
+            str(port),
+            "--database",
+            database,
+            "--pool-size",
+            str(pool_size),
+            "--cache-seconds",
+            str(cache_seconds),
+        ],
+        cwd=REPOSITORY_PATH,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = server.stdout.readline()
+    if not line.startswith("Serving the Breeze API"):
+        server.kill()
+        raise RuntimeError(f"The API did not start: {line}")
+    return server
+
+
+def report(results: list, elapsed: float, memory: float) -> bool:
+    errors = sum(
+        1 for endpoint, status, _ in results if endpoint == "error" or status >= 400
+    )
+    latencies = defaultdict(list)
+    statuses = Counter()
+    for endpoint, status, latency in results:
+        if endpoint != "error":
+            latencies[endpoint].append(latency)
+            statuses[status] += 1
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"Requests            {total:8}  ({errors} failed)")
+    print(f"Requests per second {total / elapsed:8.1f}")
+    print(f"Not modified (304)  {statuses[304] / max(total, 1):8.1%}")
+    if memory:
+        print(f"Server peak memory  {memory:8.1f} MB")
+
+    print(f"\n{'Endpoint':<18}{'count':>7}{'median':>10}{'p99':>10}{'max':>10}  (ms)")
+    for endpoint, values in sorted(latencies.items()):
+        if len(values) < 2:
+            continue
+        p99 = statistics.quantiles(values, n=100, method="inclusive")[98]
+        print(
+            f"{endpoint:<18}{len(values):7}{statistics.median(values) * 1000:10.1f}"
+            + f"{p99 * 1000:10.1f}{max(values) * 1000:10.1f}"
+        )
+    return errors == 0
+
+
+def run(args: argparse.Namespace) -> bool:
+    with tempfile.TemporaryDirectory() as directory:
+        server = None
+        database = args.database
+        port = args.port
+        if not port:
+            database = os.path.join(directory, "api_benchmark.db")
+            build_database(
+                database, clinicians=max(1, args.patients // 20), patients=args.patients
+            ).close()
+            port = free_port()
+            server = start_api(database, port, args.pool_size, args.cache_seconds)
+
+        try:
+            patients = active_patients(database)
+            results = []
+            threads = [
+                threading.Thread(
+                    target=simulate_patient,
+                    args=(
+                        args.host,
+                        port,
+                        *patients[index % len(patients)],
+                        args.requests,
+                        not args.no_etags,
+                        index,
+                        results,
+                    ),
+                )
+                for index in range(args.clients)
+            ]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            memory = peak_memory_mb(server.pid) if server else 0
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+    return report(results, elapsed, memory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent patients")
+    parser.add_argument(
+        "--requests", type=int, default=200, help="Requests per patient"
+    )
+    parser.add_argument(
+        "--patients", type=int, default=200, help="Patients in the generated database"
+    )
+    parser.add_argument("--pool-size", type=int, default=16)
+    parser.add_argument("--cache-seconds", type=float, default=5)
+    parser.add_argument(
+        "--no-etags", action="store_true", help="Don't send If-None-Match"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="Benchmark an API already running")
+    parser.add_argument(
+        "--database", default="breeze.db", help="Database of the running API"
+    )
+    args = parser.parse_args()
+    sys.exit(0 if run(args) else 1)
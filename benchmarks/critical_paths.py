@@ -0,0 +1,284 @@
+"""
+Benchmark of the critical paths at several database sizes.
+
+Builds generated databases (see database/generator.py) of about 1k, 100k
+and 10M mood, journal and appointment entries, and times on each the paths
+every screen depends on: building the streak leaderboard, a clinician's
+patient list, free appointment slots, the engagement report, opening the
+admin screens and logging in. Results are printed and can be saved as
+JSON, and two saved runs compared to flag the paths that got slower.
+
+Generating the 10M database takes several minutes, so it is only built
+when asked for, and --data-dir keeps databases to reuse in later runs.
+
+Run from the repository root with:
+    python -m benchmarks.critical_paths [--scales 1k,100k] [--repeat 5]
+    python -m benchmarks.critical_paths --scales 10M --data-dir bench_data
+    python -m benchmarks.critical_paths --output new.json --baseline old.json
+    python -m benchmarks.critical_paths --compare old.json new.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from typing import Any
+
+from database.generator import build_database
+from database.setup import Database
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Generated patients have about this many entries a year
+ENTRIES_PER_PATIENT = 345
+SCALES = {"1k": 1_000, "100k": 100_000, "10M": 10_000_000}
+TABLES = ("Users", "MoodEntries", "JournalEntries", "Appointments")
+
+
+def database_for(scale: str, directory: str) -> str:
+    """The path of a database of the given scale, generating it if needed"""
+    path = os.path.join(directory, f"critical_paths_{scale}.db")
+    if os.path.exists(path):
+        return path
+
+    patients = max(1, SCALES[scale] // ENTRIES_PER_PATIENT)
+    print(f"Generating the {scale} database ({patients} patients)...", flush=True)
+    started = time.perf_counter()
+    build_database(path, clinicians=max(1, patients // 20), patients=patients).close()
+    print(f"Generated in {time.perf_counter() - started:.1f} s", flush=True)
+    return path
+
+
+def busiest_user(db: Database, role: str) -> dict[str, Any]:
+    """The login details of the user of a role with the most patients or moods"""
+    column = "clinician_id" if role == "clinician" else "user_id"
+    table = "Patients" if role == "clinician" else "MoodEntries"
+    return db.cursor.execute(
+        f"""
+        SELECT user_id, username, first_name, surname, email, is_active
+        FROM Users
+        WHERE user_id = (
+            SELECT {column} FROM {table} WHERE {column} IS NOT NULL
+            GROUP BY {column} ORDER BY COUNT(*) DESC LIMIT 1
+        )
+        """
+    ).fetchone()
+
+
+def next_weekday() -> datetime:
+    day = datetime.now() + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def critical_paths(db: Database) -> dict[str, Callable[[], Any]]:
+    """The paths to time, as functions of no arguments"""
+    # Screens are imported here, as importing them isn't what's measured
+    from modules.admin import Admin
+    from modules.appointments import (
+        display_appointment_engagement,
+        get_available_slots,
+    )
+    from modules.clinician import Clinician
+    from modules.login import login
+    from modules.streaks_service import StreakService
+
+    clinician = Clinician(db, **busiest_user(db, "clinician"))
+    patient = busiest_user(db, "patient")
+    admin = db.cursor.execute(
+        "SELECT user_id, username, first_name, surname, email, is_active "
+        + "FROM Users WHERE role = 'admin' LIMIT 1"
+    ).fetchone() or {
+        "user_id": 0,
+        "username": "admin",
+        "first_name": "Bench",
+        "surname": "Admin",
+        "email": "admin@breeze.example",
+        "is_active": True,
+    }
+    day = next_weekday()
+
+    def log_in() -> Any:
+        # Generated users have blank passwords
+        with contextlib.redirect_stdout(io.StringIO()):
+            sys.stdin = io.StringIO(f"{patient['username']}\n\n")
+            try:
+                return login(db)
+            finally:
+                sys.stdin = sys.__stdin__
+
+    def engagement() -> Any:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return display_appointment_engagement(db, "clinician")
+
+    return {
+        "StreakService()": lambda: StreakService(db),
+        "Clinician.get_all_patients": clinician.get_all_patients,
+        "get_available_slots": lambda: get_available_slots(db, clinician.user_id, day),
+        "display_appointment_engagement": engagement,
+        "Admin()": lambda: Admin(db, **admin),
+        "login": log_in,
+    }
+
+
+def time_paths(path: str, repeat: int) -> dict[str, Any]:
+    db = Database(path, create_default_users=False)
+    try:
+        rows = {
+            table: db.cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+            for table in TABLES
+        }
+        timings = {}
+        for name, function in critical_paths(db).items():
+            # The first call warms the page cache and is left out
+            function()
+            seconds = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                function()
+                seconds.append(time.perf_counter() - started)
+            timings[name] = {
+                "median_ms": round(statistics.median(seconds) * 1000, 3),
+                "min_ms": round(min(seconds) * 1000, 3),
+                "max_ms": round(max(seconds) * 1000, 3),
+            }
+    finally:
+        db.close()
+    return {"rows": rows, "timings": timings}
+
+
+def git_commit() -> str:
+    """The commit benchmarked, or "unknown" outside a git checkout"""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPOSITORY_PATH,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except OSError:
+        return "unknown"
+    return result.stdout.strip() if result.returncode == 0 else "unknown"
+
+
+def print_results(results: dict[str, Any]) -> None:
+    for scale, result in results["scales"].items():
+        rows = ", ".join(f"{table} {count}" for table, count in result["rows"].items())
+        print(f"\n{scale}: {rows}")
+        print(f"  {'path':<34}{'median':>10}{'min':>10}{'max':>10}  (ms)")
+        for name, timing in result["timings"].items():
+            print(
+                f"  {name:<34}{timing['median_ms']:10.2f}"
+                + f"{timing['min_ms']:10.2f}{timing['max_ms']:10.2f}"
+            )
+
+
+def compare(
+    old: dict[str, Any], new: dict[str, Any], threshold: float, min_ms: float
+) -> bool:
+    """
+    Prints the change in time of every path measured in both runs, and
+    returns False if any got slower by more than threshold (a fraction) and
+    min_ms. The fastest runs are compared, as the least noisy.
+    """
+    print(f"\nCompared with {old.get('commit') or 'the baseline'}:")
+    print(f"  {'scale':<6}{'path':<34}{'before':>10}{'after':>10}{'change':>9}")
+    regressions = 0
+    for scale, result in new["scales"].items():
+        before = old["scales"].get(scale, {}).get("timings", {})
+        for name, timing in result["timings"].items():
+            if name not in before:
+                continue
+            old_ms = before[name]["min_ms"]
+            new_ms = timing["min_ms"]
+            change = (new_ms - old_ms) / old_ms if old_ms else 0
+            slower = change > threshold and new_ms - old_ms > min_ms
+            regressions += slower
+            print(
+                f"  {scale:<6}{name:<34}{old_ms:10.2f}{new_ms:10.2f}{change:+9.1%}"
+                + ("  REGRESSION" if slower else "")
+            )
+    if regressions:
+        print(f"\nFAIL: slower than the baseline on {regressions} paths")
+    return not regressions
+
+
+def run(args: argparse.Namespace) -> bool:
+    if args.compare:
+        runs = []
+        for path in args.compare:
+            with open(path) as file:
+                runs.append(json.load(file))
+        return compare(*runs, args.threshold, args.min_ms)
+
+    scales = args.scales.split(",")
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        print(f"Unknown scales: {', '.join(unknown)}. Choose from {', '.join(SCALES)}.")
+        return False
+
+    results = {
+        "commit": git_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        data_dir = args.data_dir or directory
+        os.makedirs(data_dir, exist_ok=True)
+        for scale in scales:
+            results["scales"][scale] = time_paths(
+                database_for(scale, data_dir), args.repeat
+            )
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nSaved to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as file:
+            return compare(json.load(file), results, args.threshold, args.min_ms)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scales", default="1k,100k", help=f"Comma separated, of {', '.join(SCALES)}"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--data-dir", help="Keep the generated databases here, to reuse them"
+    )
+    parser.add_argument("--output", help="Save the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare the results with a saved run")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two saved runs"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Slowdown that counts as a regression, as a fraction",
+    )
+    parser.add_argument(
+        "--min-ms",
+        type=float,
+        default=5,
+        help="Ignore slowdowns smaller than this, as noise",
+    )
+    args = parser.parse_args()
+    sys.exit(0 if run(args) else 1)
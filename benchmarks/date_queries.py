@@ -0,0 +1,122 @@
+"""
+Regression benchmark for date filtered queries.
+
+Builds a throwaway database with a year of daily moods and journals for a
+number of patients, then checks with EXPLAIN QUERY PLAN that the range
+predicates from date_utils use the (user_id, date) indexes, and times them
+against the old DATE(date) = ? form.
+
+Run from the repository root with:
+    python -m benchmarks.date_queries [--patients 200] [--days 365]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from database.setup import Database
+from modules.utilities.date_utils import date_range_condition, get_date_range
+
+QUERIES = {
+    "MoodEntries": ("idx_mood_entries_user_date", "SELECT mood FROM MoodEntries"),
+    "JournalEntries": (
+        "idx_journal_entries_user_date",
+        "SELECT text FROM JournalEntries",
+    ),
+}
+
+
+def fill_database(db: Database, patients: int, days: int) -> None:
+    """Adds patients with one mood and one journal entry per day"""
+    first_id = db.cursor.execute("SELECT MAX(user_id) FROM Users").fetchone() + 1
+    user_ids = range(first_id, first_id + patients)
+    db.cursor.executemany(
+        "INSERT INTO Users VALUES(?, ?, '', 'Bench', 'Patient', ?, 'patient', 1)",
+        [
+            (user_id, f"bench{user_id}", f"bench{user_id}@email.com")
+            for user_id in user_ids
+        ],
+    )
+
+    today = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    for user_id in user_ids:
+        dates = [today - timedelta(days=day) for day in range(days)]
+        db.cursor.executemany(
+            "INSERT INTO MoodEntries (user_id, date, mood, text) VALUES (?, ?, 4, 'ok')",
+            [(user_id, date.strftime("%Y-%m-%d")) for date in dates],
+        )
+        db.cursor.executemany(
+            "INSERT INTO JournalEntries (user_id, date, text) VALUES (?, ?, 'entry')",
+            [(user_id, date.strftime("%Y-%m-%d %H:%M:%S")) for date in dates],
+        )
+    db.connection.commit()
+    db.cursor.execute("ANALYZE")
+
+
+def query_plan(db: Database, query: str, params: tuple) -> str:
+    rows = db.cursor.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    return " | ".join(row["detail"] for row in rows)
+
+
+def time_query(db: Database, query: str, params: tuple, repeat: int) -> float:
+    """Returns the mean time of a query in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        db.cursor.execute(query, params).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(patients: int, days: int, repeat: int) -> bool:
+    with tempfile.TemporaryDirectory() as directory:
+        db = Database(os.path.join(directory, "bench.db"))
+        try:
+            fill_database(db, patients, days)
+            user_id = db.cursor.execute("SELECT MAX(user_id) FROM Users").fetchone()
+            day = datetime.now() - timedelta(days=days // 2)
+
+            passed = True
+            for table, (index, select) in QUERIES.items():
+                old_query = f"{select} WHERE user_id = ? AND DATE(date) = ?"
+                old_params = (user_id, day.strftime("%Y-%m-%d"))
+                new_query = f"{select} WHERE user_id = ? AND {date_range_condition()}"
+                new_params = (user_id, *get_date_range(day))
+
+                # Both forms must find the same rows
+                same_rows = (
+                    db.cursor.execute(old_query, old_params).fetchall()
+                    == db.cursor.execute(new_query, new_params).fetchall()
+                )
+                plan = query_plan(db, new_query, new_params)
+                uses_range = index in plan and "date>?" in plan and "date<?" in plan
+
+                print(f"\n{table}")
+                print(
+                    f"  DATE(date) = ?   {time_query(db, old_query, old_params, repeat):8.3f} ms"
+                )
+                print(
+                    f"  range predicate  {time_query(db, new_query, new_params, repeat):8.3f} ms"
+                )
+                print(f"  plan: {plan}")
+
+                if not same_rows:
+                    print("  FAIL: range predicate returned different rows")
+                    passed = False
+                if not uses_range:
+                    print(f"  FAIL: range predicate does not use {index} on date")
+                    passed = False
+
+            return passed
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.patients, args.days, args.repeat) else 1)
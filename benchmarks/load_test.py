@@ -0,0 +1,222 @@
+"""
+Load test for the session server in modules/server.py.
+
+Starts a server on a generated database, unless --port points at one that
+is already running, and connects many simulated patients at once. Each of
+them logs in, waits for their dashboard, logs out and quits, --rounds
+times over. Reports the sessions completed per second, the latency of each
+step (from sending a line to receiving the next prompt) and the memory
+used by the server.
+
+Run from the repository root with:
+    python -m benchmarks.load_test [--sessions 200] [--rounds 3]
+    python -m benchmarks.load_test --port 8023 --database breeze.db
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from database.generator import build_database
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT = "Your selection: "
+STEP_TIMEOUT = 60
+
+
+class Client:
+    """One simulated user, talking to the server like a telnet client"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.received = ""
+
+    async def expect(self, text: str) -> str:
+        """Reads until text arrives, returns everything received up to it"""
+        while text not in self.received:
+            data = await asyncio.wait_for(self.reader.read(4096), STEP_TIMEOUT)
+            if not data:
+                raise ConnectionError(f"Disconnected while waiting for {text!r}")
+            self.received += data.decode(errors="replace")
+        screen, self.received = self.received.split(text, 1)
+        return screen
+
+    async def send(self, line: str, then_expect: str) -> tuple[float, str]:
+        """Sends a line, returns the seconds until the next prompt and the screen"""
+        started = time.perf_counter()
+        self.writer.write(line.encode() + b"\r\n")
+        screen = await self.expect(then_expect)
+        return time.perf_counter() - started, screen
+
+
+async def patient_session(
+    host: str, port: int, username: str, password: str, latencies: dict
+) -> None:
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    client = Client(reader, writer)
+    try:
+        await client.expect(PROMPT)
+        latencies["menu"].append(time.perf_counter() - started)
+
+        await client.send("1", "Your username: ")
+        await client.send(username, "Your password: ")
+        elapsed, screen = await client.send(password, PROMPT)
+        if "Hello, " not in screen:
+            raise RuntimeError(f"Could not log in as {username}")
+        latencies["log in"].append(elapsed)
+
+        latencies["log out"].append((await client.send("0", PROMPT))[0])
+        latencies["quit"].append((await client.send("0", "Goodbye!"))[0])
+    finally:
+        writer.close()
+
+
+async def simulate(
+    host: str, port: int, patients: list[tuple[str, str]], sessions: int, rounds: int
+) -> tuple[dict[str, list[float]], int, float]:
+    latencies = defaultdict(list)
+    failures = 0
+
+    async def patient(index: int) -> None:
+        nonlocal failures
+        username, password = patients[index % len(patients)]
+        for _ in range(rounds):
+            try:
+                await patient_session(host, port, username, password, latencies)
+            except (OSError, RuntimeError, asyncio.TimeoutError) as e:
+                failures += 1
+                print(f"{username}: {e}", file=sys.stderr)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(patient(index) for index in range(sessions)))
+    return latencies, failures, time.perf_counter() - started
+
+
+def active_patients(database: str) -> list[tuple[str, str]]:
+    connection = sqlite3.connect(database)
+    try:
+        return connection.execute(
+            """
+            SELECT username, password FROM Users
+            WHERE role = 'patient' AND is_active
+            ORDER BY user_id
+            """
+        ).fetchall()
+    finally:
+        connection.close()
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(database: str, port: int, max_sessions: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "modules.server",
+            "--port",
+            str(port),
+            "--database",
+            database,
+            "--max-sessions",
+            str(max_sessions),
+        ],
+        cwd=REPOSITORY_PATH,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = server.stdout.readline()
+    if not line.startswith("Serving Breeze"):
+        server.kill()
+        raise RuntimeError(f"The server did not start: {line}")
+    return server
+
+
+def peak_memory_mb(pid: int) -> float:
+    """The peak resident memory of a process, on Linux only"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0
+
+
+def report(
+    latencies: dict[str, list[float]], failures: int, elapsed: float, memory: float
+) -> None:
+    completed = len(latencies["quit"])
+    print(f"Sessions completed  {completed:8}  ({failures} failed)")
+    print(f"Sessions per second {completed / elapsed:8.1f}")
+    if memory:
+        print(f"Server peak memory  {memory:8.1f} MB")
+    print(f"\n{'Step':<10}{'median':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    for step, values in latencies.items():
+        if len(values) < 2:
+            continue
+        percentiles = statistics.quantiles(values, n=100, method="inclusive")
+        print(
+            f"{step:<10}{statistics.median(values) * 1000:10.1f}"
+            + f"{percentiles[94] * 1000:10.1f}{percentiles[98] * 1000:10.1f}"
+            + f"{max(values) * 1000:10.1f}"
+        )
+
+
+def run(args: argparse.Namespace) -> bool:
+    with tempfile.TemporaryDirectory() as directory:
+        server = None
+        database = args.database
+        port = args.port
+        if not port:
+            database = os.path.join(directory, "load_test.db")
+            build_database(
+                database, clinicians=max(1, args.patients // 20), patients=args.patients
+            ).close()
+            port = free_port()
+            server = start_server(database, port, args.sessions)
+
+        try:
+            patients = active_patients(database)
+            latencies, failures, elapsed = asyncio.run(
+                simulate(args.host, port, patients, args.sessions, args.rounds)
+            )
+            memory = peak_memory_mb(server.pid) if server else 0
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+    report(latencies, failures, elapsed, memory)
+    return failures == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=200, help="Concurrent users")
+    parser.add_argument("--rounds", type=int, default=3, help="Sessions per user")
+    parser.add_argument(
+        "--patients", type=int, default=200, help="Patients in the generated database"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="Test a server already running")
+    parser.add_argument(
+        "--database", default="breeze.db", help="Database of the running server"
+    )
+    args = parser.parse_args()
+    sys.exit(0 if run(args) else 1)
@@ -0,0 +1,110 @@
+"""
+Startup time benchmark for main.py.
+
+Launches the app in a subprocess with `python -X importtime`, measures the
+time until the first menu prompt is printed, then quits. The first run uses
+a fresh database and the others a warm one. It fails if modules that should
+only be loaded on demand, such as pandas or the role screens, are imported
+before the prompt.
+
+Run from the repository root with:
+    python -m benchmarks.startup_time [--repeat 5] [--max-ms 500]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "main.py")
+FIRST_PROMPT = "Please select an option to continue"
+LAZY_MODULES = (
+    "pandas",
+    "numpy",
+    "smtplib",
+    "modules.admin",
+    "modules.clinician",
+    "modules.patient",
+)
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def time_to_first_prompt(directory: str) -> tuple[float, str]:
+    """
+    Returns the seconds until main.py printed its first prompt, and the
+    -X importtime report of the imports done before it
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-X", "importtime", "-u", MAIN_PATH],
+        cwd=directory,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env={**os.environ, "TERM": os.environ.get("TERM", "dumb")},
+        text=True,
+    )
+    output = ""
+    while FIRST_PROMPT not in output:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError(f"main.py exited before the first prompt:\n{output}")
+        output += line
+    elapsed = time.perf_counter() - started
+
+    # Quit from the menu, everything imported so far was needed for the prompt
+    _, importtime = process.communicate("0\n", timeout=30)
+    return elapsed, importtime
+
+
+def parse_importtime(report: str) -> dict[str, tuple[int, int]]:
+    """Returns the self and cumulative microseconds of each imported module"""
+    modules = {}
+    for line in report.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return modules
+
+
+def run(repeat: int, max_ms: float, top: int) -> bool:
+    with tempfile.TemporaryDirectory() as directory:
+        cold, importtime = time_to_first_prompt(directory)
+        warm = [time_to_first_prompt(directory)[0] for _ in range(repeat)]
+
+    modules = parse_importtime(importtime)
+    total = sum(own for own, _ in modules.values())
+    warm_ms = statistics.median(warm) * 1000
+
+    print(f"Time to first prompt, new database  {cold * 1000:8.1f} ms")
+    print(f"Time to first prompt, warm (median) {warm_ms:8.1f} ms")
+    print(f"Import time before the prompt       {total / 1000:8.1f} ms")
+    print(f"\nSlowest imports (cumulative, {len(modules)} modules):")
+    slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (_, cumulative) in slowest[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    passed = True
+    eager = [name for name in LAZY_MODULES if name in modules]
+    if eager:
+        print(f"\nFAIL: imported before the first prompt: {', '.join(eager)}")
+        passed = False
+    if max_ms and warm_ms > max_ms:
+        print(f"\nFAIL: warm startup took longer than {max_ms} ms")
+        passed = False
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--max-ms", type=float, default=0, help="Fail if warm startup is slower"
+    )
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports shown")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.repeat, args.max_ms, args.top) else 1)
@@ -0,0 +1,357 @@
+"""
+Generates synthetic Breeze data for load testing and benchmarks.
+
+Creates clinicians, patients and a history of daily moods, journals and
+appointments (weekdays, in the bookable hours only), inserted in chunks
+with executemany. The same seed and end date always produce the same data.
+
+From the repository root:
+    python -m database.generator load.db --clinicians 100 --patients 10000 --years 3
+"""
+
+import argparse
+import random
+import time
+from collections.abc import Iterable, Iterator
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Union
+
+from database.setup import Database, diagnoses
+from modules.appointment_service import APPOINTMENT_HOURS
+
+FIRST_NAMES = (
+    "Olivia", "Amelia", "Isla", "Ava", "Mia", "Grace", "Freya", "Lily", "Sophia",
+    "Ella", "Noah", "Oliver", "George", "Leo", "Arthur", "Harry", "Oscar",
+    "Jack", "Charlie", "Muhammad", "Aisha", "Priya", "Chen", "Mateo", "Zara",
+)  # fmt: skip
+SURNAMES = (
+    "Smith", "Jones", "Taylor", "Brown", "Williams", "Wilson", "Johnson",
+    "Davies", "Patel", "Robinson", "Wright", "Thompson", "Evans", "Walker",
+    "White", "Roberts", "Green", "Hall", "Khan", "Lewis", "Clarke", "Wood",
+)  # fmt: skip
+MOOD_COMMENTS = {
+    1: ("Couldn't get out of bed.", "Everything feels pointless.", None),
+    2: ("Feeling sad today.", "Argument with family.", "Lonely.", None),
+    3: ("Tired and low.", "Work was stressful.", "Didn't sleep well.", None),
+    4: ("An ordinary day.", "Went for a walk.", "Feeling okay.", None),
+    5: ("Nice time with friends.", "Productive day.", "Enjoyed the sunshine.", None),
+    6: ("Great day!", "Got some good news.", "Feeling on top of the world.", None),
+}
+JOURNAL_ENTRIES = (
+    "Today I tried the breathing exercise and it helped a little.",
+    "I had trouble sleeping again and my thoughts kept racing.",
+    "Met up with an old friend, it was good to talk to someone.",
+    "Work has been overwhelming this week, I need to set boundaries.",
+    "I noticed I feel better on the days I go outside.",
+    "Felt anxious before the appointment but it went well.",
+    "Trying to keep a routine: wake up, walk, cook, read.",
+    "Some days are harder than others. Today was one of them.",
+)
+PATIENT_NOTES = (
+    "Would like to review my medication.",
+    "Struggling with sleep.",
+    "Follow up from last session.",
+    "Feeling more anxious lately.",
+    None,
+)
+CLINICIAN_NOTES = (
+    "Patient engaged well, continue current plan.",
+    "Discussed coping strategies, review in two weeks.",
+    "Mood improving, reduce frequency of sessions.",
+    "Concerned about low mood, increase contact.",
+)
+PAST_STATUSES = (
+    ("Attended", "Did Not Attend", "Cancelled By Patient"),
+    ("Cancelled By Clinician", "Rejected"),
+)
+
+
+def insert_chunks(
+    db: Database, query: str, rows: Iterable[tuple], chunk_size: int
+) -> int:
+    """
+    Inserts rows with executemany, committing every chunk_size rows so only
+    one chunk is held in memory. Returns the number of rows inserted.
+    """
+    total = 0
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        db.cursor.executemany(query, chunk)
+        db.connection.commit()
+        total += len(chunk)
+    return total
+
+
+def generate_users(
+    rng: random.Random, first_id: int, clinicians: int, patients: int
+) -> tuple[list[tuple], list[tuple], dict[int, list[int]]]:
+    """
+    Returns the Users and Patients rows and each clinician's caseload.
+    Clinicians come first, then patients; passwords are left blank.
+    """
+    users = []
+    patient_rows = []
+    clinician_ids = list(range(first_id, first_id + clinicians))
+    caseloads = {clinician_id: [] for clinician_id in clinician_ids}
+
+    for user_id in clinician_ids:
+        users.append(
+            (
+                user_id,
+                f"gen_clinician{user_id}",
+                "",
+                rng.choice(FIRST_NAMES),
+                rng.choice(SURNAMES),
+                f"gen_clinician{user_id}@breeze.example",
+                "clinician",
+                True,
+            )
+        )
+
+    for user_id in range(first_id + clinicians, first_id + clinicians + patients):
+        users.append(
+            (
+                user_id,
+                f"gen_patient{user_id}",
+                "",
+                rng.choice(FIRST_NAMES),
+                rng.choice(SURNAMES),
+                f"gen_patient{user_id}@breeze.example",
+                "patient",
+                rng.random() > 0.05,
+            )
+        )
+        # A few patients are still waiting to be assigned a clinician
+        clinician_id = (
+            rng.choice(clinician_ids) if clinician_ids and rng.random() > 0.05 else None
+        )
+        if clinician_id:
+            caseloads[clinician_id].append(user_id)
+        patient_rows.append(
+            (
+                user_id,
+                f"emergency{user_id}@breeze.example",
+                datetime(rng.randint(1940, 2006), rng.randint(1, 12), rng.randint(1, 28)),
+                rng.choice(diagnoses),
+                clinician_id,
+            )
+        )
+
+    return users, patient_rows, caseloads
+
+
+def generate_moods(
+    rng: random.Random, patient_ids: list[int], days: list[date], mood_rate: float
+) -> Iterator[tuple]:
+    """
+    Yields at most one mood per patient per day, following a random walk
+    so each patient has good and bad spells
+    """
+    for user_id in patient_ids:
+        mood = rng.randint(2, 5)
+        engagement = rng.uniform(mood_rate / 2, min(1, mood_rate * 1.5))
+        for day in days:
+            mood = min(6, max(1, mood + rng.choice((-1, 0, 0, 0, 1))))
+            if rng.random() < engagement:
+                yield (
+                    user_id,
+                    day.strftime("%Y-%m-%d"),
+                    mood,
+                    rng.choice(MOOD_COMMENTS[mood]) or "No comment provided.",
+                )
+
+
+def generate_journals(
+    rng: random.Random, patient_ids: list[int], days: list[date], journal_rate: float
+) -> Iterator[tuple]:
+    """Yields journal entries written at a random time on some days"""
+    for user_id in patient_ids:
+        for day in days:
+            if rng.random() < journal_rate:
+                written = datetime.combine(day, datetime.min.time()) + timedelta(
+                    seconds=rng.randint(7 * 3600, 23 * 3600)
+                )
+                yield (
+                    user_id,
+                    written.strftime("%Y-%m-%d %H:%M:%S"),
+                    rng.choice(JOURNAL_ENTRIES),
+                )
+
+
+def generate_appointments(
+    rng: random.Random,
+    caseloads: dict[int, list[int]],
+    start: date,
+    end: date,
+    now: datetime,
+    visits_per_month: float,
+) -> Iterator[tuple]:
+    """
+    Yields appointments for each clinician's caseload on weekdays in the
+    bookable hours, booking each slot at most once so there are no clashes.
+    Appointments run a month past the end date so some are upcoming.
+    """
+    # Roughly 21 working days a month, each with len(APPOINTMENT_HOURS) slots
+    slots_per_month = 21 * len(APPOINTMENT_HOURS)
+
+    for clinician_id, patient_ids in caseloads.items():
+        if not patient_ids:
+            continue
+        booking_rate = min(1, len(patient_ids) * visits_per_month / slots_per_month)
+        day = start
+        while day <= end + timedelta(days=30):
+            if day.weekday() < 5:
+                for hour in APPOINTMENT_HOURS:
+                    if rng.random() >= booking_rate:
+                        continue
+                    slot = datetime(day.year, day.month, day.day, hour)
+                    if slot < now:
+                        status = rng.choices(PAST_STATUSES[0], weights=(80, 12, 8))[0]
+                        if rng.random() < 0.08:
+                            status = rng.choice(PAST_STATUSES[1])
+                    else:
+                        status = rng.choices(
+                            ("Pending", "Confirmed", "Cancelled By Patient"),
+                            weights=(35, 55, 10),
+                        )[0]
+                    clinician_notes = (
+                        rng.choice(CLINICIAN_NOTES)
+                        if status == "Attended" and rng.random() < 0.8
+                        else None
+                    )
+                    yield (
+                        rng.choice(patient_ids),
+                        clinician_id,
+                        slot,
+                        status,
+                        rng.choice(PATIENT_NOTES),
+                        clinician_notes,
+                    )
+            day += timedelta(days=1)
+
+
+def generate(
+    db: Database,
+    clinicians: int = 10,
+    patients: int = 200,
+    days: int = 365,
+    seed: int = 0,
+    end_date: Union[date, None] = None,
+    mood_rate: float = 0.7,
+    journal_rate: float = 0.2,
+    visits_per_month: float = 1.5,
+    chunk_size: int = 10000,
+) -> dict[str, int]:
+    """
+    Adds generated users and days of history ending on end_date (today by
+    default) to the database, after any existing users. Returns the number
+    of rows inserted into each table.
+    """
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=days - 1)
+    all_days = [start_date + timedelta(days=i) for i in range(days)]
+    # Appointments from the end date on are upcoming
+    now = datetime.combine(end_date, datetime.min.time())
+
+    # Separate generators so changing one table's rules doesn't change the others
+    first_id = (db.cursor.execute("SELECT MAX(user_id) FROM Users").fetchone() or 0) + 1
+    users, patient_rows, caseloads = generate_users(
+        random.Random(f"{seed}-users"), first_id, clinicians, patients
+    )
+    patient_ids = [row[0] for row in patient_rows]
+
+    counts = {
+        "Users": insert_chunks(
+            db, "INSERT INTO Users VALUES(?, ?, ?, ?, ?, ?, ?, ?)", users, chunk_size
+        ),
+        "Patients": insert_chunks(
+            db, "INSERT INTO Patients VALUES(?, ?, ?, ?, ?)", patient_rows, chunk_size
+        ),
+    }
+    counts["MoodEntries"] = insert_chunks(
+        db,
+        "INSERT INTO MoodEntries (user_id, date, mood, text) VALUES (?, ?, ?, ?)",
+        generate_moods(random.Random(f"{seed}-moods"), patient_ids, all_days, mood_rate),
+        chunk_size,
+    )
+    counts["JournalEntries"] = insert_chunks(
+        db,
+        "INSERT INTO JournalEntries (user_id, date, text) VALUES (?, ?, ?)",
+        generate_journals(
+            random.Random(f"{seed}-journals"), patient_ids, all_days, journal_rate
+        ),
+        chunk_size,
+    )
+    counts["Appointments"] = insert_chunks(
+        db,
+        """
+        INSERT INTO Appointments
+        (user_id, clinician_id, date, status, patient_notes, clinician_notes)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        generate_appointments(
+            random.Random(f"{seed}-appointments"),
+            caseloads,
+            start_date,
+            end_date,
+            now,
+            visits_per_month,
+        ),
+        chunk_size,
+    )
+    db.cursor.execute("ANALYZE")
+    return counts
+
+
+def build_database(
+    path: str, create_default_users: bool = False, **options
+) -> Database:
+    """
+    Creates a database at path filled with generated data, for use as a
+    fixture in benchmarks. Options are passed on to generate.
+    """
+    db = Database(path, create_default_users=create_default_users)
+    # The data can be regenerated, so trade durability for load speed
+    db.cursor.execute("PRAGMA synchronous = OFF")
+    generate(db, **options)
+    db.cursor.execute("PRAGMA synchronous = FULL")
+    return db
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate a Breeze database for load testing."
+    )
+    parser.add_argument("database", help="Database file to create or add to")
+    parser.add_argument("--clinicians", type=int, default=10)
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--years", type=float, default=1, help="Years of history")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--end-date",
+        type=lambda value: datetime.strptime(value, "%Y-%m-%d").date(),
+        help="Last day of history (YYYY-MM-DD), defaults to today",
+    )
+    parser.add_argument(
+        "--with-default-users",
+        action="store_true",
+        help="Also create the default demo users",
+    )
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    db = build_database(
+        args.database,
+        create_default_users=args.with_default_users,
+        clinicians=args.clinicians,
+        patients=args.patients,
+        days=max(1, round(args.years * 365)),
+        seed=args.seed,
+        end_date=args.end_date,
+        chunk_size=args.chunk_size,
+    )
+    db.close()
+
+    print(f"Generated {args.database} in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,329 @@
+"""
+Timing of the SQL statements run through Database connections.
+
+Instrumented connections hand out cursors that time every execute and
+fetch and count the rows returned. Each execution is recorded once its
+rows have all been fetched, or the cursor runs its next statement. The
+statistics are kept per statement, with the literal numbers replaced by ?
+so the same query with different ids is counted together.
+
+Executions slower than a threshold are appended to a log file with their
+parameters and EXPLAIN QUERY PLAN.
+
+Instrumentation is off unless turned on with environment variables:
+    BREEZE_QUERY_STATS=1           time queries, print a summary on exit
+    BREEZE_SLOW_QUERY_MS=100       threshold for the slow query log
+    BREEZE_SLOW_QUERY_LOG=slow_queries.log
+
+Admins can also see the statistics from their menu. Tracing (see
+modules/utilities/tracing.py) turns instrumentation on as well, and
+listens to every execution to attribute it to the screen that ran it.
+"""
+
+import atexit
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import cache
+from typing import Any, Union
+
+# Durations kept per statement for the percentiles
+SAMPLES_KEPT = 1000
+NUMBER = re.compile(r"(?<![\w.])-?\d+(\.\d+)?(?![\w.])")
+
+
+def row_size(row: Any) -> int:
+    """
+    Roughly how many bytes a fetched row holds: the length of its text and
+    blobs and 8 for any other value
+    """
+    if isinstance(row, dict):
+        values = row.values()
+    elif isinstance(row, (tuple, list)):
+        values = row
+    else:
+        # dict_factory returns single column rows as bare values
+        values = (row,)
+    return sum(
+        len(value) if isinstance(value, (str, bytes)) else 0 if value is None else 8
+        for value in values
+    )
+
+
+def statement_key(sql: str) -> str:
+    """The statement with its whitespace collapsed and numbers replaced by ?"""
+    return NUMBER.sub("?", " ".join(sql.split()))
+
+
+@dataclass
+class StatementStats:
+    statement: str
+    count: int = 0
+    total: float = 0
+    rows: int = 0
+    slow: int = 0
+    samples: deque = field(default_factory=lambda: deque(maxlen=SAMPLES_KEPT))
+
+    def percentile(self, percent: int) -> float:
+        if len(self.samples) < 2:
+            return self.samples[0] if self.samples else 0
+        # Slow to import, and only needed for summaries
+        import statistics
+
+        return statistics.quantiles(self.samples, n=100, method="inclusive")[
+            percent - 1
+        ]
+
+
+class QueryStats:
+    """Statistics of every statement run by instrumented connections"""
+
+    def __init__(self, slow_seconds: float, slow_log: Union[str, None]) -> None:
+        self.slow_seconds = slow_seconds
+        self.slow_log = slow_log
+        self.statements: dict[str, StatementStats] = {}
+        self.lock = threading.Lock()
+        # Called with the statement, seconds, rows and bytes of each execution
+        self.listeners: list[Callable[[str, float, int, int], None]] = []
+
+    def record(
+        self,
+        connection: sqlite3.Connection,
+        sql: str,
+        params: Any,
+        elapsed: float,
+        rows: int,
+        size: int = 0,
+    ) -> None:
+        key = statement_key(sql)
+        slow = elapsed >= self.slow_seconds
+        with self.lock:
+            stats = self.statements.get(key)
+            if not stats:
+                stats = self.statements[key] = StatementStats(key)
+            stats.count += 1
+            stats.total += elapsed
+            stats.rows += rows
+            stats.samples.append(elapsed)
+            stats.slow += slow
+        for listener in self.listeners:
+            listener(key, elapsed, rows, size)
+        if slow and self.slow_log:
+            self.log_slow_query(connection, sql, params, elapsed, rows)
+
+    def log_slow_query(
+        self,
+        connection: sqlite3.Connection,
+        sql: str,
+        params: Any,
+        elapsed: float,
+        rows: int,
+    ) -> None:
+        lines = [
+            f"{datetime.now():%Y-%m-%d %H:%M:%S} {elapsed * 1000:.1f} ms, {rows} rows",
+            " ".join(sql.split()),
+            # Passwords are kept out of the log
+            "Parameters: "
+            + ("(hidden)" if "password" in sql.lower() else repr(params)),
+        ]
+        if params is not None:
+            lines.extend(explain(connection, sql, params))
+        with self.lock, open(self.slow_log, "a") as log:
+            log.write("\n".join(lines) + "\n\n")
+
+    def summary(self) -> list[StatementStats]:
+        """The statements, those that took the longest in total first"""
+        with self.lock:
+            statements = list(self.statements.values())
+        return sorted(statements, key=lambda stats: stats.total, reverse=True)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.statements.clear()
+
+    def print_summary(self, top: int = 20, file=None) -> None:
+        statements = self.summary()
+        if not statements:
+            return
+        file = file or sys.stderr
+        total = sum(stats.total for stats in statements)
+        print(
+            f"\nSQL: {sum(stats.count for stats in statements)} executions of "
+            + f"{len(statements)} statements, {total * 1000:.1f} ms",
+            file=file,
+        )
+        print(
+            f"{'calls':>7}{'total ms':>10}{'p50 ms':>9}{'p99 ms':>9}{'rows':>9}  statement",
+            file=file,
+        )
+        for stats in statements[:top]:
+            print(
+                f"{stats.count:7}{stats.total * 1000:10.1f}"
+                + f"{stats.percentile(50) * 1000:9.2f}{stats.percentile(99) * 1000:9.2f}"
+                + f"{stats.rows:9}  {stats.statement[:100]}",
+                file=file,
+            )
+
+
+def explain(connection: sqlite3.Connection, sql: str, params: Any) -> list[str]:
+    """The EXPLAIN QUERY PLAN of a statement, as indented lines"""
+    # A plain cursor, so the plan isn't timed itself or shaped by row_factory
+    cursor = sqlite3.Cursor(connection)
+    cursor.row_factory = None
+    try:
+        plan = cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    except sqlite3.Error as e:
+        return [f"No query plan: {e}"]
+    finally:
+        cursor.close()
+
+    depths = {0: 0}
+    lines = []
+    for node, parent, _, detail in plan:
+        depths[node] = depths.get(parent, 0) + 1
+        lines.append("  " * depths[node] + detail)
+    return lines
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """A cursor that times its statements and counts the rows they return"""
+
+    stats: QueryStats
+    __sql: Union[str, None] = None
+
+    def __start(self, sql: str, params: Any) -> None:
+        self.finish()
+        self.__sql = sql
+        self.__params = params
+        self.__elapsed = 0.0
+        self.__rows = 0
+        self.__size = 0
+
+    def finish(self) -> None:
+        """Records the current execution, if there is one"""
+        if self.__sql is not None:
+            self.stats.record(
+                self.connection,
+                self.__sql,
+                self.__params,
+                self.__elapsed,
+                self.__rows,
+                self.__size,
+            )
+            self.__sql = None
+
+    def execute(self, sql: str, parameters: Any = (), /) -> "InstrumentedCursor":
+        self.__start(sql, parameters)
+        started = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            self.__elapsed += time.perf_counter() - started
+        if self.description is None:
+            # Nothing to fetch, the statement is done
+            self.finish()
+        return self
+
+    def executemany(
+        self, sql: str, seq_of_parameters: Iterable, /
+    ) -> "InstrumentedCursor":
+        # The parameters may be a generator, so aren't kept for the log
+        self.__start(sql, None)
+        started = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            self.__elapsed += time.perf_counter() - started
+        self.finish()
+        return self
+
+    def fetchone(self) -> Any:
+        started = time.perf_counter()
+        row = super().fetchone()
+        if self.__sql is not None:
+            self.__elapsed += time.perf_counter() - started
+            if row is None:
+                self.finish()
+            else:
+                self.__rows += 1
+                self.__size += row_size(row)
+        return row
+
+    def fetchmany(self, size: Union[int, None] = None) -> list:
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        if self.__sql is not None:
+            self.__elapsed += time.perf_counter() - started
+            self.__rows += len(rows)
+            self.__size += sum(map(row_size, rows))
+            if len(rows) < size:
+                self.finish()
+        return rows
+
+    def fetchall(self) -> list:
+        started = time.perf_counter()
+        rows = super().fetchall()
+        if self.__sql is not None:
+            self.__elapsed += time.perf_counter() - started
+            self.__rows += len(rows)
+            self.__size += sum(map(row_size, rows))
+            self.finish()
+        return rows
+
+    def __next__(self) -> Any:
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self.finish()
+            raise
+        if self.__sql is not None:
+            self.__elapsed += time.perf_counter() - started
+            self.__rows += 1
+            self.__size += row_size(row)
+        return row
+
+    def close(self) -> None:
+        self.finish()
+        super().close()
+
+    def __del__(self) -> None:
+        # Cursors of connection.execute() are usually dropped, not closed
+        self.finish()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """A connection whose cursors, including those of execute(), are timed"""
+
+    def cursor(self, factory: type = InstrumentedCursor) -> sqlite3.Cursor:
+        cursor = super().cursor(factory)
+        cursor.stats = get_query_stats()
+        return cursor
+
+    # The originals make their cursor without calling cursor()
+    def execute(self, sql: str, parameters: Any = (), /) -> sqlite3.Cursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable, /) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+@cache
+def get_query_stats() -> QueryStats:
+    """The statistics shared by every connection of the process"""
+    stats = QueryStats(
+        float(os.environ.get("BREEZE_SLOW_QUERY_MS", "100")) / 1000,
+        os.environ.get("BREEZE_SLOW_QUERY_LOG", "slow_queries.log"),
+    )
+    # Tracing alone turns instrumentation on, without the summary
+    if os.environ.get("BREEZE_QUERY_STATS", "") not in ("", "0"):
+        atexit.register(stats.print_summary)
+    return stats
@@ -0,0 +1,232 @@
+"""
+Forward-only schema migrations for breeze.db.
+
+Migrations are the numbered modules in database/migrations, for example
+0001_initial_schema.py. The number of the last one applied is stored in
+PRAGMA user_version. Each migration defines:
+
+    upgrade(connection)
+        Schema changes, applied in a single transaction together with the
+        version bump, so a failed migration leaves the database untouched.
+
+    backfill(connection, state, batch_size)  (optional)
+        Long running data changes. It is called repeatedly with the state
+        it last returned (None the first time), each batch being committed
+        together with its state. It returns None when there is nothing left,
+        so an interrupted backfill carries on where it stopped the next time
+        migrations run.
+
+Migrations run automatically when a Database is opened, or from the
+repository root with:
+    python -m database.migrate [--database breeze.db] [--status]
+"""
+
+import importlib
+import json
+import os
+import re
+import sqlite3
+import time
+from types import ModuleType
+from typing import Any, Union
+
+MIGRATIONS_PATH = os.path.join(os.path.dirname(__file__), "migrations")
+MIGRATION_FILE = re.compile(r"^((\d{4})_\w+)\.py$")
+
+
+def find_migrations() -> list[tuple[int, str]]:
+    """Returns the (version, module name) of every migration, in order"""
+    # A plain directory listing, as this runs every time a Database is opened
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_PATH):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(2)), match.group(1)))
+    return sorted(migrations)
+
+
+def latest_version() -> int:
+    migrations = find_migrations()
+    return migrations[-1][0] if migrations else 0
+
+
+def load_migration(name: str) -> ModuleType:
+    return importlib.import_module(f"database.migrations.{name}")
+
+
+def get_version(connection: sqlite3.Connection) -> int:
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def get_backfill_state(
+    connection: sqlite3.Connection, version: int
+) -> tuple[bool, Any]:
+    """Returns whether a backfill is in progress, and the state it stopped at"""
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS MigrationBackfills (
+            version INTEGER PRIMARY KEY,
+            state TEXT
+        )
+    """)
+    row = connection.execute(
+        "SELECT state FROM MigrationBackfills WHERE version = ?", (version,)
+    ).fetchone()
+    if row is None:
+        return False, None
+    return True, json.loads(row[0]) if row[0] is not None else None
+
+
+def run_upgrade(
+    connection: sqlite3.Connection, version: int, migration: ModuleType
+) -> None:
+    """
+    Applies the schema changes of a migration. Migrations with a backfill
+    only bump the version once the backfill has finished.
+    """
+    connection.execute("BEGIN")
+    try:
+        migration.upgrade(connection)
+        if hasattr(migration, "backfill"):
+            connection.execute(
+                "INSERT INTO MigrationBackfills (version, state) VALUES (?, NULL)",
+                (version,),
+            )
+        else:
+            connection.execute(f"PRAGMA user_version = {version}")
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+
+def run_backfill(
+    connection: sqlite3.Connection,
+    version: int,
+    migration: ModuleType,
+    state: Any,
+    batch_size: int,
+    verbose: bool,
+) -> None:
+    """Runs a backfill batch by batch from its saved state"""
+    batches = 0
+    started = last_report = time.perf_counter()
+    while True:
+        connection.execute("BEGIN")
+        try:
+            state = migration.backfill(connection, state, batch_size)
+            if state is None:
+                connection.execute(
+                    "DELETE FROM MigrationBackfills WHERE version = ?", (version,)
+                )
+                connection.execute(f"PRAGMA user_version = {version}")
+            else:
+                connection.execute(
+                    "UPDATE MigrationBackfills SET state = ? WHERE version = ?",
+                    (json.dumps(state), version),
+                )
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+        batches += 1
+        if state is None:
+            return
+        if verbose and time.perf_counter() - last_report > 1:
+            last_report = time.perf_counter()
+            print(
+                f"    {batches} batches in {last_report - started:.1f}s, "
+                + f"resuming from {json.dumps(state)}"
+            )
+
+
+def migrate(
+    connection: sqlite3.Connection,
+    batch_size: int = 10000,
+    verbose: bool = True,
+) -> int:
+    """
+    Applies every pending migration in order and returns the new version.
+    Migrations must not commit themselves.
+    """
+    # Migrations see plain tuples rather than a Database's dict rows, and
+    # control their transactions with BEGIN and commit
+    row_factory, isolation_level = connection.row_factory, connection.isolation_level
+    connection.row_factory = None
+    connection.isolation_level = None
+    try:
+        return apply_migrations(connection, batch_size, verbose)
+    finally:
+        connection.row_factory = row_factory
+        connection.isolation_level = isolation_level
+
+
+def apply_migrations(
+    connection: sqlite3.Connection, batch_size: int, verbose: bool
+) -> int:
+    current = get_version(connection)
+    pending = [
+        (version, name) for version, name in find_migrations() if version > current
+    ]
+    if verbose and pending:
+        print(f"Migrating database from version {current} to {pending[-1][0]}")
+
+    for version, name in pending:
+        migration = load_migration(name)
+        started = time.perf_counter()
+
+        in_progress, state = get_backfill_state(connection, version)
+        if not in_progress:
+            run_upgrade(connection, version, migration)
+            if verbose:
+                print(f"  {name}: upgrade {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        if hasattr(migration, "backfill"):
+            backfill_started = time.perf_counter()
+            run_backfill(connection, version, migration, state, batch_size, verbose)
+            if verbose:
+                print(
+                    f"  {name}: backfill "
+                    + f"{(time.perf_counter() - backfill_started) * 1000:.1f} ms"
+                )
+
+    return get_version(connection)
+
+
+def print_status(connection: sqlite3.Connection) -> None:
+    current = get_version(connection)
+    print(f"Database version {current}, latest version {latest_version()}")
+    for version, name in find_migrations():
+        if version <= current:
+            status = "applied"
+        elif get_backfill_state(connection, version)[0]:
+            status = "backfill in progress"
+        else:
+            status = "pending"
+        print(f"  {name}: {status}")
+
+
+if __name__ == "__main__":
+    # Only needed for the command line, keep it out of the app's startup
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migrate a Breeze database.")
+    parser.add_argument("--database", default="breeze.db")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument(
+        "--status", action="store_true", help="Show the applied migrations and exit"
+    )
+    args = parser.parse_args()
+
+    connection: Union[sqlite3.Connection, None] = None
+    try:
+        connection = sqlite3.connect(args.database)
+        connection.execute("PRAGMA foreign_keys = ON")
+        if args.status:
+            print_status(connection)
+        else:
+            migrate(connection, args.batch_size)
+            print(f"Database is at version {get_version(connection)}.")
+    finally:
+        if connection:
+            connection.close()
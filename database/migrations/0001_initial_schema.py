@@ -0,0 +1,97 @@
+"""Users, patients, journals, moods and appointments, with their date indexes"""
+
+import sqlite3
+
+from database.setup import diagnoses, roles, statuses
+
+
+def upgrade(connection: sqlite3.Connection) -> None:
+    # IF NOT EXISTS, as databases created before migrations already have them
+
+    # Users Table
+    connection.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS Users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL,
+            first_name TEXT,
+            surname TEXT,
+            email TEXT NOT NULL UNIQUE,
+            role TEXT CHECK( role IN {roles} ),
+            is_active BOOLEAN NOT NULL
+        )"""
+    )
+
+    # Patient Information Table
+    connection.execute(f"""
+        CREATE TABLE IF NOT EXISTS Patients (
+            user_id INTEGER PRIMARY KEY,
+            emergency_email TEXT,
+            date_of_birth DATETIME,
+            diagnosis TEXT CHECK( diagnosis IN {diagnoses} ),
+            clinician_id INTEGER,
+            FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE CASCADE,
+            FOREIGN KEY (clinician_id) REFERENCES Users(user_id) ON DELETE SET NULL
+        )
+    """)
+
+    # Journal Table
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS JournalEntries (
+            entry_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            date DATETIME NOT NULL,
+            text TEXT,
+            FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE CASCADE
+        )
+    """)
+
+    # Mood Table (Mood + Text)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS MoodEntries (
+            entry_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            date DATETIME NOT NULL,
+            mood INTEGER NOT NULL,
+            text TEXT,
+            FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE CASCADE
+        )
+    """)
+
+    # Appointments Table
+    connection.execute(f"""
+        CREATE TABLE IF NOT EXISTS Appointments (
+            appointment_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            clinician_id INTEGER,
+            date DATETIME NOT NULL,
+            status TEXT NOT NULL CHECK( status IN {statuses} ),
+            patient_notes TEXT,
+            clinician_notes TEXT,
+            FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE CASCADE,
+            FOREIGN KEY (clinician_id) REFERENCES Users(user_id) ON DELETE SET NULL
+        )
+    """)
+
+    # Indexes for looking up a user's entries and appointments by date
+    connection.execute("""
+        CREATE INDEX IF NOT EXISTS idx_mood_entries_user_date
+        ON MoodEntries (user_id, date)
+    """)
+    connection.execute("""
+        CREATE INDEX IF NOT EXISTS idx_journal_entries_user_date
+        ON JournalEntries (user_id, date)
+    """)
+    connection.execute("""
+        CREATE INDEX IF NOT EXISTS idx_appointments_user_date
+        ON Appointments (user_id, date)
+    """)
+    connection.execute("""
+        CREATE INDEX IF NOT EXISTS idx_appointments_clinician_date
+        ON Appointments (clinician_id, date)
+    """)
+    connection.execute("""
+        CREATE INDEX IF NOT EXISTS idx_patients_clinician
+        ON Patients (clinician_id)
+    """)
@@ -0,0 +1,84 @@
+"""
+Full-text indexes over the journal, mood and appointment notes.
+
+They are FTS5 external content tables, so the text is only stored in the
+original tables and triggers keep the indexes in sync. Existing rows are
+indexed by the backfill, one batch of keys at a time.
+"""
+
+import sqlite3
+from typing import Union
+
+from database.setup import search_tables
+
+
+def upgrade(connection: sqlite3.Connection) -> None:
+    for search_table, table, key, columns in search_tables:
+        # Databases from before migrations may already have a populated index,
+        # recreate it so the backfill doesn't index those rows twice
+        connection.execute(f"DROP TABLE IF EXISTS {search_table}")
+        connection.execute(f"""
+            CREATE VIRTUAL TABLE {search_table} USING fts5(
+                {", ".join(columns)}, content='{table}', content_rowid='{key}'
+            )
+        """)
+
+        new_values = ", ".join(f"new.{column}" for column in columns)
+        old_values = ", ".join(f"old.{column}" for column in columns)
+        connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_search_insert
+            AFTER INSERT ON {table} BEGIN
+                INSERT INTO {search_table} (rowid, {", ".join(columns)})
+                VALUES (new.{key}, {new_values});
+            END
+        """)
+        connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_search_delete
+            AFTER DELETE ON {table} BEGIN
+                INSERT INTO {search_table} ({search_table}, rowid, {", ".join(columns)})
+                VALUES ('delete', old.{key}, {old_values});
+            END
+        """)
+        connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_search_update
+            AFTER UPDATE OF {", ".join(columns)} ON {table} BEGIN
+                INSERT INTO {search_table} ({search_table}, rowid, {", ".join(columns)})
+                VALUES ('delete', old.{key}, {old_values});
+                INSERT INTO {search_table} (rowid, {", ".join(columns)})
+                VALUES (new.{key}, {new_values});
+            END
+        """)
+
+
+def backfill(
+    connection: sqlite3.Connection, state: Union[list, None], batch_size: int
+) -> Union[list, None]:
+    """
+    Indexes the next batch of rows. The state is the position in
+    search_tables and the last key indexed in that table.
+    """
+    index, last_key = state or (0, 0)
+    search_table, table, key, columns = search_tables[index]
+
+    batch_end = connection.execute(
+        f"""
+        SELECT MAX({key}) FROM (
+            SELECT {key} FROM {table} WHERE {key} > ? ORDER BY {key} LIMIT ?
+        )
+        """,
+        (last_key, batch_size),
+    ).fetchone()[0]
+
+    if batch_end is None:
+        # This table is done, move on to the next one
+        return [index + 1, 0] if index + 1 < len(search_tables) else None
+
+    connection.execute(
+        f"""
+        INSERT INTO {search_table} (rowid, {", ".join(columns)})
+        SELECT {key}, {", ".join(columns)} FROM {table}
+        WHERE {key} > ? AND {key} <= ?
+        """,
+        (last_key, batch_end),
+    )
+    return [index, batch_end]
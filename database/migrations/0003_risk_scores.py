@@ -0,0 +1,35 @@
+"""
+Early warning scores of patients, kept up to date by a scheduled job (see
+modules/risk_service.py).
+
+RiskScores holds the latest score of every patient with moods, and
+JobRuns how far through MoodEntries each batch job has got, so the next
+run only reads the entries added since.
+"""
+
+import sqlite3
+
+
+def upgrade(connection: sqlite3.Connection) -> None:
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS RiskScores (
+            user_id INTEGER PRIMARY KEY,
+            score REAL NOT NULL,
+            reasons TEXT NOT NULL,
+            last_entry_date TEXT NOT NULL,
+            scored_at DATETIME NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE CASCADE
+        )
+    """)
+    # Finds the patients whose score changes with time alone
+    connection.execute("""
+        CREATE INDEX IF NOT EXISTS idx_risk_scores_last_entry_date
+        ON RiskScores (last_entry_date)
+    """)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS JobRuns (
+            job TEXT PRIMARY KEY,
+            last_entry_id INTEGER NOT NULL,
+            ran_at DATETIME NOT NULL
+        )
+    """)
@@ -0,0 +1,288 @@
+"""
+Pre-aggregated totals of moods and appointments for the reports.
+
+MoodRollups counts the moods and adds up their scores per patient,
+clinician and diagnosis, AppointmentRollups counts the appointments of
+each status per patient and clinician, both by day, week (from Monday) and
+month. Reports over any range read a few of these rows rather than the
+entries themselves (see modules/report_service.py).
+
+Triggers keep the totals up to date as entries are added, changed and
+deleted, and move a patient's mood totals when they are assigned another
+clinician or diagnosis. Totals that drop to 0 are kept.
+
+Existing entries are added by the backfill, one batch of keys at a time.
+Until it has finished, RollupBackfills holds the keys it has still to add,
+which the triggers leave alone.
+"""
+
+import sqlite3
+from functools import partial
+from typing import Union
+
+# The first day of the period a source row r falls in
+PERIODS = {
+    "day": "date(r.date)",
+    "week": "date(r.date, 'weekday 0', '-6 days')",
+    "month": "date(r.date, 'start of month')",
+}
+# Groups of the moods that come from the patient, pt
+PATIENT_DIMENSIONS = {"clinician": "pt.clinician_id", "diagnosis": "pt.diagnosis"}
+# (rollup table, source table, key, dimensions, other grouping columns, totals)
+ROLLUPS = (
+    (
+        "MoodRollups",
+        "MoodEntries",
+        "entry_id",
+        {"patient": "r.user_id", **PATIENT_DIMENSIONS},
+        {},
+        {"entries": "1", "mood_total": "r.mood"},
+    ),
+    (
+        "AppointmentRollups",
+        "Appointments",
+        "appointment_id",
+        {"patient": "r.user_id", "clinician": "r.clinician_id"},
+        {"status": "r.status"},
+        {"appointments": "1"},
+    ),
+)
+# Columns of the source tables whose changes move a row to other totals
+TRACKED_COLUMNS = {
+    "MoodEntries": ("user_id", "date", "mood"),
+    "Appointments": ("user_id", "clinician_id", "date", "status"),
+}
+
+
+def add_to_rollup(
+    rollup: str,
+    source: str,
+    dimensions: dict[str, str],
+    grouped: dict[str, str],
+    totals: dict[str, str],
+    condition: str,
+    sign: int,
+) -> str:
+    """
+    Adds the rows of the source table that meet the condition to the
+    totals, or takes them away with a sign of -1
+    """
+    keys = ("period", "dimension", "period_start", "group_key", *grouped)
+    # One query for each period and dimension, as that's quicker than
+    # picking the expressions for every row
+    selects = " UNION ALL ".join(
+        f"""
+        SELECT '{period}', '{dimension}', {period_start}, {group_key},
+            {"".join(f"{expression}, " for expression in grouped.values())}
+            {", ".join(f"SUM({sign} * {total})" for total in totals.values())}
+        FROM {source} r
+        LEFT JOIN Patients pt ON pt.user_id = r.user_id
+        WHERE {condition} AND {group_key} IS NOT NULL
+        GROUP BY {", ".join(str(index + 3) for index in range(len(keys) - 2))}
+        """
+        for period, period_start in PERIODS.items()
+        for dimension, group_key in dimensions.items()
+    )
+    return f"""
+        INSERT INTO {rollup} ({", ".join((*keys, *totals))})
+        SELECT * FROM ({selects}) WHERE true
+        ON CONFLICT ({", ".join(keys)}) DO UPDATE SET
+            {", ".join(f"{total} = {total} + excluded.{total}" for total in totals)};
+    """
+
+
+def move_patient_moods(row: str, sign: int) -> str:
+    """
+    Adds a patient's mood totals to their clinician's and diagnosis', or
+    takes them away, with the patient's row as row
+    """
+    # The + drops the INTEGER affinity of the row's user_id, which would
+    # otherwise stop group_key, without one, from being looked up by index
+    selects = " UNION ALL ".join(
+        f"""
+        SELECT period, '{dimension}', period_start, {group_key.replace("pt.", f"{row}.")},
+            {sign} * entries, {sign} * mood_total
+        FROM MoodRollups
+        WHERE dimension = 'patient' AND group_key = +{row}.user_id
+            AND {group_key.replace("pt.", f"{row}.")} IS NOT NULL
+        """
+        for dimension, group_key in PATIENT_DIMENSIONS.items()
+    )
+    return f"""
+        INSERT INTO MoodRollups
+            (period, dimension, period_start, group_key, entries, mood_total)
+        SELECT * FROM ({selects}) WHERE true
+        ON CONFLICT (period, dimension, period_start, group_key) DO UPDATE SET
+            entries = entries + excluded.entries,
+            mood_total = mood_total + excluded.mood_total;
+    """
+
+
+def is_counted(source: str, key: str, row: str) -> str:
+    """
+    Whether a row of the source table is in the totals already, rather
+    than left to the backfill
+    """
+    return f"""
+        NOT EXISTS (
+            SELECT 1 FROM RollupBackfills b WHERE b.source = '{source}'
+            AND {row}.{key} > b.backfilled_to AND {row}.{key} <= b.last_key
+        )
+    """
+
+
+def upgrade(connection: sqlite3.Connection) -> None:
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS MoodRollups (
+            period TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            group_key NOT NULL,
+            entries INTEGER NOT NULL,
+            mood_total INTEGER NOT NULL,
+            PRIMARY KEY (period, dimension, period_start, group_key)
+        ) WITHOUT ROWID
+    """)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS AppointmentRollups (
+            period TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            group_key INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            appointments INTEGER NOT NULL,
+            PRIMARY KEY (period, dimension, period_start, group_key, status)
+        ) WITHOUT ROWID
+    """)
+    # Finds a patient's totals when they move to another clinician
+    connection.execute("""
+        CREATE INDEX IF NOT EXISTS idx_mood_rollups_group
+        ON MoodRollups (dimension, group_key)
+    """)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS RollupBackfills (
+            source TEXT PRIMARY KEY,
+            backfilled_to INTEGER NOT NULL,
+            last_key INTEGER NOT NULL
+        )
+    """)
+
+    for rollup, source, key, dimensions, grouped, totals in ROLLUPS:
+        # Keys up to the last one are left to the backfill, later ones are new
+        connection.execute(
+            f"""
+            INSERT INTO RollupBackfills (source, backfilled_to, last_key)
+            SELECT '{source}', 0, last_key
+            FROM (SELECT MAX({key}) AS last_key FROM {source})
+            WHERE last_key IS NOT NULL
+            """
+        )
+
+        add = partial(add_to_rollup, rollup, source, dimensions, grouped, totals)
+        counted = partial(is_counted, source, key)
+        new = f"r.{key} = new.{key}"
+        old = f"r.{key} = old.{key}"
+
+        # Rows are read back from the table, so deletes and updates take
+        # theirs away before they happen
+        connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {source}_rollup_insert
+            AFTER INSERT ON {source} WHEN {counted("new")} BEGIN
+                {add(new, 1)}
+            END
+        """)
+        connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {source}_rollup_delete
+            BEFORE DELETE ON {source} WHEN {counted("old")} BEGIN
+                {add(old, -1)}
+            END
+        """)
+        connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {source}_rollup_update_old
+            BEFORE UPDATE OF {", ".join(TRACKED_COLUMNS[source])} ON {source}
+            WHEN {counted("old")} BEGIN
+                {add(old, -1)}
+            END
+        """)
+        connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {source}_rollup_update_new
+            AFTER UPDATE OF {", ".join(TRACKED_COLUMNS[source])} ON {source}
+            WHEN {counted("new")} BEGIN
+                {add(new, 1)}
+            END
+        """)
+
+    # A patient's moods counted so far follow them to another clinician or
+    # diagnosis. The moods of deleted patients are deleted with them, the
+    # totals left are taken away from their clinician here.
+    changed = " OR ".join(
+        f"old.{column} IS NOT new.{column}" for column in ("clinician_id", "diagnosis")
+    )
+    connection.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS Patients_rollup_update
+        AFTER UPDATE OF clinician_id, diagnosis ON Patients WHEN {changed} BEGIN
+            {move_patient_moods("old", -1)}
+            {move_patient_moods("new", 1)}
+        END
+    """)
+    connection.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS Patients_rollup_insert
+        AFTER INSERT ON Patients BEGIN
+            {move_patient_moods("new", 1)}
+        END
+    """)
+    connection.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS Patients_rollup_delete
+        AFTER DELETE ON Patients BEGIN
+            {move_patient_moods("old", -1)}
+        END
+    """)
+
+
+def backfill(
+    connection: sqlite3.Connection, state: Union[str, None], batch_size: int
+) -> Union[str, None]:
+    """
+    Adds the next batch of rows to the totals. The progress is kept in
+    RollupBackfills, the state is the source table being added.
+    """
+    row = connection.execute(
+        "SELECT source, backfilled_to, last_key FROM RollupBackfills ORDER BY source"
+    ).fetchone()
+    if row is None:
+        return None
+    source, backfilled_to, last_key = row
+    rollup, _, key, dimensions, grouped, totals = next(
+        rollup for rollup in ROLLUPS if rollup[1] == source
+    )
+
+    batch_end = connection.execute(
+        f"""
+        SELECT MAX({key}) FROM (
+            SELECT {key} FROM {source} WHERE {key} > ? AND {key} <= ?
+            ORDER BY {key} LIMIT ?
+        )
+        """,
+        (backfilled_to, last_key, batch_size),
+    ).fetchone()[0]
+
+    if batch_end is None:
+        connection.execute("DELETE FROM RollupBackfills WHERE source = ?", (source,))
+    else:
+        connection.execute(
+            add_to_rollup(
+                rollup,
+                source,
+                dimensions,
+                grouped,
+                totals,
+                f"r.{key} > :first AND r.{key} <= :last",
+                1,
+            ),
+            {"first": backfilled_to, "last": batch_end},
+        )
+        connection.execute(
+            "UPDATE RollupBackfills SET backfilled_to = ? WHERE source = ?",
+            (batch_end, source),
+        )
+    return source
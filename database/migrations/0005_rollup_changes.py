@@ -0,0 +1,32 @@
+"""
+A log of the appointment totals that changed, so copies of them kept in
+memory (see modules/report_cube.py) can be brought up to date by reading
+only those totals again.
+
+Every change to a row of AppointmentRollups adds its key to
+AppointmentRollupChanges. Old changes are deleted by the readers, which
+build their copy again when they have missed some.
+"""
+
+import sqlite3
+
+
+def upgrade(connection: sqlite3.Connection) -> None:
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS AppointmentRollupChanges (
+            change_id INTEGER PRIMARY KEY,
+            period TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            group_key INTEGER NOT NULL
+        )
+    """)
+    for event in ("INSERT", "UPDATE"):
+        connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS AppointmentRollups_change_{event.lower()}
+            AFTER {event} ON AppointmentRollups BEGIN
+                INSERT INTO AppointmentRollupChanges
+                    (period, dimension, period_start, group_key)
+                VALUES (new.period, new.dimension, new.period_start, new.group_key);
+            END
+        """)
@@ -0,0 +1,26 @@
+"""
+Indexes of only the appointments a clinician is notified about, so the
+main menu counts them (see AppointmentService.count_notifications) without
+reading the rest of their appointments.
+
+Whether an appointment is still to come or already past changes with the
+time alone, so the counts are worked out on each redraw rather than kept
+in a table, from these small indexes.
+"""
+
+import sqlite3
+
+
+def upgrade(connection: sqlite3.Connection) -> None:
+    # Requested appointments to confirm or reject
+    connection.execute("""
+        CREATE INDEX IF NOT EXISTS idx_appointments_clinician_pending
+        ON Appointments (clinician_id, date) WHERE status = 'Pending'
+    """)
+    # Appointments to add notes for, with the same condition as the queries
+    # so SQLite can use it
+    connection.execute("""
+        CREATE INDEX IF NOT EXISTS idx_appointments_clinician_without_notes
+        ON Appointments (clinician_id, date)
+        WHERE clinician_notes IS NULL OR clinician_notes = ''
+    """)
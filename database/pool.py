@@ -0,0 +1,125 @@
+"""
+A pool of Database connections for serving many sessions from one process
+(see modules/server.py).
+
+Connections are opened on demand up to the size of the pool and handed
+back when a session ends, so the next session reuses an open connection,
+with its page cache, instead of connecting and checking migrations again.
+Each connection is used by one thread at a time.
+"""
+
+import queue
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from database.setup import Database
+from modules.utilities.metrics import DB_LOCK_WAIT_SECONDS, DB_LOCK_WAITS
+
+
+class PoolTimeout(Exception):
+    """No connection became free in time"""
+
+
+class ConnectionPool:
+    path: str
+    size: int
+    timeout: float
+
+    def __init__(
+        self,
+        path: str = "breeze.db",
+        size: int = 20,
+        timeout: float = 30,
+        create_default_users: bool = True,
+    ) -> None:
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        # Last in, first out, so the most recently used connection is reused
+        self.__idle = queue.LifoQueue()
+        self.__lock = threading.Lock()
+        self.__opened = 1
+
+        # The first connection migrates and seeds the database, once, before
+        # any session starts
+        db = self.__connect(create_default_users)
+        # Readers don't block the writer, nor the writer the readers
+        db.cursor.execute("PRAGMA journal_mode = WAL").fetchall()
+        self.__idle.put(db)
+
+    def __connect(self, create_default_users: bool = False) -> Database:
+        """Opens a connection in a place already counted in __opened"""
+        try:
+            return Database(
+                self.path,
+                create_default_users=create_default_users,
+                check_same_thread=False,
+            )
+        except Exception:
+            with self.__lock:
+                self.__opened -= 1
+            raise
+
+    @property
+    def opened(self) -> int:
+        return self.__opened
+
+    @property
+    def in_use(self) -> int:
+        return self.__opened - self.__idle.qsize()
+
+    def acquire(self) -> Database:
+        """
+        Returns an idle connection, opening one if the pool isn't full yet.
+        Otherwise waits for one to be released, raising PoolTimeout if none
+        is in time.
+        """
+        try:
+            return self.__idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        # The place is taken in the same check, so sessions opening
+        # connections at once can't go past the size between them
+        with self.__lock:
+            can_open = self.__opened < self.size
+            if can_open:
+                self.__opened += 1
+        if can_open:
+            return self.__connect()
+
+        DB_LOCK_WAITS.inc(lock="pool")
+        started = time.perf_counter()
+        try:
+            return self.__idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeout(f"All {self.size} database connections are in use.")
+        finally:
+            DB_LOCK_WAIT_SECONDS.inc(time.perf_counter() - started, lock="pool")
+
+    def release(self, db: Database) -> None:
+        # Undo anything left uncommitted, so the next session starts clean
+        if db.connection.in_transaction:
+            db.connection.rollback()
+        self.__idle.put(db)
+
+    @contextmanager
+    def connection(self) -> Iterator[Database]:
+        db = self.acquire()
+        try:
+            yield db
+        finally:
+            self.release(db)
+
+    def close(self) -> None:
+        """Closes the idle connections, call once every session has ended"""
+        while True:
+            try:
+                db = self.__idle.get_nowait()
+            except queue.Empty:
+                break
+            db.close()
+            with self.__lock:
+                self.__opened -= 1
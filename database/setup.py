@@ -1,6 +1,11 @@
+import os
 import sqlite3
 from datetime import datetime, timedelta, date, time
 import random
+from typing import Union
+
+from database.migrate import latest_version, migrate
+from modules.utilities.metrics import DB_CONNECTIONS_OPEN
 
 
 def old_date(days_ago):
@@ -113,6 +118,17 @@ statuses = (
     "Cancelled By Patient",
     "Cancelled By Clinician",
 )
+# Full-text search tables: (search table, source table, key, indexed columns)
+search_tables = (
+    ("JournalSearch", "JournalEntries", "entry_id", ("text",)),
+    ("MoodSearch", "MoodEntries", "entry_id", ("text",)),
+    (
+        "AppointmentSearch",
+        "Appointments",
+        "appointment_id",
+        ("patient_notes", "clinician_notes"),
+    ),
+)
 
 
 def dict_factory(cursor: sqlite3.Cursor, row: sqlite3.Row):
@@ -156,90 +172,62 @@ class Database:
     connection: sqlite3.Connection
     cursor: sqlite3.Cursor
 
-    def __init__(self):
-        # Connect to the database and make the connection and cursor available
+    def __init__(
+        self,
+        path: str = "breeze.db",
+        create_default_users: bool = True,
+        check_same_thread: bool = True,
+        instrument: Union[bool, None] = None,
+    ):
+        # Query timing (see database/instrumentation.py) is turned on from the
+        # environment unless asked for, and only then imported. Tracing
+        # screens needs it too.
+        if instrument is None:
+            instrument = any(
+                os.environ.get(variable, "") not in ("", "0")
+                for variable in ("BREEZE_QUERY_STATS", "BREEZE_TRACE")
+            )
+        factory = sqlite3.Connection
+        if instrument:
+            from database.instrumentation import InstrumentedConnection
+
+            factory = InstrumentedConnection
+
+        # Connect to the database and make the connection and cursor available.
+        # Connections handed between threads (see database/pool.py) turn off
+        # sqlite3's same thread check, only one thread uses them at a time.
         self.connection = sqlite3.connect(
-            "breeze.db", detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES
+            path,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            check_same_thread=check_same_thread,
+            factory=factory,
         )
+        DB_CONNECTIONS_OPEN.inc()
         self.connection.row_factory = dict_factory
         self.cursor = self.connection.cursor()
         self.connection.execute("PRAGMA foreign_keys = ON")
-        self.__setup_tables()
-        self.__create_default_users()
-
-    def __setup_tables(self):
-        # Users Table
-        self.cursor.execute(
-            f"""
-            CREATE TABLE IF NOT EXISTS Users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT NOT NULL UNIQUE,
-                password TEXT NOT NULL,
-                first_name TEXT,
-                surname TEXT,
-                email TEXT NOT NULL UNIQUE,
-                role TEXT CHECK( role IN {roles} ),
-                is_active BOOLEAN NOT NULL
-            )"""
-        )
 
-        # Patient Information Table
-        self.cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS Patients (
-                user_id INTEGER PRIMARY KEY,
-                emergency_email TEXT,
-                date_of_birth DATETIME,
-                diagnosis TEXT CHECK( diagnosis IN {diagnoses} ),
-                clinician_id INTEGER,
-                FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE CASCADE,
-                FOREIGN KEY (clinician_id) REFERENCES Users(user_id) ON DELETE SET NULL
-            )
-        """)
+        # Warm starts on an up to date database skip the migrations and
+        # seeding entirely, so they don't touch any table
+        version = self.connection.execute("PRAGMA user_version").fetchone()
+        if version < latest_version():
+            # Only report progress when upgrading an existing database
+            migrate(self.connection, verbose=version > 0)
+            # Seeding only happens the first time a database is set up, so
+            # users deleted later are not recreated. Generated databases
+            # (see database/generator.py) skip the demo users.
+            if version == 0 and create_default_users:
+                self.__create_default_users()
 
-        # Journal Table
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS JournalEntries (
-                entry_id INTEGER PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                date DATETIME NOT NULL,
-                text TEXT,
-                FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE CASCADE
-            )
-        """)
-
-        # Mood Table (Mood + Text)
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS MoodEntries (
-                entry_id INTEGER PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                date DATETIME NOT NULL,
-                mood INTEGER NOT NULL,
-                text TEXT,
-                FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE CASCADE
-            )
-        """)
-
-        # Appointments Table
-        self.cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS Appointments (
-                appointment_id INTEGER PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                clinician_id INTEGER,
-                date DATETIME NOT NULL,
-                status TEXT NOT NULL CHECK( status IN {statuses} ),
-                patient_notes TEXT,
-                clinician_notes TEXT,            
-                FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE CASCADE,
-                FOREIGN KEY (clinician_id) REFERENCES Users(user_id) ON DELETE SET NULL
-            )
-        """)
-
-        self.connection.commit()
+    def __has_rows(self, table: str) -> bool:
+        """Checks whether a table has any rows without scanning it"""
+        return bool(
+            self.cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {table})").fetchone()
+        )
 
     def __create_default_users(self):
         # Create the default users if the users table is empty
-        users = self.cursor.execute("SELECT username FROM Users")
-        if len(users.fetchall()) == 0:
+        if not self.__has_rows("Users"):
             users = [
                 (1, "admin1", "", "Admin", "Admin", "admin1@email.com", "admin", True),
                 (
@@ -510,8 +498,7 @@ class Database:
 
             # Check if previous entries of journal.
             # Add entries if there is not.
-            journal_entries = self.cursor.execute("SELECT user_id FROM JournalEntries")
-            if len(journal_entries.fetchall()) == 0:
+            if not self.__has_rows("JournalEntries"):
                 journal_entries = [
                     (
                         1,
@@ -946,8 +933,7 @@ class Database:
 
             # Check if there is previous entries of mood.
             # Add entries if there is not.
-            MoodEntries = self.cursor.execute("SELECT user_id FROM MoodEntries")
-            if len(MoodEntries.fetchall()) == 0:
+            if not self.__has_rows("MoodEntries"):
                 MoodEntries = [
                     (1, 2, old_day(5), 6, "Happy about university grades."),
                     (2, 2, old_day(4), 6, "Been watching tv."),
@@ -1043,8 +1029,7 @@ class Database:
                     "INSERT INTO MoodEntries VALUES(?, ?, ?, ?, ?)", MoodEntries
                 )
 
-            appointments = self.cursor.execute("SELECT user_id FROM Appointments")
-            if len(appointments.fetchall()) == 0:
+            if not self.__has_rows("Appointments"):
                 appointments = [
                     (
                         1,
@@ -1217,4 +1202,7 @@ class Database:
 
     def close(self):
         if self.connection:
+            # Records the cursor's last statement if queries are timed
+            self.cursor.close()
             self.connection.close()
+            DB_CONNECTIONS_OPEN.dec()
@@ -1,15 +1,17 @@
 from datetime import datetime
 import sqlite3
-from typing import Any
+from typing import Any, Union
 from database.setup import Database, diagnoses
 from modules.user import User
-from modules.patient import Patient
-from modules.clinician import Clinician
+from modules.user_service import UserService
 from modules.utilities.display_utils import (
+    TableColumn,
     clear_terminal,
     display_choice,
+    display_table,
     wait_terminal,
 )
+from modules.utilities.tracing import traced
 from modules.utilities.input_utils import (
     get_new_user_email,
     get_new_username,
@@ -19,16 +21,40 @@ from modules.utilities.input_utils import (
     get_valid_yes_or_no,
     get_valid_email,
 )
-from modules.utilities.dataframe_utils import filter_df_by_date
 from modules.appointments import display_appointment_engagement
+from modules.report_cube import AppointmentCube
+from modules.report_service import ReportService, get_report_periods
 import pandas as pd
 
 
+QUERY_STATS_COLUMNS = [
+    TableColumn("Statement", max_width=70),
+    TableColumn("Calls", align="right"),
+    TableColumn("Total ms", lambda seconds: f"{seconds * 1000:.1f}", "right"),
+    TableColumn("p50 ms", lambda seconds: f"{seconds * 1000:.2f}", "right"),
+    TableColumn("p99 ms", lambda seconds: f"{seconds * 1000:.2f}", "right"),
+    TableColumn("Rows", align="right"),
+    TableColumn("Slow", align="right"),
+]
+
+
+def display_dataframe(df: pd.DataFrame, title: Union[str, None] = None) -> None:
+    """
+    Displays a dataframe with its index as the first column, one page at a
+    time rather than printing it whole
+    """
+    # Missing values become None, as pandas' NA can't be compared
+    rows = df.astype(object).where(df.notna(), None).itertuples(name=None)
+    columns = [TableColumn(df.index.name or "id", align="right")]
+    columns.extend(TableColumn(str(column)) for column in df.columns)
+    display_table(rows, columns, title)
+
+
 class Admin(User):
     user_df: pd.DataFrame
-    appointments_df: pd.DataFrame
-    patient_moods_df: pd.DataFrame
     patient_journals_df: pd.DataFrame
+    # Built the first time appointments are viewed
+    appointment_cube: Union[AppointmentCube, None] = None
 
     def __init__(
         self,
@@ -53,9 +79,7 @@ class Admin(User):
             is_active,
         )
         self.refresh_user_df()
-        self.refresh_appointments_df()
         self.refresh_patient_journals_df()
-        self.refresh_patient_moods()
 
     def refresh_user_df(self):
         """
@@ -86,20 +110,6 @@ class Admin(User):
         )
         self.user_df.set_index("user_id", inplace=True)
 
-    def refresh_appointments_df(self):
-        """
-        Retrieves an updated version of the appointments table from SQL and
-        presents it in Pandas
-        """
-        appointments_query = self.database.cursor.execute("""
-        SELECT *
-        FROM Appointments;""")
-
-        appointments_data = appointments_query.fetchall()
-        self.appointments_df = pd.DataFrame(appointments_data)
-        if not self.appointments_df.empty:
-            self.appointments_df.set_index("appointment_id", inplace=True)
-
     def refresh_patient_journals_df(self):
         """
         Retrieves an updated version of the patients journal table from SQL
@@ -115,19 +125,7 @@ class Admin(User):
         if not self.patient_journals_df.empty:
             self.patient_journals_df.set_index("entry_id", inplace=True)
 
-    def refresh_patient_moods(self):
-        """
-        Retrieves an updated version of the patient moods table from SQL and
-        presents it in Pandas
-        """
-
-        moods_query = self.database.cursor.execute("""
-        SELECT * 
-        FROM MoodEntries;""")
-
-        moods_data = moods_query.fetchall()
-        self.patient_moods_df = pd.DataFrame(moods_data)
-
+    @traced
     def view_table(
         self, user_type: str, sub_type: str = "none", time_frame: str = "none"
     ) -> tuple[pd.Index, pd.Index]:
@@ -141,8 +139,7 @@ class Admin(User):
             patient_df = patient_df.filter(
                 items=["username", "email", "name", "is_active"]
             )
-            print("\nBreeze Patients:")
-            print(patient_df)
+            display_dataframe(patient_df, "\nBreeze Patients:")
             return (patient_df.index, patient_df.columns)
 
         elif user_type == "clinicians" and sub_type == "none" and time_frame == "none":
@@ -150,8 +147,7 @@ class Admin(User):
             clinician_df = clinician_df.filter(
                 items=["username", "email", "name", "is_active"]
             )
-            print("\nBreeze Clinicians:")
-            print(clinician_df)
+            display_dataframe(clinician_df, "\nBreeze Clinicians:")
             return clinician_df.index, clinician_df.columns
 
         elif (
@@ -165,8 +161,9 @@ class Admin(User):
             unregistered_patient_df = unregistered_patient_df.filter(
                 items=["username", "email", "name", "is_active", "clinician_id"]
             )
-            print("\nPatients without a clinician assigned:")
-            print(unregistered_patient_df)
+            display_dataframe(
+                unregistered_patient_df, "\nPatients without a clinician assigned:"
+            )
             return unregistered_patient_df.index, unregistered_patient_df.columns
 
         elif (
@@ -188,8 +185,7 @@ class Admin(User):
             registration_df = pd.merge(
                 clinician_df, patient_df, left_index=True, right_on="clinician_id"
             )
-            print("\nBreeze Clinicians:")
-            print(registration_df)
+            display_dataframe(registration_df, "\nBreeze Clinicians:")
             return registration_df.index, registration_df.columns
 
         elif (
@@ -197,35 +193,27 @@ class Admin(User):
             and sub_type == "appointments"
             and time_frame == "current week"
         ):
-            # Filtering the appointments table by the current week
-            relative_time, time_period = time_frame.split()
-            current_appointments_df = filter_df_by_date(
-                self.appointments_df, relative_time, time_period
+            # Confirmed appointments per clinician, from the week's rollup
+            period, first, last = get_report_periods(*time_frame.split())
+            counts = ReportService(self.database).get_appointment_counts(
+                "clinician", period, first, last, status="Confirmed"
             )
-
-            # Grouping appointments by clinician
-            partial_appointments_df = (
-                current_appointments_df.query('status == "Confirmed"')
-                .groupby(("clinician_id"))
-                .agg({"user_id": "count"})
-                .rename(columns={"user_id": "Appointments this week"})
+            clinician_appointments_df = pd.DataFrame(
+                counts, columns=["user_id", "username", "appointments"]
+            ).rename(
+                columns={
+                    "user_id": "clinician_id",
+                    "appointments": "Appointments this week",
+                }
             )
-
-            # Merging with main user_df to get more attributes
-            clinician_appointments_df = pd.merge(
-                self.user_df,
-                partial_appointments_df,
-                left_index=True,
-                right_on="clinician_id",
-            )[["username", "Appointments this week"]]
-            print(clinician_appointments_df)
+            clinician_appointments_df.set_index("clinician_id", inplace=True)
+            display_dataframe(clinician_appointments_df)
             return clinician_appointments_df.index, clinician_appointments_df.columns
 
         # else assumes user_type == "users"
         else:
             if sub_type == "none":
-                print("\nBreeze Users:")
-                print(self.user_df)
+                display_dataframe(self.user_df, "\nBreeze Users:")
                 return self.user_df.index, self.user_df.columns
             else:
                 if sub_type == "active":
@@ -236,8 +224,7 @@ class Admin(User):
                     query = "user_id != 0"
                 users_df = self.user_df.query(query)
                 users_df = users_df.filter(items=["username", "email", "name", "role"])
-                print(f"\n{sub_type.capitalize()} Breeze Users:")
-                print(users_df)
+                display_dataframe(users_df, f"\n{sub_type.capitalize()} Breeze Users:")
                 return users_df.index, users_df.columns
 
     def alter_user(
@@ -246,53 +233,34 @@ class Admin(User):
         """
         Executes the query to update the relevant entry in the database
         """
-        # Selecting the relevant attributes of the relevant row of the
-        # dataframe
-        user_info = self.user_df.loc[
-            user_id,
-            ["username", "first_name", "surname", "email", "is_active", "role"],
-        ]
+        label = attribute.replace("_", " ").capitalize()
+        try:
+            UserService(self.database).update_user(user_id, attribute, value)
+        # If the attribute can't be changed or there is an error with the query
+        except (ValueError, sqlite3.OperationalError) as e:
+            print(f"There was an error updating the {label}.\n Error: {e}")
+            return False
 
-        # Unpacking the attributes and instantiating a user object to edit
-        # itself in the database.
-        user, first_name, surname, email, is_active, role = user_info
-        altered_user_data = {
-            "user_id": user_id,
-            "username": user,
-            "first_name": first_name,
-            "surname": surname,
-            "email": email,
-            "is_active": is_active,
-            "role": role,
-        }
-        if role == "patient":
-            altered_user = Patient(self.database, **altered_user_data)
-        elif role == "clinician":
-            altered_user = Clinician(self.database, **altered_user_data)
-        else:
-            altered_user = User(self.database, **altered_user_data)
-        result = altered_user.edit_info(attribute, value, success_message)
+        print(success_message or f"{label} updated successfully.")
         self.refresh_user_df()
-        return result
+        return True
 
     def delete_user(self, user_id: int):
         """
         Executes the query to delete the relevant user in the database
         """
         try:
-            self.database.cursor.execute(
-                "DELETE FROM Users WHERE user_id = ?", (user_id,)
-            )
-            self.database.connection.commit()
+            deleted = UserService(self.database).delete_user(user_id)
             self.refresh_user_df()
-            # Return true as the operation was completed successfully
-            return True
+            # Return whether the user existed and was deleted
+            return deleted
 
         # If there is an error with the query
         except sqlite3.OperationalError:
             print("Error updating, likely you selected an invalid user_id")
             return False
 
+    @traced
     def assign_patient_flow(self) -> bool:
         """
         Assigns a patient to a clinician, returns bool with the result
@@ -343,6 +311,7 @@ class Admin(User):
             print("Error assigning patient to clinician.")
             return wait_terminal()
 
+    @traced
     def edit_user_flow(self) -> bool:
         """
         Logic to edit any user in the database
@@ -448,6 +417,7 @@ class Admin(User):
         )
         return wait_terminal(return_value=result)
 
+    @traced
     def disable_user_flow(self) -> bool:
         """
         Logic to disable or re-enable a user
@@ -499,6 +469,7 @@ class Admin(User):
             result = False
         wait_terminal(return_value=result)
 
+    @traced
     def delete_user_flow(self) -> bool:
         """
         Logic to delete a user
@@ -535,11 +506,18 @@ class Admin(User):
             print("\nCancelled.")
         return wait_terminal()
 
+    @traced
     def appointments_flow(self) -> bool:
         """
         Logic to see a user's appointments information, filtered by user choice
         """
 
+        # The reports below are slices of the cube, brought up to date once
+        if self.appointment_cube is None:
+            self.appointment_cube = AppointmentCube(self.database)
+        else:
+            self.appointment_cube.refresh()
+
         clear_terminal()
         print("\nView appointments\n")
         # Establishing a loop and variables for redirect at the end
@@ -625,6 +603,7 @@ class Admin(User):
                 filter_id,
                 relative_time,
                 time_period,
+                self.appointment_cube,
             )
             print(appointments)
 
@@ -655,6 +634,73 @@ class Admin(User):
             else:
                 return wait_terminal()
 
+    @traced
+    def query_stats_flow(self) -> bool:
+        """Shows which SQL statements took the most time since startup"""
+        # Only imported by Database when query timing is turned on
+        from database.instrumentation import InstrumentedConnection, get_query_stats
+
+        clear_terminal()
+        if not isinstance(self.database.connection, InstrumentedConnection):
+            print(
+                "Query statistics are off. Start Breeze with BREEZE_QUERY_STATS=1 "
+                + "to collect them."
+            )
+            return wait_terminal()
+
+        stats = get_query_stats()
+        rows = [
+            (
+                statement.statement,
+                statement.count,
+                statement.total,
+                statement.percentile(50),
+                statement.percentile(99),
+                statement.rows,
+                statement.slow,
+            )
+            for statement in stats.summary()
+        ]
+        display_table(
+            rows,
+            QUERY_STATS_COLUMNS,
+            f"SQL statements by total time (slow: over {stats.slow_seconds * 1000:.0f} ms, "
+            + f"logged to {stats.slow_log})",
+        )
+        if get_valid_yes_or_no("Reset the statistics? (Y/N): "):
+            stats.reset()
+        return wait_terminal()
+
+    @traced
+    def mood_trends_flow(self) -> bool:
+        """
+        Shows the recent moods of every patient, with their clinician, lowest
+        weekly average first
+        """
+        from modules.mood_analytics import STATISTIC_COLUMNS, MoodAnalytics
+
+        clear_terminal()
+        trends = MoodAnalytics(self.database).get_trends().latest()
+        names = self.database.cursor.execute(
+            """
+            SELECT p.user_id, u.first_name || ' ' || u.surname AS patient,
+                c.first_name || ' ' || c.surname AS clinician
+            FROM Patients p
+            JOIN Users u ON u.user_id = p.user_id
+            LEFT JOIN Users c ON c.user_id = p.clinician_id
+            """
+        ).fetchall()
+        display_table(
+            (
+                (row["patient"], row["clinician"], *trends[row["user_id"]])
+                for row in names
+            ),
+            [TableColumn("Patient"), TableColumn("Clinician"), *STATISTIC_COLUMNS],
+            "Mood trends over the last 7 and 30 days",
+            sort_by=2,
+        )
+        return wait_terminal()
+
     # Admin FLow
     def flow(self) -> bool:
         while True:
@@ -669,6 +715,8 @@ class Admin(User):
                 "Disable or Re-enable User",
                 "Delete User",
                 "View Appointments",
+                "Query Statistics",
+                "Mood Trends",
             ]
 
             # Menu choices
@@ -706,6 +754,14 @@ class Admin(User):
             elif selection == 6:
                 self.appointments_flow()
 
+            # Time spent on each SQL statement
+            elif selection == 7:
+                self.query_stats_flow()
+
+            # Every patient's recent moods
+            elif selection == 8:
+                self.mood_trends_flow()
+
             # Exit
             elif selection == 0:
                 print("Goodbye Admin.")
@@ -0,0 +1,688 @@
+"""
+JSON HTTP API over the Breeze services, for web and mobile clients.
+
+Requests and responses are JSON. After POST /login, every request carries
+the returned token in an "Authorization: Bearer <token>" header.
+
+    POST /login                      {"username", "password"} -> {"token", "user"}
+    POST /logout
+    GET  /moods                      ?day=YYYY-MM-DD &patient_id= &limit= &after=
+    POST /moods                      {"mood": 1-6, "text"}, today's mood
+    GET  /journals                   ?day=YYYY-MM-DD &patient_id= &limit= &after=
+    POST /journals                   {"text"}
+    GET  /appointments               a patient's appointments (&limit= &after=),
+                                     or the requests awaiting a clinician
+    GET  /appointments/slots         ?day=YYYY-MM-DD, free slots with one's clinician
+    POST /appointments               {"date": "YYYY-MM-DDTHH:MM", "notes"}
+    POST /appointments/<id>/cancel   patients
+    POST /appointments/<id>/confirm  clinicians
+    POST /appointments/<id>/reject   clinicians
+    GET  /reports/engagement         admins, ?by=clinician|patient &user_id=
+                                     &relative_time= &time_period=
+    GET  /metrics                    with --metrics, the counters of
+                                     modules/utilities/metrics.py, no login
+
+Patients see their own moods and journals. Clinicians pass the patient_id
+of one of their patients, admins any patient_id. Lists come a page at a
+time: "next" in the response is passed as "after" for the following page.
+Unlike the terminal flows, answering appointments doesn't send emails.
+
+Each request borrows a connection from a pool for as long as it runs. GET
+responses have an ETag, so clients can revalidate with If-None-Match and
+get a bodyless 304. They are also cached for a few seconds (--cache-seconds).
+A change made through the API drops the cached responses it may affect at
+once, and changes made elsewhere (the terminal app) show within that time.
+Changes go through one at a time, rather than retrying on SQLite's lock.
+
+From the repository root:
+    python -m modules.api [--host 127.0.0.1] [--port 8080] [--database breeze.db]
+"""
+
+import hashlib
+import json
+import re
+import secrets
+import sqlite3
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Union
+from urllib.parse import parse_qs, urlsplit
+
+from database.pool import ConnectionPool, PoolTimeout
+from database.setup import Database
+from modules.appointment_service import AppointmentService
+from modules.export import parse_day
+from modules.journal_service import JournalService
+from modules.mood_service import MoodService
+from modules.user_service import UserService
+from modules.utilities.metrics import (
+    API_REQUESTS,
+    CACHE_REQUESTS,
+    DB_LOCK_TIMEOUTS,
+    DB_LOCK_WAIT_SECONDS,
+    DB_LOCK_WAITS,
+    registry,
+)
+from modules.utilities.pagination import KeysetPaginator
+
+ROLES = ("admin", "clinician", "patient")
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+# What body fields of each type are called in errors
+JSON_TYPES = {str: "a string", int: "a whole number"}
+
+
+class ApiError(Exception):
+    """An error response, with its HTTP status"""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Request:
+    params: dict[str, str]
+    body: dict[str, Any]
+    token: Union[str, None]
+    user: Union[dict[str, Any], None]
+    db: Database
+    # Groups captured by the route's pattern, such as an appointment id
+    arguments: tuple[str, ...] = ()
+
+    def param(self, name: str, convert: Callable = str, default: Any = None) -> Any:
+        """A query string parameter, converted, or the default if not given"""
+        if name not in self.params:
+            return default
+        try:
+            return convert(self.params[name])
+        except ValueError:
+            raise ApiError(400, f"Invalid {name}: {self.params[name]}")
+
+    def field(
+        self,
+        name: str,
+        kind: type = str,
+        convert: Union[Callable, None] = None,
+        required: bool = True,
+    ) -> Any:
+        """
+        A field of the JSON body, which must be of the JSON type kind (so
+        true isn't taken for 1, nor null for "None"), then converted
+        """
+        value = self.body.get(name)
+        if value is None:
+            if required:
+                raise ApiError(400, f"Missing {name}.")
+            return None
+        if type(value) is not kind:
+            raise ApiError(400, f"Invalid {name}: expected {JSON_TYPES[kind]}.")
+        if convert is None:
+            return value
+        try:
+            return convert(value)
+        except (TypeError, ValueError):
+            raise ApiError(400, f"Invalid {name}: {value}")
+
+    @property
+    def page_size(self) -> int:
+        return max(1, min(self.param("limit", int, DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+
+
+@dataclass
+class Route:
+    method: str
+    pattern: re.Pattern
+    handler: Callable[["Api", Request], Any]
+    roles: tuple[str, ...]
+    changes_data: bool
+
+
+ROUTES: list[Route] = []
+
+
+def route(
+    method: str,
+    path: str,
+    roles: tuple[str, ...] = ROLES,
+    changes_data: bool = True,
+) -> Callable:
+    """
+    Registers a handler for requests to a path (a regular expression). Only
+    logged in users with one of the roles may call it, anyone if roles is
+    empty. Successful POSTs drop stale responses from the cache unless they
+    don't change any data.
+    """
+
+    def register(handler: Callable[["Api", Request], Any]) -> Callable:
+        ROUTES.append(
+            Route(method, re.compile(f"^{path}$"), handler, roles, changes_data)
+        )
+        return handler
+
+    return register
+
+
+class Sessions:
+    """Tokens of logged in users, which expire after a number of hours"""
+
+    def __init__(self, hours: float) -> None:
+        self.lifetime = hours * 3600
+        self.users: dict[str, tuple[dict[str, Any], float]] = {}
+        self.lock = threading.Lock()
+
+    def start(self, user: dict[str, Any]) -> str:
+        token = secrets.token_urlsafe(32)
+        with self.lock:
+            self.users[token] = (user, time.monotonic() + self.lifetime)
+        return token
+
+    def get(self, token: str) -> Union[dict[str, Any], None]:
+        with self.lock:
+            user, expires = self.users.get(token, (None, 0))
+            if user and expires < time.monotonic():
+                del self.users[token]
+                return None
+            return user
+
+    def end(self, token: str) -> None:
+        with self.lock:
+            self.users.pop(token, None)
+
+
+class ResponseCache:
+    """The most recent GET response bodies, with their ETags"""
+
+    def __init__(self, seconds: float, max_entries: int = 4096) -> None:
+        self.seconds = seconds
+        self.max_entries = max_entries
+        self.entries: OrderedDict[Any, tuple[str, bytes, float]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Any) -> Union[tuple[str, bytes], None]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry:
+                return None
+            if entry[2] < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def put(self, key: Any, etag: str, body: bytes) -> None:
+        if self.seconds <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (etag, body, time.monotonic() + self.seconds)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user: dict[str, Any]) -> None:
+        """
+        Drops the responses a change by the user may have made stale: their
+        own, those of clinicians and admins, and free slots, which depend on
+        other patients' bookings. Other patients' responses are kept.
+        """
+        with self.lock:
+            if user["role"] != "patient":
+                self.entries.clear()
+                return
+            stale = [
+                key
+                for key in self.entries
+                if key[0] == user["user_id"]
+                or key[1] != "patient"
+                or key[2].startswith("/appointments/slots")
+            ]
+            for key in stale:
+                del self.entries[key]
+
+
+def to_json(value: Any) -> str:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode(result: Any) -> bytes:
+    return json.dumps(result, default=to_json).encode()
+
+
+def parse_cursor(value: str) -> tuple[str, int]:
+    """Reads the "after" parameter: the date and key of the last row seen"""
+    day, _, key = value.rpartition("|")
+    if not day:
+        raise ValueError(value)
+    return day, int(key)
+
+
+def page_response(pages: KeysetPaginator) -> dict[str, Any]:
+    start = pages.next_start
+    return {
+        "items": [
+            {
+                column: value
+                for column, value in row.items()
+                if column not in ("page_date", "page_key")
+            }
+            for row in pages.page
+        ],
+        "next": f"{start[0]}|{start[1]}" if start else None,
+    }
+
+
+def patient_in_scope(request: Request) -> int:
+    """
+    The patient whose data is requested: patients themselves, one of a
+    clinician's patients or, for admins, anyone
+    """
+    user = request.user
+    if user["role"] == "patient":
+        return user["user_id"]
+
+    patient_id = request.param("patient_id", int)
+    if patient_id is None:
+        raise ApiError(400, "Missing patient_id.")
+    if user["role"] == "clinician":
+        clinician_id = request.db.cursor.execute(
+            "SELECT clinician_id FROM Patients WHERE user_id = ?", (patient_id,)
+        ).fetchone()
+        if clinician_id != user["user_id"]:
+            raise ApiError(403, "This patient is not registered with you.")
+    return patient_id
+
+
+def registered_clinician(request: Request) -> int:
+    clinician_id = request.db.cursor.execute(
+        "SELECT clinician_id FROM Patients WHERE user_id = ?",
+        (request.user["user_id"],),
+    ).fetchone()
+    if not clinician_id:
+        raise ApiError(400, "You do not have an assigned clinician.")
+    return clinician_id
+
+
+@route("POST", "/login", roles=(), changes_data=False)
+def login(api: "Api", request: Request) -> dict[str, Any]:
+    user = UserService(request.db).authenticate(
+        request.field("username"), request.field("password")
+    )
+    if not user:
+        raise ApiError(401, "Invalid username or password.")
+    if not user["is_active"]:
+        raise ApiError(
+            403, "Your account is currently inactive. Please contact an administrator."
+        )
+    return {"token": api.sessions.start(user), "user": user}
+
+
+@route("POST", "/logout", changes_data=False)
+def logout(api: "Api", request: Request) -> dict[str, Any]:
+    api.sessions.end(request.token)
+    return {}
+
+
+@route("GET", "/moods")
+def get_moods(api: "Api", request: Request) -> dict[str, Any]:
+    return page_response(
+        MoodService(request.db).get_entries(
+            patient_in_scope(request),
+            request.param("day", parse_day),
+            request.page_size,
+            request.param("after", parse_cursor),
+        )
+    )
+
+
+@route("POST", "/moods", roles=("patient",))
+def record_mood(api: "Api", request: Request) -> dict[str, Any]:
+    result = MoodService(request.db).record_mood(
+        request.user["user_id"],
+        request.field("mood", int),
+        request.field("text", required=False) or "",
+    )
+    return {"result": result}
+
+
+@route("GET", "/journals")
+def get_journals(api: "Api", request: Request) -> dict[str, Any]:
+    return page_response(
+        JournalService(request.db).get_entries(
+            patient_in_scope(request),
+            request.param("day", parse_day),
+            request.page_size,
+            request.param("after", parse_cursor),
+        )
+    )
+
+
+@route("POST", "/journals", roles=("patient",))
+def add_journal_entry(api: "Api", request: Request) -> dict[str, Any]:
+    entry_id = JournalService(request.db).add_entry(
+        request.user["user_id"], request.field("text")
+    )
+    return {"entry_id": entry_id}
+
+
+@route("GET", "/appointments", roles=("patient", "clinician"))
+def get_appointments(api: "Api", request: Request) -> dict[str, Any]:
+    appointments = AppointmentService(request.db)
+    if request.user["role"] == "clinician":
+        return {
+            "items": appointments.get_requested(request.user["user_id"]),
+            "next": None,
+        }
+    return page_response(
+        appointments.get_patient_appointments(
+            request.user["user_id"],
+            request.page_size,
+            request.param("after", parse_cursor),
+        )
+    )
+
+
+@route("GET", "/appointments/slots", roles=("patient",))
+def get_slots(api: "Api", request: Request) -> dict[str, Any]:
+    day = request.param("day", parse_day)
+    if not day:
+        raise ApiError(400, "Missing day.")
+    slots = AppointmentService(request.db).get_available_slots(
+        registered_clinician(request), day
+    )
+    return {"slots": slots}
+
+
+@route("POST", "/appointments", roles=("patient",))
+def request_appointment(api: "Api", request: Request) -> dict[str, Any]:
+    appointment_id = AppointmentService(request.db).request(
+        request.user["user_id"],
+        registered_clinician(request),
+        request.field("date", convert=datetime.fromisoformat),
+        request.field("notes", required=False) or "",
+    )
+    return {"appointment_id": appointment_id}
+
+
+@route("POST", r"/appointments/(\d+)/cancel", roles=("patient",))
+def cancel_appointment(api: "Api", request: Request) -> dict[str, Any]:
+    appointment_id = int(request.arguments[0])
+    if not AppointmentService(request.db).cancel_by_patient(
+        appointment_id, request.user["user_id"]
+    ):
+        raise ApiError(404, f"You have no appointment {appointment_id}.")
+    return {"appointment_id": appointment_id}
+
+
+@route("POST", r"/appointments/(\d+)/(confirm|reject)", roles=("clinician",))
+def respond_to_appointment(api: "Api", request: Request) -> dict[str, Any]:
+    appointment_id, action = request.arguments
+    return AppointmentService(request.db).respond(
+        int(appointment_id), request.user["user_id"], action == "confirm"
+    )
+
+
+@route("GET", "/reports/engagement", roles=("admin",))
+def engagement_report(api: "Api", request: Request) -> dict[str, Any]:
+    # Imports pandas, so only once the first report is asked for
+    from modules.appointments import get_engagement_rows
+
+    by = request.param("by", default="clinician")
+    relative_time = request.param("relative_time", default="none")
+    time_period = request.param("time_period", default="none")
+    if by not in ("clinician", "patient"):
+        raise ApiError(400, f"Invalid by: {by}")
+    if relative_time not in ("current", "next", "last", "none"):
+        raise ApiError(400, f"Invalid relative_time: {relative_time}")
+    if time_period not in ("year", "month", "week", "day", "none"):
+        raise ApiError(400, f"Invalid time_period: {time_period}")
+
+    return {
+        "rows": get_engagement_rows(
+            request.db, by, request.param("user_id", int), relative_time, time_period
+        )
+    }
+
+
+class Api:
+    def __init__(
+        self, pool: ConnectionPool, cache_seconds: float, session_hours: float
+    ) -> None:
+        self.pool = pool
+        self.sessions = Sessions(session_hours)
+        self.cache = ResponseCache(cache_seconds)
+        self.write_lock = threading.Lock()
+
+    def find_route(self, method: str, path: str) -> tuple[Route, tuple[str, ...]]:
+        allowed = False
+        for candidate in ROUTES:
+            match = candidate.pattern.match(path)
+            if match:
+                if candidate.method == method:
+                    return candidate, match.groups()
+                allowed = True
+        if allowed:
+            raise ApiError(405, f"{method} is not allowed on {path}.")
+        raise ApiError(404, f"There is nothing at {path}.")
+
+    def run(self, found: Route, request_parts: dict[str, Any]) -> bytes:
+        try:
+            with self.pool.connection() as db:
+                return encode(found.handler(self, Request(db=db, **request_parts)))
+        except PoolTimeout:
+            raise ApiError(503, "The server is busy, please try again.")
+        except ValueError as e:
+            # The services raise ValueError for requests they can't carry out
+            raise ApiError(400, str(e))
+        except sqlite3.IntegrityError as e:
+            raise ApiError(409, str(e))
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e):
+                DB_LOCK_TIMEOUTS.inc()
+            raise
+
+    @contextmanager
+    def writing(self) -> Iterator[None]:
+        """Holds the writer lock, counting the time spent waiting for it"""
+        if not self.write_lock.acquire(blocking=False):
+            DB_LOCK_WAITS.inc(lock="writer")
+            started = time.perf_counter()
+            self.write_lock.acquire()
+            DB_LOCK_WAIT_SECONDS.inc(time.perf_counter() - started, lock="writer")
+        try:
+            yield
+        finally:
+            self.write_lock.release()
+
+    def handle(
+        self, method: str, target: str, headers: Any, body: bytes
+    ) -> tuple[int, dict[str, str], bytes]:
+        """Returns the status, extra headers and body of the response"""
+        url = urlsplit(target)
+        try:
+            found, arguments = self.find_route(method, url.path)
+
+            token = None
+            authorization = headers.get("Authorization", "")
+            if authorization.startswith("Bearer "):
+                token = authorization[len("Bearer ") :]
+            user = self.sessions.get(token) if token else None
+            if found.roles:
+                if not user:
+                    raise ApiError(401, "Please log in.")
+                if user["role"] not in found.roles:
+                    raise ApiError(403, "You are not allowed to do that.")
+
+            if body:
+                try:
+                    fields = json.loads(body)
+                except ValueError:
+                    raise ApiError(400, "The body is not valid JSON.")
+                if not isinstance(fields, dict):
+                    raise ApiError(400, "The body must be a JSON object.")
+            else:
+                fields = {}
+
+            request_parts = {
+                "params": {
+                    name: values[-1] for name, values in parse_qs(url.query).items()
+                },
+                "body": fields,
+                "token": token,
+                "user": user,
+                "arguments": arguments,
+            }
+
+            if method != "GET":
+                if not found.changes_data:
+                    return 200, {}, self.run(found, request_parts)
+                # Waiting for the lock is fairer and quicker than SQLite's busy
+                # timeout, which sleeps for longer and longer between retries
+                with self.writing():
+                    response = self.run(found, request_parts)
+                self.cache.invalidate(user)
+                return 200, {}, response
+
+            # Responses depend on who asks, so they are cached per user
+            key = (
+                (user["user_id"], user["role"], target)
+                if user
+                else (None, None, target)
+            )
+            cached = self.cache.get(key)
+            CACHE_REQUESTS.inc(cache="api", result="hit" if cached else "miss")
+            if cached:
+                etag, response = cached
+            else:
+                response = self.run(found, request_parts)
+                etag = f'"{hashlib.sha1(response).hexdigest()}"'
+                self.cache.put(key, etag, response)
+
+            if headers.get("If-None-Match") == etag:
+                return 304, {"ETag": etag}, b""
+            return 200, {"ETag": etag, "Cache-Control": "private, no-cache"}, response
+
+        except ApiError as e:
+            return e.status, {}, encode({"error": str(e)})
+        except Exception:
+            traceback.print_exc()
+            return 500, {}, encode({"error": "Something went wrong."})
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    # Keeps connections open between requests
+    protocol_version = "HTTP/1.1"
+    # The headers and the body are separate writes, which Nagle's algorithm
+    # would hold back until the client acknowledges the first
+    disable_nagle_algorithm = True
+    server: "ApiServer"
+
+    def do_GET(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        content_type = "application/json"
+        if self.command == "GET" and self.path == "/metrics" and registry.enabled:
+            # For Prometheus, in its text format rather than JSON
+            status, headers = 200, {}
+            response = registry.render().encode()
+            content_type = "text/plain; version=0.0.4"
+        else:
+            status, headers, response = self.server.api.handle(
+                self.command, self.path, self.headers, body
+            )
+        API_REQUESTS.inc(method=self.command, status=status)
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(response)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(response)
+
+    do_POST = do_GET
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # A line per request would cost more than many requests themselves
+        pass
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for many clients connecting at once
+    request_queue_size = 128
+
+    def __init__(self, address: tuple[str, int], api: Api) -> None:
+        super().__init__(address, ApiRequestHandler)
+        self.api = api
+
+
+def main(
+    host: str,
+    port: int,
+    database: str,
+    pool_size: int,
+    cache_seconds: float,
+    session_hours: float,
+    metrics: bool = False,
+) -> None:
+    if metrics:
+        registry.enable()
+    pool = ConnectionPool(database, size=pool_size)
+    server = ApiServer((host, port), Api(pool, cache_seconds, session_hours))
+    print(
+        f"Serving the Breeze API on http://{host}:{server.server_address[1]}",
+        flush=True,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--database", default="breeze.db")
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=16,
+        help="Database connections shared by requests",
+    )
+    parser.add_argument(
+        "--cache-seconds",
+        type=float,
+        default=5,
+        help="How long GET responses are cached, 0 to turn the cache off",
+    )
+    parser.add_argument("--session-hours", type=float, default=12)
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Serve operational metrics for Prometheus on GET /metrics",
+    )
+    args = parser.parse_args()
+    main(
+        args.host,
+        args.port,
+        args.database,
+        args.pool_size,
+        args.cache_seconds,
+        args.session_hours,
+        args.metrics,
+    )
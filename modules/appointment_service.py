@@ -0,0 +1,210 @@
+from datetime import date, datetime, timedelta
+from typing import Any, Union
+
+from database.setup import Database
+from modules.utilities.date_utils import date_range_condition, get_date_range
+from modules.utilities.metrics import APPOINTMENT_REQUESTS
+from modules.utilities.pagination import KeysetPaginator
+
+# Hours of the day that can be booked, on weekdays
+APPOINTMENT_HOURS = (9, 10, 11, 12, 14, 15, 16)
+# How far ahead appointments can be booked
+BOOKING_WEEKS = 52
+
+
+def get_booking_error(day: datetime) -> Union[str, None]:
+    """Why appointments can't be booked on a day, or None if they can"""
+    if day.weekday() >= 5:
+        return "Your clinician only works Monday-Friday. Please choose a date during the week."
+    if day.date() > date.today() + timedelta(weeks=BOOKING_WEEKS):
+        return "You can only book appointments up to a year in advance."
+    return None
+
+
+class AppointmentService:
+    """
+    Looks up, books and answers appointments without any terminal input or
+    output, so flows, jobs and other front ends share the same logic.
+    """
+
+    database: Database
+
+    def __init__(self, db: Database) -> None:
+        self.database = db
+
+    def get_requested(self, clinician_id: int) -> list[dict[str, Any]]:
+        """Returns the clinician's pending future appointments, soonest first"""
+        return self.database.cursor.execute(
+            """
+            SELECT appointment_id, a.user_id, clinician_id, date,
+                status, patient_notes, clinician_notes,
+                u.first_name, u.surname, u.email AS patient_email
+            FROM Appointments a
+            JOIN Users u ON a.user_id = u.user_id
+            WHERE clinician_id = ? AND status = 'Pending' AND date >= ?
+            ORDER BY date
+            """,
+            (clinician_id, datetime.now()),
+        ).fetchall()
+
+    def count_notifications(self, clinician_id: int) -> dict[str, int]:
+        """
+        The number of the clinician's pending future appointments and of
+        their past appointments without notes, each read from a partial
+        index (see database/migrations/0006_notification_indexes.py)
+        """
+        now = datetime.now()
+        return self.database.cursor.execute(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM Appointments
+                WHERE clinician_id = ? AND status = 'Pending' AND date >= ?)
+                AS requested,
+                (SELECT COUNT(*) FROM Appointments
+                WHERE clinician_id = ?
+                    AND (clinician_notes IS NULL OR clinician_notes = '')
+                    AND date < ?)
+                AS without_notes
+            """,
+            (clinician_id, now, clinician_id, now),
+        ).fetchone()
+
+    def respond(
+        self, appointment_id: int, clinician_id: int, accept: bool
+    ) -> dict[str, Any]:
+        """
+        Confirms or rejects a pending appointment of the clinician and returns
+        it with the patient's details. Raises ValueError if it isn't pending.
+        """
+        self.database.cursor.execute(
+            """
+            UPDATE Appointments
+            SET status = ?
+            WHERE appointment_id = ? AND clinician_id = ? AND status = 'Pending'
+            """,
+            ("Confirmed" if accept else "Rejected", appointment_id, clinician_id),
+        )
+        if self.database.cursor.rowcount == 0:
+            self.database.connection.rollback()
+            raise ValueError(f"Appointment {appointment_id} is not awaiting a response.")
+        self.database.connection.commit()
+
+        return self.database.cursor.execute(
+            """
+            SELECT appointment_id, a.user_id, clinician_id, date, status,
+                u.first_name, u.surname, u.email AS patient_email
+            FROM Appointments a
+            JOIN Users u ON a.user_id = u.user_id
+            WHERE appointment_id = ?
+            """,
+            (appointment_id,),
+        ).fetchone()
+
+    def get_available_slots(self, clinician_id: int, day: datetime) -> list[datetime]:
+        """
+        Returns the clinician's free slots on a day that are still to come,
+        none on days that can't be booked
+        """
+        if get_booking_error(day):
+            return []
+        booked = self.database.cursor.execute(
+            "SELECT date FROM Appointments WHERE clinician_id = ? AND "
+            + date_range_condition(),
+            (clinician_id, *get_date_range(day)),
+        ).fetchall()
+
+        slots = [
+            datetime(day.year, day.month, day.day, hour) for hour in APPOINTMENT_HOURS
+        ]
+        now = datetime.now()
+        return [slot for slot in slots if slot not in booked and slot > now]
+
+    def request(
+        self, patient_id: int, clinician_id: int, slot: datetime, notes: str = ""
+    ) -> int:
+        """
+        Requests an appointment with the patient's clinician in a free slot and
+        returns its id. Raises ValueError if the slot can't be requested.
+        """
+        registered_with = self.database.cursor.execute(
+            "SELECT clinician_id FROM Patients WHERE user_id = ?", (patient_id,)
+        ).fetchone()
+        if registered_with != clinician_id:
+            APPOINTMENT_REQUESTS.inc(result="failed")
+            raise ValueError(
+                "You are not registered with this clinician. Please contact the admin."
+            )
+        booking_error = get_booking_error(slot)
+        if booking_error:
+            APPOINTMENT_REQUESTS.inc(result="failed")
+            raise ValueError(booking_error)
+        if slot not in self.get_available_slots(clinician_id, slot):
+            APPOINTMENT_REQUESTS.inc(result="failed")
+            raise ValueError("That time is no longer available.")
+
+        self.database.cursor.execute(
+            """
+            INSERT INTO Appointments (user_id, clinician_id, date, status, patient_notes)
+            VALUES (?, ?, ?, 'Pending', ?)
+            """,
+            (patient_id, clinician_id, slot, notes),
+        )
+        self.database.connection.commit()
+        APPOINTMENT_REQUESTS.inc(result="requested")
+        return self.database.cursor.lastrowid
+
+    def cancel_by_patient(self, appointment_id: int, patient_id: int) -> bool:
+        """
+        Cancels one of the patient's pending or confirmed appointments that
+        are still to come, returns whether it existed. Raises ValueError if
+        it can't be cancelled any more.
+        """
+        self.database.cursor.execute(
+            """
+            UPDATE Appointments
+            SET status = 'Cancelled By Patient'
+            WHERE appointment_id = ? AND user_id = ? AND date >= ?
+                AND status IN ('Pending', 'Confirmed')
+            """,
+            (appointment_id, patient_id, datetime.now()),
+        )
+        if self.database.cursor.rowcount > 0:
+            self.database.connection.commit()
+            return True
+
+        status = self.database.cursor.execute(
+            "SELECT status FROM Appointments WHERE appointment_id = ? AND user_id = ?",
+            (appointment_id, patient_id),
+        ).fetchone()
+        self.database.connection.rollback()
+        if status is None:
+            return False
+        raise ValueError(
+            f"Appointment {appointment_id} can't be cancelled, only upcoming "
+            + "pending or confirmed appointments can."
+        )
+
+    def get_patient_appointments(
+        self,
+        patient_id: int,
+        page_size: int = 10,
+        after: Union[tuple[str, int], None] = None,
+    ) -> KeysetPaginator:
+        """Pages through all of the patient's appointments, oldest first"""
+        return KeysetPaginator(
+            self.database,
+            "appointment_id, date, patient_notes, status",
+            "Appointments",
+            "user_id = ?",
+            [patient_id],
+            key_column="appointment_id",
+            page_size=page_size,
+            after=after,
+        )
+
+    def get_upcoming_ids(self, patient_id: int) -> list[int]:
+        """Returns the ids of the patient's appointments that are yet to happen"""
+        return self.database.cursor.execute(
+            "SELECT appointment_id FROM Appointments WHERE user_id = ? AND date >= ?",
+            (patient_id, datetime.now()),
+        ).fetchall()
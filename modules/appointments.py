@@ -1,12 +1,20 @@
 import sqlite3
-import pandas as pd
 from datetime import datetime, timedelta
-from typing import Literal
+from typing import TYPE_CHECKING, Any, Literal
 from database.setup import Database
+from modules.appointment_service import (
+    BOOKING_WEEKS,
+    AppointmentService,
+    get_booking_error,
+)
 from modules.utilities.display_utils import display_choice, clear_terminal
-from modules.utilities.dataframe_utils import filter_df_by_date
 from modules.utilities.input_utils import get_valid_date
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from modules.report_cube import AppointmentCube
+
 
 def choose_date() -> datetime:
     """Loop to take a valid requested date from the user to book an appointment with a clinician"""
@@ -19,16 +27,15 @@ def choose_date() -> datetime:
         requested_date = get_valid_date(
             "Please enter a date when you would like to see your clinician (DD-MM-YYYY): ",
             current_day,
-            current_day + timedelta(weeks=52),
+            current_day + timedelta(weeks=BOOKING_WEEKS),
             "You cannot book an appointment before the current date.",
             "You can only book appointments up to a year in advance.",
         )
 
         # Make sure the patient hasn't requested a weekend
-        if requested_date.weekday() in [5, 6]:
-            print(
-                "Your clinician only works Monday-Friday. Please choose a date during the week."
-            )
+        booking_error = get_booking_error(requested_date)
+        if booking_error:
+            print(booking_error)
         else:
             return requested_date
 
@@ -55,13 +62,7 @@ def get_clinician_appointments(database, clinician_id: int) -> list:
 
 def get_unconfirmed_clinician_appointments(database, clinician_id: int) -> list:
     """Find all unconfirmed future appointments for a specified clinician"""
-    appointments = get_clinician_appointments(database, clinician_id)
-
-    return [
-        appointment
-        for appointment in appointments
-        if appointment["status"] == "Pending" and appointment["date"] >= datetime.now()
-    ]
+    return AppointmentService(database).get_requested(clinician_id)
 
 
 def get_patient_appointments(database, user_id: int) -> list:
@@ -84,8 +85,8 @@ def get_patient_appointments(database, user_id: int) -> list:
         return []
 
 
-def print_appointment(appointment: dict) -> None:
-    print(
+def format_appointment(appointment: dict) -> str:
+    return (
         f"{appointment['appointment_id']} - {appointment['date'].strftime('%a %d %b %Y, %I:%M%p')}"
         + f" - {appointment['first_name']} {appointment['surname']} - "
         + f"{appointment['status']}\n"
@@ -94,21 +95,7 @@ def print_appointment(appointment: dict) -> None:
 
 def get_available_slots(database, clinician_id: int, day: datetime) -> list:
     """Find all available slots for a clinician on a specified day"""
-    appointments = get_clinician_appointments(database, clinician_id)
-    possible_hours = [9, 10, 11, 12, 14, 15, 16]
-    available_slots = []
-
-    # This checks whether an appointment already exists at that day and time
-    # and that it isn't earlier than the current time
-    for hour in possible_hours:
-        if (
-            datetime(day.year, day.month, day.day, hour, 0)
-            not in [appointment["date"] for appointment in appointments]
-            and datetime(day.year, day.month, day.day, hour) > datetime.now()
-        ):
-            available_slots.append(datetime(day.year, day.month, day.day, hour, 0))
-
-    return available_slots
+    return AppointmentService(database).get_available_slots(clinician_id, day)
 
 
 def request_appointment(database, patient_id: int, clinician_id: int) -> bool:
@@ -162,53 +149,38 @@ Please choose out of the following options: {[*range(1, len(slots) + 2)]} """,
             chosen_time = slots[chosen_slot - 1]
 
         try:
-            database.cursor.execute(
-                """
-                    INSERT INTO Appointments (user_id, clinician_id, date, status, patient_notes)
-                    VALUES (?, ?, ?, ?, ?)
-                    """,
-                (
-                    patient_id,
-                    clinician_id,
-                    chosen_time,
-                    "Pending",
-                    description,
-                ),
+            AppointmentService(database).request(
+                patient_id, clinician_id, chosen_time, description
             )
-            database.connection.commit()
             clear_terminal()
             print(
                 "\nYour appointment has been requested. You'll receive an email once your clinician has confirmed it."
             )
             return True
-        except sqlite3.IntegrityError as e:
+        except (ValueError, sqlite3.IntegrityError) as e:
             clear_terminal()
             print(f"Failed to book appointment: {e}")
             return False
 
 
-def cancel_appointment(database, appointment_id: int) -> bool:
+def cancel_appointment(database, appointment_id: int, patient_id: int) -> bool:
     """
     Cancels an appointment by changing its status to 'Cancelled By Patient'.
     """
     try:
-        database.cursor.execute(
-            """
-            UPDATE Appointments
-            SET status = 'Cancelled By Patient'
-            WHERE appointment_id = ?;
-            """,
-            (appointment_id,),
+        cancelled = AppointmentService(database).cancel_by_patient(
+            appointment_id, patient_id
         )
-        if database.cursor.rowcount > 0:
-            database.connection.commit()
-            clear_terminal()
+        clear_terminal()
+        if cancelled:
             print("Appointment cancelled successfully.")
-            return True
         else:
-            clear_terminal()
             print("Appointment not found or you are not authorized to cancel it.")
-            return False
+        return cancelled
+    except ValueError as e:
+        clear_terminal()
+        print(e)
+        return False
     except sqlite3.OperationalError as e:
         clear_terminal()
         print(f"Error cancelling appointment: {e}")
@@ -221,43 +193,47 @@ def display_appointment_engagement(
     filter_id: int | None = None,
     relative_time: Literal["current", "next", "last", "none"] = "none",
     time_period: Literal["year", "month", "week", "day", "none"] = "none",
-) -> pd.DataFrame | None:
+    cube: "AppointmentCube | None" = None,
+) -> "pd.DataFrame | None":
     """
-    Display all the appointments that the user has engaged with
+    Display all the appointments that the user has engaged with. Given a
+    cube, the counts are sliced from it rather than read from the database.
     """
+    # pandas is slow to import, so it is only loaded for the reports
+    import pandas as pd
 
-    id_attribute = "user_id" if user_type == "patient" else "clinician_id"
+    from modules.report_service import ReportService, get_report_periods
 
-    # Query to build a dataframe from database information
-    query = f"""
-    SELECT a.status, a.{id_attribute}, u.first_name, u.surname, a.date
-    FROM Appointments a JOIN Users u ON a.{id_attribute} = u.user_id
-    {f"WHERE a.{id_attribute} = {filter_id}" if filter_id else ""}
-    """
-    appointment_cursor = database.cursor.execute(query)
-    appointments_data = appointment_cursor.fetchall()
-    appointments_df = pd.DataFrame(appointments_data)
+    id_attribute = "user_id" if user_type == "patient" else "clinician_id"
 
-    # Calling a function to filter by inputted time range
-    filtered_appointments_df = filter_df_by_date(
-        appointments_df, relative_time, time_period
-    )
+    if cube is not None:
+        status_counts = cube.get_counts(
+            user_type, relative_time, time_period, filter_id
+        )
+        status_counts.index = status_counts.index.set_names(id_attribute, level=0)
+    else:
+        # The counts of each status come from the rollups of the time period,
+        # rather than from every appointment
+        period, first, last = get_report_periods(relative_time, time_period)
+        counts = ReportService(database).get_appointment_counts(
+            user_type, period, first, last, filter_id
+        )
+        status_counts = pd.DataFrame(counts)
+        if not status_counts.empty:
+            # Step 1: Create a pivot table with counts of each status per user
+            status_counts = status_counts.rename(
+                columns={"user_id": id_attribute}
+            ).pivot_table(
+                index=[id_attribute, "first_name", "surname"],
+                columns="status",
+                values="appointments",
+                aggfunc="sum",
+                fill_value=0,
+            )
 
-    if not filtered_appointments_df.empty:
+    if not status_counts.empty:
         # Checking that our filters haven't returned an empty dataframe
 
-        # Group by user_id and status to get the count of each status
-        pivot_columns = ["first_name", "surname"]
-        pivot_columns.insert(0, id_attribute)
-
-        # Step 1: Create a pivot table with counts of each status per user
-        status_counts = filtered_appointments_df.pivot_table(
-            index=pivot_columns,
-            columns="status",
-            aggfunc="size",
-            fill_value=0,
-        )
-
         # Step 2: Add a 'total_appointments' column
         status_counts["Total Appointments"] = status_counts.sum(axis=1)
 
@@ -280,3 +256,33 @@ def display_appointment_engagement(
 
     else:
         return "\nNo appointments could be found.\n"
+
+
+def get_engagement_rows(
+    database: Database,
+    user_type: Literal["patient", "clinician"],
+    filter_id: int | None = None,
+    relative_time: Literal["current", "next", "last", "none"] = "none",
+    time_period: Literal["year", "month", "week", "day", "none"] = "none",
+) -> list[dict[str, Any]]:
+    """
+    The appointment engagement report as plain rows, one per clinician or
+    patient, for the headless commands and the API
+    """
+    engagement = display_appointment_engagement(
+        database, user_type, filter_id, relative_time, time_period
+    )
+    # A message rather than a dataframe when there are no appointments
+    if isinstance(engagement, str):
+        return []
+
+    id_column = "user_id" if user_type == "patient" else "clinician_id"
+    return [
+        {
+            id_column: index[0],
+            "first_name": index[1],
+            "surname": index[2],
+            **{status: int(count) for status, count in counts.items()},
+        }
+        for index, counts in engagement.iterrows()
+    ]
@@ -0,0 +1,310 @@
+import argparse
+import csv
+import json
+from collections.abc import Iterator
+from datetime import datetime
+from itertools import islice
+from typing import Any, Union
+
+from database.setup import Database
+from modules.utilities.input_utils import (
+    validate_date,
+    validate_email,
+    validate_string,
+)
+
+# Columns understood by the importer; patient-only columns are ignored
+# for clinicians
+IMPORT_FIELDS = [
+    "username",
+    "password",
+    "first_name",
+    "surname",
+    "email",
+    "role",
+    "emergency_email",
+    "date_of_birth",
+    "is_active",
+]
+IMPORTABLE_ROLES = ("patient", "clinician")
+# Usernames or emails looked up in one query
+LOOKUP_BATCH_SIZE = 500
+
+
+def read_rows(path: str) -> Iterator[tuple[int, dict[str, Any]]]:
+    """
+    Streams (line number, row) pairs from a CSV file with a header row,
+    or from a JSON Lines file when the path ends in .jsonl or .json
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.endswith((".jsonl", ".json")):
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, {"_error": f"Invalid JSON: {e}"}
+                    continue
+                if isinstance(row, dict):
+                    yield line_number, row
+                else:
+                    yield line_number, {"_error": "Expected a JSON object"}
+        else:
+            # The header is line 1, so data starts on line 2
+            for line_number, row in enumerate(csv.DictReader(file), start=2):
+                yield line_number, row
+
+
+def parse_is_active(value: Any, role: str) -> bool:
+    """
+    Reads an optional is_active value; when blank, follows the signup rule
+    that patients start active and clinicians wait for an admin
+    """
+    if value is None or value == "":
+        return role == "patient"
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in ["y", "yes", "true", "1"]:
+        return True
+    elif value in ["n", "no", "false", "0"]:
+        return False
+    raise ValueError("Invalid is_active value, expected Y/N.")
+
+
+def validate_row(row: dict[str, Any]) -> dict[str, Any]:
+    """
+    Applies the same validation rules as the registration form to a row
+    and returns the cleaned values, raising a ValueError otherwise
+    """
+    if "_error" in row:
+        raise ValueError(row["_error"])
+
+    def field(name: str) -> str:
+        value = row.get(name)
+        return "" if value is None else str(value).strip()
+
+    role = field("role").lower()
+    if role not in IMPORTABLE_ROLES:
+        raise ValueError(f"Invalid role '{role}', expected patient or clinician.")
+
+    user = {
+        "username": validate_string(
+            field("username"), max_len=25, min_len=3, allow_spaces=False
+        ),
+        "password": validate_string(field("password"), max_len=25, min_len=0),
+        "first_name": validate_string(
+            field("first_name"), max_len=50, min_len=1, is_name=True
+        ),
+        "surname": validate_string(
+            field("surname"), max_len=50, min_len=1, is_name=True
+        ),
+        "email": validate_email(field("email")),
+        "role": role,
+        "is_active": parse_is_active(row.get("is_active"), role),
+    }
+
+    if role == "patient":
+        user["emergency_email"] = validate_email(field("emergency_email"))
+        user["date_of_birth"] = validate_date(
+            field("date_of_birth"),
+            min_date=datetime(1900, 1, 1),
+            max_date=datetime.today(),
+            max_date_message="Date of birth cannot be in the future.",
+        )
+
+    return user
+
+
+def find_existing(db: Database, column: str, values: list[str]) -> set[str]:
+    """
+    Returns which of the values already exist in a unique column of Users,
+    using the column's unique index rather than loading the whole table
+    """
+    existing = set()
+    # In batches, as a chunk can have more rows than SQLite takes parameters
+    for start in range(0, len(values), LOOKUP_BATCH_SIZE):
+        batch = values[start : start + LOOKUP_BATCH_SIZE]
+        placeholders = ", ".join("?" for _ in batch)
+        existing.update(
+            db.cursor.execute(
+                f"SELECT {column} FROM Users WHERE {column} IN ({placeholders})", batch
+            ).fetchall()
+        )
+    return existing
+
+
+class RejectsWriter:
+    """
+    Writes rejected rows with their line number and reason, in the same
+    format as the input file, opening the file only when needed
+    """
+
+    def __init__(self, path: Union[str, None], as_json: bool):
+        self.path = path
+        self.as_json = as_json
+        self.file = None
+        self.writer = None
+
+    def __enter__(self) -> "RejectsWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def write(self, line_number: int, row: dict[str, Any], reason: str) -> None:
+        if not self.path:
+            return
+        if self.file is None:
+            # Closed by close, on leaving the with block, so that the file is
+            # only made once there is a row to reject
+            self.file = open(self.path, "w", newline="", encoding="utf-8")  # noqa: SIM115
+            if not self.as_json:
+                self.writer = csv.DictWriter(
+                    self.file,
+                    fieldnames=["line", "reason", *IMPORT_FIELDS],
+                    extrasaction="ignore",
+                )
+                self.writer.writeheader()
+
+        rejected = {"line": line_number, "reason": reason}
+        rejected.update({k: v for k, v in row.items() if k != "_error"})
+        if self.as_json:
+            self.file.write(json.dumps(rejected, default=str) + "\n")
+        else:
+            self.writer.writerow(rejected)
+
+    def close(self) -> None:
+        if self.file:
+            self.file.close()
+
+
+def import_chunk(
+    db: Database,
+    chunk: list[tuple[int, dict[str, Any]]],
+    next_user_id: int,
+    rejects: RejectsWriter,
+) -> tuple[int, int]:
+    """
+    Validates, dedupes and inserts one chunk of rows in a single transaction.
+
+    Returns the number of users imported and the next free user_id.
+    """
+    valid = []
+    for line_number, row in chunk:
+        try:
+            valid.append((line_number, row, validate_row(row)))
+        except ValueError as e:
+            rejects.write(line_number, row, str(e))
+
+    taken_usernames = find_existing(db, "username", [u["username"] for *_, u in valid])
+    taken_emails = find_existing(db, "email", [u["email"] for *_, u in valid])
+
+    users = []
+    patients = []
+    inserted = []
+    for line_number, row, user in valid:
+        if user["username"] in taken_usernames:
+            rejects.write(line_number, row, "Username already exists.")
+            continue
+        if user["email"] in taken_emails:
+            rejects.write(line_number, row, "Email already exists.")
+            continue
+
+        # Also catches duplicates within the same chunk
+        taken_usernames.add(user["username"])
+        taken_emails.add(user["email"])
+
+        users.append(
+            (
+                next_user_id,
+                user["username"],
+                user["password"],
+                user["first_name"],
+                user["surname"],
+                user["email"],
+                user["role"],
+                user["is_active"],
+            )
+        )
+        if user["role"] == "patient":
+            patients.append(
+                (
+                    next_user_id,
+                    user["emergency_email"],
+                    user["date_of_birth"],
+                    None,
+                    None,
+                )
+            )
+        inserted.append((line_number, row))
+        next_user_id += 1
+
+    try:
+        db.cursor.executemany("INSERT INTO Users VALUES(?, ?, ?, ?, ?, ?, ?, ?)", users)
+        db.cursor.executemany("INSERT INTO Patients VALUES(?, ?, ?, ?, ?)", patients)
+        db.connection.commit()
+    except Exception as e:
+        # Roll back the whole chunk so the database is never left half-imported
+        db.connection.rollback()
+        for line_number, row in inserted:
+            rejects.write(line_number, row, f"Chunk failed to insert: {e}")
+        return 0, next_user_id - len(users)
+
+    return len(users), next_user_id
+
+
+def import_users(
+    db: Database,
+    path: str,
+    rejects_path: Union[str, None] = None,
+    chunk_size: int = 1000,
+) -> dict[str, int]:
+    """
+    Streams patients and clinicians from a CSV or JSON Lines file into the
+    database, committing every chunk_size rows.
+
+    Unlike signup, no welcome emails are sent. Returns the number of rows
+    read, imported and rejected.
+    """
+    next_user_id = (
+        db.cursor.execute("SELECT MAX(user_id) FROM Users").fetchone() or 0
+    ) + 1
+    total = imported = 0
+
+    rows = read_rows(path)
+    with RejectsWriter(
+        rejects_path, as_json=path.endswith((".jsonl", ".json"))
+    ) as rejects:
+        while chunk := list(islice(rows, chunk_size)):
+            total += len(chunk)
+            chunk_imported, next_user_id = import_chunk(
+                db, chunk, next_user_id, rejects
+            )
+            imported += chunk_imported
+
+    return {"read": total, "imported": imported, "rejected": total - imported}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Bulk import patients and clinicians into Breeze."
+    )
+    parser.add_argument("file", help="CSV (with header) or JSON Lines file to import")
+    parser.add_argument(
+        "--rejects", help="Where to write rejected rows and the reason for each"
+    )
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--database", default="breeze.db")
+    args = parser.parse_args()
+
+    db = Database(args.database)
+    try:
+        result = import_users(db, args.file, args.rejects, args.chunk_size)
+        print(
+            f"Read {result['read']} rows: {result['imported']} imported, "
+            + f"{result['rejected']} rejected."
+        )
+    finally:
+        db.close()
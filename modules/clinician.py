@@ -2,22 +2,36 @@ import sqlite3
 from datetime import datetime
 
 from database.setup import diagnoses
+from modules.appointment_service import AppointmentService
 from modules.appointments import (
-    get_clinician_appointments,
+    format_appointment,
     get_unconfirmed_clinician_appointments,
-    print_appointment,
 )
 from modules.patient import Patient
+from modules.risk_service import RiskService
+from modules.search import display_search
 from modules.streaks_service import StreakService
 from modules.user import User
 from modules.utilities.display_utils import (
+    TableColumn,
     clear_terminal,
     display_choice,
+    display_table,
+    render_table,
     wait_terminal,
 )
+from modules.utilities.tracing import traced
 from modules.utilities.input_utils import get_valid_string, get_valid_yes_or_no
+from modules.utilities.pagination import KeysetPaginator
 from modules.utilities.send_email import send_email
 
+# Name, diagnosis and latest mood, as shown when choosing a patient
+PATIENT_LIST_COLUMNS = (
+    TableColumn("Patient"),
+    TableColumn("Diagnosis"),
+    TableColumn("Mood", lambda mood: f"Most Recent Mood Score: {mood}/6"),
+)
+
 
 class Clinician(User):
     def __init__(self, database, **kwargs):
@@ -36,15 +50,20 @@ class Clinician(User):
             if self.should_logout:
                 return True
             clear_terminal()
-            print(f"Hello, {self.first_name} {self.surname}!")
-            self.print_notifications()
             choices = [
                 "Calendar",
                 "Your Patient Dashboard",
                 "View Requested Appointments",
             ]
+            # The greeting and notifications are written with the menu, in one go
             selection = display_choice(
-                "What would you like to do?",
+                "\n".join(
+                    [
+                        f"Hello, {self.first_name} {self.surname}!",
+                        *self.get_notifications(),
+                        "What would you like to do?",
+                    ]
+                ),
                 choices,
                 "Please choose from the above options: ",
                 enable_zero_quit=True,
@@ -64,6 +83,7 @@ class Clinician(User):
 
                 # return True because flow() logs out when True is returned
 
+    @traced
     def flow_patient_dashboard(self):
         """Patient dashboard screen"""
         if self.should_logout:
@@ -72,7 +92,12 @@ class Clinician(User):
         clear_terminal()
         choice = display_choice(
             "Welcome to your dashboard. Where would you like to go?",
-            ["View All", "Filter By Diagnosis", "View Engagement With Mood Tracker"],
+            [
+                "View All",
+                "Filter By Diagnosis",
+                "View Engagement With Mood Tracker",
+                "Search Patient Entries and Notes",
+            ],
             enable_zero_quit=True,
             zero_option_callback=self.flow,
             zero_option_message="Return to main menu",
@@ -88,10 +113,15 @@ class Clinician(User):
         if choice == 3:
             self.flow_patient_mood_tracker()
 
+        if choice == 4:
+            display_search(self.database, clinician_id=self.user_id)
+            return self.flow_patient_dashboard()
+
         # Return to main menu
         if not choice:
             return False
 
+    @traced
     def flow_edit_patient_info_screen(self, patient: Patient):
         """Edit patient information screen"""
         if self.should_logout:
@@ -116,6 +146,7 @@ class Clinician(User):
         if choice == 0:
             return self.flow_patient_summary()
 
+    @traced
     def flow_filtered_diagnosis_list(self):
         if self.should_logout:
             return True
@@ -136,6 +167,7 @@ class Clinician(User):
         self.print_filtered_patients_list_by_diagnosis(choice, patients)
         wait_terminal()
 
+    @traced
     def flow_patient_summary(self):
         if self.should_logout:
             return True
@@ -155,36 +187,38 @@ class Clinician(User):
 
         return self.flow_edit_patient_info_screen(patients[selected - 1])
 
+    @traced
     def flow_patient_mood_tracker(self):
         if self.should_logout:
             return True
+        # NumPy is only loaded once a clinician looks at the trends
+        from modules.mood_analytics import STATISTIC_COLUMNS, MoodAnalytics
+
         patients: list[Patient] = self.get_all_patients()
         streak_service = StreakService(self.database)
+        trends = MoodAnalytics(self.database).get_trends(self.user_id).latest()
         clear_terminal()
-        print("Patient Mood Tracker Engagement (Days in a row)")
-        mood_streaks = [
-            f"{patient.first_name} {patient.surname} - {streak_service.mood_streaks[patient.user_id]} days"
-            for patient in patients
-        ]
-        max_lengths = [0, 0, 0]
-
-        for patient_string in mood_streaks:
-            parts = patient_string.split(" - ")
-            for i, part in enumerate(parts):
-                if len(part) > max_lengths[i]:
-                    max_lengths[i] = len(part)
-        justified_patient_strings = []
-        for patient_string in mood_streaks:
-            parts = patient_string.split(" - ")
-            justified_patient = " - ".join(
-                part.ljust(max_lengths[i]) for i, part in enumerate(parts)
-            )
-            justified_patient_strings.append(justified_patient)
-        for patient in justified_patient_strings:
-            print(patient)
+        display_table(
+            (
+                (
+                    f"{patient.first_name} {patient.surname}",
+                    streak_service.mood_streaks[patient.user_id],
+                    *trends[patient.user_id],
+                )
+                for patient in patients
+            ),
+            [
+                TableColumn("Patient"),
+                TableColumn("Streak", lambda days: f"{days} days", align="right"),
+                *STATISTIC_COLUMNS,
+            ],
+            title="Patient Mood Tracker Engagement (streaks in days, moods over the "
+            + "last 7 and 30 days)",
+        )
         wait_terminal("Press enter to return to the patient dashboard")
         return self.flow_patient_dashboard()
 
+    @traced
     def flow_choose_from_list_and_update_diagnosis(self, patient: Patient):
         """Displays a list of diagnoses and allows the user to choose one"""
         if self.should_logout:
@@ -212,6 +246,7 @@ class Clinician(User):
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
 
+    @traced
     def view_notes(self, appointment: dict):
         """Print out clinician and patient notes for a given appointment"""
         if appointment["clinician_notes"]:
@@ -221,6 +256,7 @@ class Clinician(User):
             print("\nPatient notes:")
             print(appointment["patient_notes"] + "\n")
 
+    @traced
     def add_notes(self, appointment: dict):
         """Used to add clinician notes for a given appointment"""
         clear_terminal()
@@ -250,6 +286,7 @@ class Clinician(User):
             except sqlite3.IntegrityError as e:
                 print(f"Failed to add note: {e}")
 
+    @traced
     def edit_notes(self, appointment: dict):
         """Used to edit clinician notes for a given appointment"""
         clear_terminal()
@@ -281,40 +318,63 @@ class Clinician(User):
         except sqlite3.IntegrityError as e:
             print(f"Failed to add note: {e}")
 
-    def print_notifications(self):
-        """Checks if the clinician has requested appointments, or past appointments
-        without notes, to display as notifications on the main menu"""
-        requested_appointments = get_unconfirmed_clinician_appointments(
-            self.database, self.user_id
-        )
-        appointments_without_notes = self.get_all_appointments_without_notes()
+    @traced
+    def get_notifications(self) -> list[str]:
+        """Checks if the clinician has requested appointments, past appointments
+        without notes, or patients showing early warning signs, and returns the
+        lines to display as notifications on the main menu"""
+        notifications = []
+        counts = AppointmentService(self.database).count_notifications(self.user_id)
+
+        if counts["requested"]:
+            if counts["requested"] == 1:
+                notifications.append(
+                    "You have\033[31m 1 requested appointment\033[0m to review."
+                )
+            else:
+                notifications.append(
+                    f"You have\033[31m {counts['requested']} requested appointments\033[0m to review."
+                )
 
-        if requested_appointments:
-            if len(requested_appointments) == 1:
-                print("You have\033[31m 1 requested appointment\033[0m to review.")
+        if counts["without_notes"]:
+            if counts["without_notes"] == 1:
+                notifications.append(
+                    "You have 1 previous appointment to add notes for."
+                )
             else:
-                print(
-                    f"You have\033[31m {len(requested_appointments)} requested appointments\033[0m to review."
+                notifications.append(
+                    f"There are {counts['without_notes']} previous appointments to add notes for."
                 )
 
-        if appointments_without_notes:
-            if len(appointments_without_notes) == 1:
-                print("You have 1 previous appointment to add notes for.")
+        # Scored by the score-risks job, see modules/risk_service.py
+        flagged_patients = RiskService(self.database).get_flagged_patients(self.user_id)
+        if flagged_patients:
+            if len(flagged_patients) == 1:
+                notifications.append(
+                    "\033[31m1 patient\033[0m shows early warning signs:"
+                )
             else:
-                print(
-                    f"There are {len(appointments_without_notes)} previous appointments to add notes for."
+                notifications.append(
+                    f"\033[31m{len(flagged_patients)} patients\033[0m show early warning signs:"
                 )
+            for patient in flagged_patients:
+                notifications.append(
+                    f"  {patient['first_name']} {patient['surname']} - {patient['reasons']}"
+                )
+        return notifications
 
-    def display_appointment_options(self, appointments: list):
+    def display_appointment_options(self, pages: KeysetPaginator):
         """This function presents options to the clinician based on the
-        list of appointments passed into it."""
+        current page of appointments passed into it."""
         clear_terminal()
+        appointments = pages.page
         appointment_strings = []
 
-        # Loop through the appointments, printing them for the user and saving a string
-        # for each in appointment_strings
+        # Loop through the appointments, listing them for the user and saving a string
+        # for each in appointment_strings. The list is written with the menu below.
+        listing = []
         for appointment in appointments:
-            print_appointment(appointment)
+            listing.append(format_appointment(appointment))
             appointment_strings.append(
                 f"{appointment['date'].strftime('%a %d %b %Y, %I:%M%p')}"
                 + f" - {appointment['first_name']} {appointment['surname']} - "
@@ -328,8 +388,13 @@ class Clinician(User):
                 "Add notes to an appointment",
                 "Confirm/Reject Appointments",
             ]
+            if pages.has_next:
+                options.append("Next page")
+            if pages.has_previous:
+                options.append("Previous page")
             next = display_choice(
-                "What would you like to do now?",
+                "\n".join(listing)
+                + f"\nPage {pages.page_number} - What would you like to do now?",
                 options,
                 enable_zero_quit=True,
                 zero_option_message="Return to appointments overview",
@@ -348,7 +413,7 @@ class Clinician(User):
                         zero_option_message="Back to appointments",
                     )
                     if selected == 0:
-                        return self.display_appointment_options(appointments)
+                        return self.display_appointment_options(pages)
                     selected_appointment = appointments[selected - 1]
                 else:
                     selected_appointment = appointments[0]
@@ -380,7 +445,7 @@ class Clinician(User):
                         zero_option_message="Back to appointments",
                     )
                     if selected == 0:
-                        return self.display_appointment_options(appointments)
+                        return self.display_appointment_options(pages)
                     selected_appointment = appointments[selected - 1]
                 else:
                     selected_appointment = appointments[0]
@@ -390,24 +455,36 @@ class Clinician(User):
             # Confirm/Reject appointments
             elif next == 3:
                 self.view_requested_appointments()
+
+            # Move between pages of appointments
+            elif options[next - 1] == "Next page":
+                pages.next_page()
+                return self.display_appointment_options(pages)
+            elif options[next - 1] == "Previous page":
+                pages.previous_page()
+                return self.display_appointment_options(pages)
         else:
             print("No appointments found.")
             wait_terminal()
 
-    def get_all_appointments_without_notes(self) -> list:
-        """Returns all the clinician's past appointments that have no notes recorded"""
-
-        # Get all appointments for this clinician
-        appointments = get_clinician_appointments(self.database, self.user_id)
-
-        # Select past appointments without notes and return them in a list
-        return [
-            appointment
-            for appointment in appointments
-            if not appointment["clinician_notes"]
-            and appointment["date"] < datetime.now()
-        ]
+    def get_appointment_pages(
+        self, conditions: str = "", params: tuple = (), page_size: int = 10
+    ) -> KeysetPaginator:
+        """Pages through the clinician's appointments that meet the conditions"""
+        return KeysetPaginator(
+            self.database,
+            """appointment_id, a.user_id, clinician_id, a.date,
+            status, patient_notes, clinician_notes,
+            u.first_name, u.surname, u.email AS patient_email""",
+            "Appointments AS a JOIN Users AS u ON a.user_id = u.user_id",
+            "clinician_id = ?" + (f" AND {conditions}" if conditions else ""),
+            [self.user_id, *params],
+            date_column="a.date",
+            key_column="appointment_id",
+            page_size=page_size,
+        )
 
+    @traced
     def view_calendar(self):
         """
         This allows the clinician to view all their past and
@@ -415,10 +492,12 @@ class Clinician(User):
         """
 
         clear_terminal()
-        # Get all appointments for this clinician
-        appointments = get_clinician_appointments(self.database, self.user_id)
+        has_appointments = self.database.cursor.execute(
+            "SELECT EXISTS(SELECT 1 FROM Appointments WHERE clinician_id = ?)",
+            [self.user_id],
+        ).fetchone()
 
-        if not appointments:
+        if not has_appointments:
             print("You have no registered appointments.")
             wait_terminal()
         else:
@@ -435,33 +514,34 @@ class Clinician(User):
                 enable_zero_quit=True,
                 zero_option_message="Return to Main Menu",
             )
+            now = datetime.now()
 
             # Show all appointments
             if view == 1:
-                self.display_appointment_options(appointments)
+                self.display_appointment_options(self.get_appointment_pages())
 
             # Show past appointments
             elif view == 2:
                 self.display_appointment_options(
-                    list(
-                        filter(lambda app: app["date"] < datetime.now(), appointments)
-                    ),
+                    self.get_appointment_pages("a.date < ?", [now])
                 )
 
             # Show upcoming appointments
             elif view == 3:
                 self.display_appointment_options(
-                    list(
-                        filter(lambda app: app["date"] >= datetime.now(), appointments)
-                    ),
+                    self.get_appointment_pages("a.date >= ?", [now])
                 )
 
             # Show past appointments without notes
             elif view == 4:
                 self.display_appointment_options(
-                    self.get_all_appointments_without_notes()
+                    self.get_appointment_pages(
+                        "a.date < ? AND (clinician_notes IS NULL OR clinician_notes = '')",
+                        [now],
+                    )
                 )
 
+    @traced
     def view_requested_appointments(self):
         """This allows the clinician to view all appointments that have been
         requested but not confirmed yet, and gives the option to confirm or
@@ -504,158 +584,85 @@ class Clinician(User):
                     enable_zero_quit=True,
                 )
 
-                # Confirm the appointment
-                if accept_or_reject == 1:
-                    accepted_appointment = unconfirmed_appointments[confirm_choice - 1]
-
-                    try:
-                        # Set the appointment as confirmed in the DB
-                        self.database.cursor.execute(
-                            """
-                            UPDATE Appointments
-                            SET status = "Confirmed"
-                            WHERE appointment_id = ?""",
-                            [accepted_appointment["appointment_id"]],
-                        )
-                        self.database.connection.commit()
-                        clear_terminal()
-                        print(
-                            "The appointment has been confirmed. An email with full details will be sent to you and the patient."
-                        )
-
-                        # Remove the appointment from the list so it is not displayed to the user again
-                        unconfirmed_appointments.remove(accepted_appointment)
-                        choice_strings.remove(choice_strings[confirm_choice - 1])
-
-                        # Email messages to send to the client and the clinician
-                        clinician_confirmation = f"Your appointment with {appointment["first_name"]} {appointment["surname"]} has been confirmed for {appointment['date'].strftime('%I:%M%p on %A %d %B %Y')}."
-                        patient_confirmation = f"Your appointment with {self.first_name} {self.surname} has been confirmed for {appointment['date'].strftime('%I:%M%p on %A %d %B %Y')}."
-
-                        # Email the clinician
-                        send_email(
-                            self.email,
-                            "Appointment confirmed",
-                            clinician_confirmation,
-                        )
-
-                        # Email the client
-                        send_email(
-                            appointment["patient_email"],
-                            "Appointment confirmed",
-                            patient_confirmation,
-                        )
-
-                    except sqlite3.IntegrityError as e:
-                        print(f"Failed to confirm appointment: {e}")
-                        return False
-
-                    # If there are unconfirmed appointments, offer
-                    # option to go back and choose another appointment
-                    if unconfirmed_appointments:
-                        next_action = display_choice(
-                            "What would you like to do next?",
-                            ["Accept/Reject another appointment"],
-                            enable_zero_quit=True,
-                            zero_option_message="Exit",
-                        )
-                        if next_action == 1:
-                            clear_terminal()
-                            continue
-                        else:
-                            return True
-                    else:
-                        return True
-
-                # Reject the appointment
-                elif accept_or_reject == 2:
-                    rejected_appointment = unconfirmed_appointments[confirm_choice - 1]
-                    try:
-                        self.database.cursor.execute(
-                            """
-                            UPDATE Appointments
-                            SET status = "Rejected"
-                            WHERE appointment_id = ?""",
-                            [rejected_appointment["appointment_id"]],
-                        )
-                        self.database.connection.commit()
-                        clear_terminal()
-                        print(
-                            "The appointment has been rejected. A notification email will be sent to you and the patient."
-                        )
-
-                        # Remove the appointment from the list so it is not displayed to the user again
-                        unconfirmed_appointments.remove(rejected_appointment)
-                        choice_strings.remove(choice_strings[confirm_choice - 1])
-
-                        # Send emails to the client and the clinician
-                        clinician_rejection = f"You have rejected {appointment["first_name"]} {appointment["surname"]}'s request for an appointment on {appointment['date'].strftime('%I:%M%p on %A %d %B %Y')}."
-                        patient_rejection = f"Your request for an appointment with {self.first_name} {self.surname} on {appointment['date'].strftime('%I:%M%p on %A %d %B %Y')} has been rejected. Please use the online booking system to choose a different time."
-
-                        # Email the clinician
-                        send_email(
-                            self.email,
-                            "Appointment confirmed",
-                            clinician_rejection,
-                        )
-
-                        # Email the client
-                        send_email(
-                            appointment["patient_email"],
-                            "Appointment confirmed",
-                            patient_rejection,
-                        )
-
-                    except sqlite3.IntegrityError as e:
-                        print(f"Failed to confirm appointment: {e}")
-                        return False
-
-                    # If there are still unconfirmed appointments, offer the choice of
-                    # what to do next
-                    if unconfirmed_appointments:
-                        next_action = display_choice(
-                            "What would you like to do next?",
-                            ["Accept/Reject another appointment"],
-                            enable_zero_quit=True,
-                            zero_option_message="Exit",
-                        )
-                        if next_action == 1:
-                            clear_terminal()
-                            continue
-                        else:
-                            return True
-                    else:
-                        return True
-
-                elif accept_or_reject == 0:
+                if accept_or_reject == 0:
                     clear_terminal()
                     continue
 
+                accept = accept_or_reject == 1
+                try:
+                    appointment = AppointmentService(self.database).respond(
+                        unconfirmed_appointments[confirm_choice - 1]["appointment_id"],
+                        self.user_id,
+                        accept,
+                    )
+                except (ValueError, sqlite3.IntegrityError) as e:
+                    print(
+                        f"Failed to {'confirm' if accept else 'reject'} appointment: {e}"
+                    )
+                    return False
+
+                clear_terminal()
+                # Remove the appointment from the list so it is not displayed to the user again
+                unconfirmed_appointments.pop(confirm_choice - 1)
+                choice_strings.pop(confirm_choice - 1)
+
+                patient_name = f"{appointment['first_name']} {appointment['surname']}"
+                when = appointment["date"].strftime("%I:%M%p on %A %d %B %Y")
+                if accept:
+                    print(
+                        "The appointment has been confirmed. An email with full details will be sent to you and the patient."
+                    )
+                    subject = "Appointment confirmed"
+                    clinician_message = f"Your appointment with {patient_name} has been confirmed for {when}."
+                    patient_message = f"Your appointment with {self.first_name} {self.surname} has been confirmed for {when}."
+                else:
+                    print(
+                        "The appointment has been rejected. A notification email will be sent to you and the patient."
+                    )
+                    subject = "Appointment rejected"
+                    clinician_message = f"You have rejected {patient_name}'s request for an appointment on {when}."
+                    patient_message = f"Your request for an appointment with {self.first_name} {self.surname} on {when} has been rejected. Please use the online booking system to choose a different time."
+
+                # Email the clinician and the patient
+                send_email(self.email, subject, clinician_message)
+                send_email(appointment["patient_email"], subject, patient_message)
+
+                # If there are still unconfirmed appointments, offer the choice of
+                # what to do next
+                if not unconfirmed_appointments:
+                    return True
+                next_action = display_choice(
+                    "What would you like to do next?",
+                    ["Accept/Reject another appointment"],
+                    enable_zero_quit=True,
+                    zero_option_message="Exit",
+                )
+                if next_action != 1:
+                    return True
+                clear_terminal()
+
         if not unconfirmed_appointments:
             print("You have no unconfirmed appointments.")
 
         wait_terminal()
 
     def create_pretty_patient_list(self, patients: list[Patient]) -> list:
-        patients = [
-            f"""{patient.first_name} {patient.surname} - {patient.diagnosis} - Most Recent Mood Score: {patient.mood}/6"""
-            for patient in patients
-        ]
-        max_lengths = [0, 0, 0]
-
-        for patient in patients:
-            parts = patient.split(" - ")
-            for i, part in enumerate(parts):
-                if len(part) > max_lengths[i]:
-                    max_lengths[i] = len(part)
-        justified_patients = []
-        # Print the justified list
-        for patient in patients:
-            parts = patient.split(" - ")
-            justified_patient = " - ".join(
-                part.ljust(max_lengths[i]) for i, part in enumerate(parts)
+        """Returns one aligned line per patient, for use as menu options"""
+        return list(
+            render_table(
+                (
+                    (
+                        f"{patient.first_name} {patient.surname}",
+                        patient.diagnosis,
+                        patient.mood,
+                    )
+                    for patient in patients
+                ),
+                PATIENT_LIST_COLUMNS,
+                separator=" - ",
+                show_headers=False,
             )
-            justified_patients.append(justified_patient)
-        return justified_patients
+        )
 
     def get_all_patients(self) -> list[Patient]:
         try:
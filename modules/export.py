@@ -0,0 +1,252 @@
+import argparse
+import csv
+import json
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from typing import Any, Literal, Union
+
+from database.setup import Database
+from modules.utilities.date_utils import to_day_string
+
+# Tables that can be exported, with the primary key used to order the rows
+EXPORTABLE_TABLES = {
+    "Users": "user_id",
+    "Patients": "user_id",
+    "JournalEntries": "entry_id",
+    "MoodEntries": "entry_id",
+    "Appointments": "appointment_id",
+}
+DATED_TABLES = ("JournalEntries", "MoodEntries", "Appointments")
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+
+# Caseload of a clinician, used to slice tables that only store the patient
+CASELOAD_QUERY = "SELECT user_id FROM Patients WHERE clinician_id = ?"
+
+
+def get_column_types(db: Database, table: str) -> dict[str, str]:
+    """
+    Returns the declared type of each column of an exportable table, by
+    name in schema order
+    """
+    if table not in EXPORTABLE_TABLES:
+        raise ValueError(
+            f"Unknown table '{table}', choose from {', '.join(EXPORTABLE_TABLES)}."
+        )
+    return {
+        column["name"]: column["type"].upper()
+        for column in db.connection.execute(f"PRAGMA table_info({table})").fetchall()
+    }
+
+
+def get_table_columns(db: Database, table: str) -> list[str]:
+    """Returns the column names of an exportable table, in schema order"""
+    return list(get_column_types(db, table))
+
+
+def build_export_query(
+    db: Database,
+    table: str,
+    columns: Union[list[str], None] = None,
+    patient_id: Union[int, None] = None,
+    clinician_id: Union[int, None] = None,
+    start: Union[datetime, None] = None,
+    end: Union[datetime, None] = None,
+) -> tuple[str, list[Any], list[str]]:
+    """
+    Builds the SELECT for an export and returns the query, its parameters
+    and the projected columns.
+
+    Columns are checked against the table schema, as they can't be passed
+    as query parameters. The date range is inclusive of both days.
+    """
+    table_columns = get_table_columns(db, table)
+    columns = columns or table_columns
+    unknown = [column for column in columns if column not in table_columns]
+    if unknown:
+        raise ValueError(f"Unknown columns for {table}: {', '.join(unknown)}.")
+
+    conditions = []
+    params = []
+
+    if patient_id is not None:
+        conditions.append("user_id = ?")
+        params.append(patient_id)
+
+    if clinician_id is not None:
+        if table in ("Patients", "Appointments"):
+            conditions.append("clinician_id = ?")
+        else:
+            conditions.append(f"user_id IN ({CASELOAD_QUERY})")
+        params.append(clinician_id)
+
+    if start or end:
+        if table not in DATED_TABLES:
+            raise ValueError(f"{table} has no date column to filter by.")
+        if start:
+            conditions.append("date >= ?")
+            params.append(to_day_string(start))
+        if end:
+            conditions.append("date < ?")
+            params.append(to_day_string(end + timedelta(days=1)))
+
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {EXPORTABLE_TABLES[table]}"
+
+    return query, params, columns
+
+
+def stream_rows(
+    db: Database, query: str, params: list[Any], columns: list[str], chunk_size: int
+) -> Iterator[list[dict[str, Any]]]:
+    """
+    Yields the query results in chunks of at most chunk_size rows, so only
+    one chunk is held in memory at a time
+    """
+    # Use a separate cursor so the shared db.cursor can be used meanwhile
+    cursor = db.connection.cursor()
+    try:
+        cursor.execute(query, params)
+        while rows := cursor.fetchmany(chunk_size):
+            # dict_factory returns bare values for single-column queries
+            if len(columns) == 1:
+                rows = [{columns[0]: row} for row in rows]
+            yield rows
+    finally:
+        cursor.close()
+
+
+def write_csv(path: str, columns: dict[str, str], chunks: Iterator[list[dict]]) -> int:
+    total = 0
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=list(columns))
+        writer.writeheader()
+        for rows in chunks:
+            writer.writerows(rows)
+            total += len(rows)
+    return total
+
+
+def write_jsonl(
+    path: str, columns: dict[str, str], chunks: Iterator[list[dict]]
+) -> int:
+    total = 0
+    with open(path, "w", encoding="utf-8") as file:
+        for rows in chunks:
+            file.writelines(json.dumps(row, default=str) + "\n" for row in rows)
+            total += len(rows)
+    return total
+
+
+def write_parquet(
+    path: str, columns: dict[str, str], chunks: Iterator[list[dict]]
+) -> int:
+    """Writes each chunk as a parquet row group; requires pyarrow"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError(
+            "Parquet export requires pyarrow, install it with `pip install pyarrow`."
+        )
+
+    # From the declared types rather than inferred from the rows, which
+    # would type a column that is all nulls in the first chunk as null.
+    # BOOLEAN columns hold 0 and 1, and DATETIME ones are read as datetimes.
+    types = {
+        "INTEGER": pa.int64(),
+        "BOOLEAN": pa.int64(),
+        "REAL": pa.float64(),
+        "DATETIME": pa.timestamp("us"),
+    }
+    schema = pa.schema(
+        [
+            (column, types.get(declared, pa.string()))
+            for column, declared in columns.items()
+        ]
+    )
+
+    total = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            total += len(rows)
+    return total
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl, "parquet": write_parquet}
+
+
+def export_table(
+    db: Database,
+    table: str,
+    path: str,
+    export_format: Literal["csv", "jsonl", "parquet"] = "csv",
+    columns: Union[list[str], None] = None,
+    patient_id: Union[int, None] = None,
+    clinician_id: Union[int, None] = None,
+    start: Union[datetime, None] = None,
+    end: Union[datetime, None] = None,
+    chunk_size: int = 5000,
+) -> int:
+    """
+    Streams a table, or a patient's or clinician's slice of it, to a file
+    and returns the number of rows written
+    """
+    if export_format not in WRITERS:
+        raise ValueError(f"Unknown format '{export_format}'.")
+    query, params, columns = build_export_query(
+        db, table, columns, patient_id, clinician_id, start, end
+    )
+    chunks = stream_rows(db, query, params, columns, chunk_size)
+    types = get_column_types(db, table)
+    return WRITERS[export_format](
+        path, {column: types[column] for column in columns}, chunks
+    )
+
+
+def parse_day(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a Breeze table to a file.")
+    parser.add_argument("table", choices=EXPORTABLE_TABLES)
+    parser.add_argument("output", help="File to write to")
+    parser.add_argument(
+        "--format",
+        choices=EXPORT_FORMATS,
+        help="Defaults to the output file extension, or csv",
+    )
+    parser.add_argument("--columns", help="Comma separated columns to export")
+    parser.add_argument("--patient", type=int, help="Only this patient's rows")
+    parser.add_argument("--clinician", type=int, help="Only this clinician's rows")
+    parser.add_argument("--since", type=parse_day, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--until", type=parse_day, help="Last day (YYYY-MM-DD)")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--database", default="breeze.db")
+    args = parser.parse_args()
+
+    extension = args.output.rsplit(".", 1)[-1].lower()
+    export_format = args.format or (extension if extension in EXPORT_FORMATS else "csv")
+
+    db = Database(args.database)
+    try:
+        count = export_table(
+            db,
+            args.table,
+            args.output,
+            export_format,
+            columns=args.columns.split(",") if args.columns else None,
+            patient_id=args.patient,
+            clinician_id=args.clinician,
+            start=args.since,
+            end=args.until,
+            chunk_size=args.chunk_size,
+        )
+        print(f"Exported {count} rows from {args.table} to {args.output}.")
+    except ValueError as e:
+        print(e)
+    finally:
+        db.close()
@@ -0,0 +1,272 @@
+"""
+Non-interactive subcommands for scripts and nightly jobs.
+
+Each command uses the same domain logic as the interactive flows and
+prints a single JSON object to stdout, with "ok" telling whether it
+succeeded. Messages the domain code prints along the way go to stderr.
+The exit code is 0 on success and 1 on failure.
+
+From the repository root:
+    python main.py assign PATIENT_ID CLINICIAN_ID
+    python main.py export TABLE OUTPUT [--format csv] [--patient ID] ...
+    python main.py report [--by clinician] [--relative-time current] ...
+    python main.py mood-report [--by diagnosis] [--period week] [--since YYYY-MM-DD]
+    python main.py send-reminders [--date YYYY-MM-DD] [--dry-run]
+    python main.py recompute-streaks
+    python main.py score-risks [--date YYYY-MM-DD]
+    python main.py prune-report-changes
+"""
+
+import argparse
+import json
+import sys
+import traceback
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from typing import Any
+
+from database.setup import Database
+from modules.export import EXPORT_FORMATS, EXPORTABLE_TABLES, export_table, parse_day
+from modules.user_service import UserService
+from modules.utilities.date_utils import date_range_condition, get_date_range
+
+
+class CommandError(Exception):
+    """A command that could not be carried out, reported in the JSON output"""
+
+
+def assign(db: Database, args: argparse.Namespace) -> dict[str, Any]:
+    """Assigns a patient to a clinician, like the admin's assign flow"""
+    try:
+        UserService(db).assign_clinician(args.patient_id, args.clinician_id)
+    except ValueError as e:
+        raise CommandError(str(e))
+    return {"patient_id": args.patient_id, "clinician_id": args.clinician_id}
+
+
+def export(db: Database, args: argparse.Namespace) -> dict[str, Any]:
+    extension = args.output.rsplit(".", 1)[-1].lower()
+    export_format = args.format or (extension if extension in EXPORT_FORMATS else "csv")
+    try:
+        rows = export_table(
+            db,
+            args.table,
+            args.output,
+            export_format,
+            columns=args.columns.split(",") if args.columns else None,
+            patient_id=args.patient,
+            clinician_id=args.clinician,
+            start=args.since,
+            end=args.until,
+        )
+    except ValueError as e:
+        raise CommandError(str(e))
+    return {"table": args.table, "output": args.output, "rows": rows}
+
+
+def report(db: Database, args: argparse.Namespace) -> dict[str, Any]:
+    """Appointment engagement per clinician or patient, as in the admin reports"""
+    from modules.appointments import get_engagement_rows
+
+    return {
+        "rows": get_engagement_rows(
+            db, args.by, args.user_id, args.relative_time, args.time_period
+        )
+    }
+
+
+def mood_report(db: Database, args: argparse.Namespace) -> dict[str, Any]:
+    """Number of moods and their average per period, from the rollups"""
+    from modules.report_service import ReportService
+
+    since = args.since and args.since.strftime("%Y-%m-%d")
+    until = args.until and args.until.strftime("%Y-%m-%d")
+    # Patients and clinicians are grouped by id, diagnoses by name
+    group = int(args.group) if args.group and args.group.isdigit() else args.group
+    return {
+        "period": args.period,
+        "rows": ReportService(db).get_mood_totals(
+            args.by, args.period, since, until, group
+        ),
+    }
+
+
+def send_reminders(db: Database, args: argparse.Namespace) -> dict[str, Any]:
+    """Emails patients about their confirmed appointments on a day"""
+    day = args.date or datetime.now() + timedelta(days=1)
+    appointments = db.cursor.execute(
+        f"""
+        SELECT a.appointment_id, a.date, p.email, p.first_name,
+            c.first_name AS clinician_first_name, c.surname AS clinician_surname
+        FROM Appointments a
+        JOIN Users p ON a.user_id = p.user_id
+        JOIN Users c ON a.clinician_id = c.user_id
+        WHERE a.status = 'Confirmed' AND {date_range_condition("a.date")}
+        ORDER BY a.date
+        """,
+        get_date_range(day),
+    ).fetchall()
+
+    if not args.dry_run:
+        from modules.utilities.send_email import send_email
+
+    results = []
+    for appointment in appointments:
+        # None when nothing was sent because of --dry-run
+        sent = None if args.dry_run else send_email(
+            appointment["email"],
+            "Appointment reminder",
+            f"Hi {appointment['first_name']},\n\nThis is a reminder of your "
+            + f"appointment with {appointment['clinician_first_name']} "
+            + f"{appointment['clinician_surname']} at "
+            + f"{appointment['date'].strftime('%I:%M%p on %A %d %B %Y')}."
+            + "\n\nBest regards,\nBreeze Team",
+        )
+        results.append(
+            {"appointment_id": appointment["appointment_id"], "sent": sent}
+        )
+
+    return {
+        "date": day.strftime("%Y-%m-%d"),
+        "dry_run": args.dry_run,
+        "reminders": results,
+        "failed": sum(result["sent"] is False for result in results),
+    }
+
+
+def recompute_streaks(db: Database, args: argparse.Namespace) -> dict[str, Any]:
+    """The current mood streak of every patient, longest first"""
+    from modules.streaks_service import StreakService
+
+    streaks = StreakService(db).mood_streaks
+    return {
+        "streaks": [
+            {"user_id": user_id, "streak": streak}
+            for user_id, streak in sorted(
+                streaks.items(), key=lambda item: item[1], reverse=True
+            )
+        ]
+    }
+
+
+def score_risks(db: Database, args: argparse.Namespace) -> dict[str, Any]:
+    """Updates the early warning scores of patients with new or recent moods"""
+    from modules.risk_service import RiskService
+
+    return RiskService(db).score_patients(args.date.date() if args.date else None)
+
+
+def prune_report_changes(db: Database, args: argparse.Namespace) -> dict[str, Any]:
+    """
+    Deletes old changes of the appointment totals, which are otherwise only
+    pruned when an admin views appointment reports
+    """
+    from modules.report_service import prune_rollup_changes
+
+    return {"deleted": prune_rollup_changes(db)}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="main.py", description="Run Breeze operations without prompts."
+    )
+    parser.add_argument("--database", default="breeze.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("assign", help="Assign a patient to a clinician")
+    command.add_argument("patient_id", type=int)
+    command.add_argument("clinician_id", type=int)
+    command.set_defaults(run=assign)
+
+    command = commands.add_parser("export", help="Export a table to a file")
+    command.add_argument("table", choices=EXPORTABLE_TABLES)
+    command.add_argument("output", help="File to write to")
+    command.add_argument("--format", choices=EXPORT_FORMATS)
+    command.add_argument("--columns", help="Comma separated columns to export")
+    command.add_argument("--patient", type=int, help="Only this patient's rows")
+    command.add_argument("--clinician", type=int, help="Only this clinician's rows")
+    command.add_argument("--since", type=parse_day, help="First day (YYYY-MM-DD)")
+    command.add_argument("--until", type=parse_day, help="Last day (YYYY-MM-DD)")
+    command.set_defaults(run=export)
+
+    command = commands.add_parser("report", help="Appointment engagement report")
+    command.add_argument("--by", choices=("clinician", "patient"), default="clinician")
+    command.add_argument("--user-id", type=int, help="Only this clinician or patient")
+    command.add_argument(
+        "--relative-time", choices=("current", "next", "last", "none"), default="none"
+    )
+    command.add_argument(
+        "--time-period", choices=("year", "month", "week", "day", "none"), default="none"
+    )
+    command.set_defaults(run=report)
+
+    command = commands.add_parser(
+        "mood-report", help="Moods per patient, clinician or diagnosis over time"
+    )
+    command.add_argument(
+        "--by", choices=("patient", "clinician", "diagnosis"), default="clinician"
+    )
+    command.add_argument("--period", choices=("day", "week", "month"), default="month")
+    command.add_argument("--group", help="Only this patient, clinician or diagnosis")
+    command.add_argument(
+        "--since", type=parse_day, help="First period, by the day it starts on"
+    )
+    command.add_argument(
+        "--until", type=parse_day, help="Last period, by the day it starts on"
+    )
+    command.set_defaults(run=mood_report)
+
+    command = commands.add_parser(
+        "send-reminders", help="Email patients about confirmed appointments"
+    )
+    command.add_argument(
+        "--date", type=parse_day, help="Day of the appointments, defaults to tomorrow"
+    )
+    command.add_argument(
+        "--dry-run", action="store_true", help="List the reminders without sending"
+    )
+    command.set_defaults(run=send_reminders)
+
+    command = commands.add_parser(
+        "recompute-streaks", help="Current mood streak of every patient"
+    )
+    command.set_defaults(run=recompute_streaks)
+
+    command = commands.add_parser(
+        "score-risks", help="Update the early warning scores of patients"
+    )
+    command.add_argument("--date", type=parse_day, help="Day to score, defaults to today")
+    command.set_defaults(run=score_risks)
+
+    command = commands.add_parser(
+        "prune-report-changes", help="Delete old changes of the appointment totals"
+    )
+    command.set_defaults(run=prune_report_changes)
+
+    return parser
+
+
+def main(argv: list[str]) -> int:
+    args = build_parser().parse_args(argv)
+    output = {"command": args.command}
+
+    db = None
+    try:
+        # Keep stdout for the JSON result
+        with redirect_stdout(sys.stderr):
+            db = Database(args.database)
+            output.update(args.run(db, args))
+        output["ok"] = True
+    except CommandError as e:
+        output.update(ok=False, error=str(e))
+    except Exception as e:
+        # Anything else still ends in the JSON result, with its type, and
+        # the traceback for whoever runs the job
+        traceback.print_exc()
+        output.update(ok=False, error=f"{type(e).__name__}: {e}")
+    finally:
+        if db:
+            db.close()
+
+    print(json.dumps(output, default=str))
+    return 0 if output["ok"] else 1
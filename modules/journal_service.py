@@ -0,0 +1,59 @@
+from datetime import datetime
+from typing import Union
+
+from database.setup import Database
+from modules.utilities.date_utils import date_range_condition, get_date_range
+from modules.utilities.metrics import JOURNAL_ENTRIES
+from modules.utilities.pagination import KeysetPaginator
+
+
+class JournalService:
+    """
+    Writes and reads patients' journal entries without any terminal input or
+    output, so flows, jobs and other front ends share the same logic.
+    """
+
+    database: Database
+
+    def __init__(self, db: Database) -> None:
+        self.database = db
+
+    def add_entry(
+        self, user_id: int, text: str, written: Union[datetime, None] = None
+    ) -> int:
+        """Adds a journal entry (written now by default) and returns its id"""
+        self.database.cursor.execute(
+            "INSERT INTO JournalEntries (user_id, text, date) VALUES (?, ?, ?)",
+            (
+                user_id,
+                text,
+                (written or datetime.now()).strftime("%Y-%m-%d %H:%M:%S"),
+            ),
+        )
+        self.database.connection.commit()
+        JOURNAL_ENTRIES.inc()
+        return self.database.cursor.lastrowid
+
+    def get_entries(
+        self,
+        user_id: int,
+        day: Union[datetime, None] = None,
+        page_size: int = 10,
+        after: Union[tuple[str, int], None] = None,
+    ) -> KeysetPaginator:
+        """Pages through the patient's entries, optionally only those of one day"""
+        conditions = "user_id = ?"
+        params = [user_id]
+        if day:
+            conditions += " AND " + date_range_condition()
+            params.extend(get_date_range(day))
+
+        return KeysetPaginator(
+            self.database,
+            "date, text",
+            "JournalEntries",
+            conditions,
+            params,
+            page_size=page_size,
+            after=after,
+        )
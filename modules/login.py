@@ -1,15 +1,15 @@
 from datetime import datetime
 from typing import Union
 
-from modules.admin import Admin
-from modules.clinician import Clinician
-from modules.patient import Patient
 from modules.user import User
+from modules.user_service import UserService
 from modules.utilities.display_utils import (
     display_choice,
     display_dict,
     clear_terminal,
 )
+from modules.utilities.metrics import SIGNUPS
+from modules.utilities.tracing import traced
 from database.setup import Database, roles
 from modules.utilities.input_utils import (
     get_new_user_email,
@@ -19,9 +19,9 @@ from modules.utilities.input_utils import (
     get_valid_yes_or_no,
     get_valid_string,
 )
-from modules.utilities.send_email import send_email
 
 
+@traced
 def login(db: Database) -> Union[User, None]:
     """
     Attempts to log in the user by requesting a username and password and
@@ -34,23 +34,24 @@ def login(db: Database) -> Union[User, None]:
     password = input("Your password: ")
 
     # fetch basic user data
-    user_data = db.cursor.execute(
-        """
-        SELECT user_id, username, first_name, surname, email, role, is_active
-        FROM Users
-        WHERE username = :username AND password = :password
-        """,
-        {"username": username, "password": password},
-    ).fetchone()
+    user_data = UserService(db).authenticate(username, password)
 
     if user_data:
         role = user_data["role"]
 
+        # Role modules are only imported once someone logs in with that role,
+        # so startup doesn't pay for the others (and pandas for admins)
         if role == "admin":
+            from modules.admin import Admin
+
             return Admin(database=db, **user_data)
         elif role == "clinician":
+            from modules.clinician import Clinician
+
             return Clinician(database=db, **user_data)
         elif role == "patient":
+            from modules.patient import Patient
+
             return Patient(database=db, **user_data)
         else:
             raise Exception("User role is not defined in the system.")
@@ -125,6 +126,7 @@ def registration_input(db: Database) -> dict[str, Union[str, datetime]]:
         return registration_input(db)
 
 
+@traced
 def signup(db: Database) -> bool:
     """
     Signs the user as a practitioner or clinician (not admin for now).
@@ -177,7 +179,9 @@ def signup(db: Database) -> bool:
             )
 
         db.connection.commit()
-        # Send registration email
+        # Send registration email, smtplib and ssl are only loaded when needed
+        from modules.utilities.send_email import send_email
+
         if user_info["role"] == "patient":
             message = f"Welcome to Breeze {user_info['first_name'].title()},\n\nWe will assign you a clinician soon; in the meantime, feel free to use our journaling and mood tracking options.\n\nBest regards,\nBreeze Team"
         else:
@@ -189,8 +193,10 @@ def signup(db: Database) -> bool:
         )
 
         print("\nYou are now registered with Breeze")
+        SIGNUPS.inc(result="success")
         return True
     except Exception as e:
         print(e)
         print("\nSomething went wrong with your registration")
+        SIGNUPS.inc(result="failure")
         return False
@@ -0,0 +1,197 @@
+"""
+Rolling statistics of patients' moods, for the clinician dashboard and
+admin reports.
+
+A caseload's moods are loaded into a patients by days matrix, NaN on days
+without an entry. Every statistic is then worked out for every patient and
+every day at once from running sums along the days, so the cost grows with
+the size of the matrix rather than with a loop per patient or per window.
+
+    mean_7, mean_30   average mood over the last 7 and 30 days
+    volatility_30     standard deviation of the moods of the last 30 days
+    slope_30          least squares trend of the last 30 days, in mood
+                      points per day
+    missing_30        share of the last 30 days without an entry
+
+Each is NaN where the window has too few entries (none for the means, one
+for the volatility and trend).
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Union
+
+import numpy as np
+
+from database.setup import Database
+from modules.utilities.display_utils import TableColumn
+
+# Trailing windows, in days, including the day itself
+SHORT_WINDOW = 7
+LONG_WINDOW = 30
+STATISTICS = ("mean_7", "mean_30", "volatility_30", "slope_30", "missing_30")
+# How the statistics are shown in tables, in the order of STATISTICS
+STATISTIC_COLUMNS = (
+    TableColumn("7 days", lambda mean: f"{mean:.1f}/6", "right"),
+    TableColumn("30 days", lambda mean: f"{mean:.1f}/6", "right"),
+    TableColumn("Volatility", lambda deviation: f"{deviation:.2f}", "right"),
+    TableColumn("Trend", lambda slope: f"{slope * 7:+.2f}/week", "right"),
+    TableColumn("Missed", lambda share: f"{share:.0%}", "right"),
+)
+# Characters of each entry loaded: "YYYY-MM-DD" and a one digit mood
+ENTRY_WIDTH = 11
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sums of each row over a trailing window, from one running sum"""
+    running = np.cumsum(values, axis=1)
+    sums = running.copy()
+    sums[:, window:] -= running[:, :-window]
+    return sums
+
+
+def divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """numerator / denominator, NaN where the denominator is 0"""
+    result = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=result, where=denominator != 0)
+    return result
+
+
+@dataclass
+class MoodTrends:
+    """The statistics of each patient (rows) on each day (columns)"""
+
+    user_ids: np.ndarray
+    days: list[date]
+    moods: np.ndarray
+    mean_7: np.ndarray
+    mean_30: np.ndarray
+    volatility_30: np.ndarray
+    slope_30: np.ndarray
+    missing_30: np.ndarray
+
+    @classmethod
+    def from_moods(
+        cls, user_ids: np.ndarray, days: list[date], moods: np.ndarray, history: int
+    ) -> "MoodTrends":
+        """
+        Works out the statistics from a matrix of moods whose first history
+        days only fill the windows of the days that follow, and are dropped
+        """
+        observed = ~np.isnan(moods)
+        count = observed.astype(np.float64)
+        mood = np.where(observed, moods, 0.0)
+        # Days are numbered from the first one, moods weighted by their day
+        day = np.arange(moods.shape[1], dtype=np.float64)
+        x = count * day
+
+        n_7 = rolling_sum(count, SHORT_WINDOW)
+        n = rolling_sum(count, LONG_WINDOW)
+        sum_y = rolling_sum(mood, LONG_WINDOW)
+        sum_yy = rolling_sum(mood * mood, LONG_WINDOW)
+        sum_x = rolling_sum(x, LONG_WINDOW)
+        sum_xx = rolling_sum(x * day, LONG_WINDOW)
+        sum_xy = rolling_sum(x * mood, LONG_WINDOW)
+
+        mean_30 = divide(sum_y, n)
+        variance = divide(sum_yy, n) - mean_30 * mean_30
+        volatility = np.sqrt(np.maximum(variance, 0))
+        volatility[n < 2] = np.nan
+        slope = divide(n * sum_xy - sum_x * sum_y, n * sum_xx - sum_x * sum_x)
+        slope[n < 2] = np.nan
+
+        kept = slice(history, None)
+        return cls(
+            user_ids=user_ids,
+            days=days[history:],
+            moods=moods[:, kept],
+            mean_7=divide(rolling_sum(mood, SHORT_WINDOW), n_7)[:, kept],
+            mean_30=mean_30[:, kept],
+            volatility_30=volatility[:, kept],
+            slope_30=slope[:, kept],
+            missing_30=(1 - n / LONG_WINDOW)[:, kept],
+        )
+
+    def latest(self) -> dict[int, tuple[Union[float, None], ...]]:
+        """
+        The statistics of each patient on the last day, in the order of
+        STATISTICS, by user id. Missing values are None rather than NaN.
+        """
+        last = np.column_stack([getattr(self, name)[:, -1] for name in STATISTICS])
+        return {
+            user_id: tuple(None if np.isnan(value) else value for value in values)
+            for user_id, values in zip(self.user_ids.tolist(), last.tolist())
+        }
+
+
+class MoodAnalytics:
+    """
+    Loads patients' moods as arrays and works out their rolling statistics
+    (see MoodTrends)
+    """
+
+    database: Database
+
+    def __init__(self, db: Database) -> None:
+        self.database = db
+
+    def get_trends(
+        self,
+        clinician_id: Union[int, None] = None,
+        days: int = 90,
+        end: Union[date, None] = None,
+    ) -> MoodTrends:
+        """
+        Returns the statistics of a clinician's patients, or of every patient,
+        for each of the days up to end (today by default)
+        """
+        end = end or date.today()
+        history = LONG_WINDOW - 1
+        first = end - timedelta(days=days + history - 1)
+        condition, parameters = (
+            ("p.clinician_id = ?", (clinician_id,)) if clinician_id else ("1", ())
+        )
+
+        user_ids = np.array(
+            self.database.cursor.execute(
+                f"SELECT user_id FROM Patients p WHERE {condition} ORDER BY user_id",
+                parameters,
+            ).fetchall(),
+            dtype=np.int64,
+        )
+
+        # A Python row per entry would take longer than everything else, so
+        # each patient's entries come as one string, split up by NumPy
+        rows = self.database.cursor.execute(
+            f"""
+            SELECT m.user_id, group_concat(substr(m.date, 1, 10) || m.mood, '') AS entries
+            FROM MoodEntries m
+            JOIN Patients p ON p.user_id = m.user_id
+            WHERE {condition} AND m.date >= ? AND m.date < ?
+            GROUP BY m.user_id
+            """,
+            (
+                *parameters,
+                first.strftime("%Y-%m-%d"),
+                (end + timedelta(days=1)).strftime("%Y-%m-%d"),
+            ),
+        ).fetchall()
+
+        width = days + history
+        moods = np.full((len(user_ids), width), np.nan)
+        first_day = np.datetime64(first, "D")
+        for row in rows:
+            data = row["entries"].encode()
+            day = np.frombuffer(data, dtype=f"S{ENTRY_WIDTH}").astype("S10")
+            mood = np.frombuffer(data, dtype=np.uint8)[ENTRY_WIDTH - 1 :: ENTRY_WIDTH]
+            moods[
+                np.searchsorted(user_ids, row["user_id"]),
+                (day.astype("datetime64[D]") - first_day).astype(np.int64),
+            ] = mood - ord("0")
+
+        return MoodTrends.from_moods(
+            user_ids,
+            [first + timedelta(days=offset) for offset in range(width)],
+            moods,
+            history,
+        )
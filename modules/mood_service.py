@@ -0,0 +1,82 @@
+from datetime import datetime
+from typing import Any, Literal, Union
+
+from database.setup import Database
+from modules.utilities.date_utils import date_range_condition, get_date_range
+from modules.utilities.metrics import MOOD_ENTRIES
+from modules.utilities.pagination import KeysetPaginator
+
+MOOD_SCORES = range(1, 7)
+
+
+class MoodService:
+    """
+    Records and looks up patients' daily moods without any terminal input or
+    output, so flows, jobs and other front ends share the same logic.
+    """
+
+    database: Database
+
+    def __init__(self, db: Database) -> None:
+        self.database = db
+
+    def get_day_entry(
+        self, user_id: int, day: Union[datetime, None] = None
+    ) -> Union[dict[str, Any], None]:
+        """Returns the patient's mood entry for a day (today by default), if any"""
+        return self.database.cursor.execute(
+            "SELECT entry_id, text, mood FROM MoodEntries WHERE user_id = ? AND "
+            + date_range_condition(),
+            (user_id, *get_date_range(day or datetime.now())),
+        ).fetchone()
+
+    def record_mood(
+        self, user_id: int, mood: int, text: str, day: Union[datetime, None] = None
+    ) -> Literal["added", "updated"]:
+        """
+        Records the patient's mood for a day (today by default), replacing the
+        entry for that day if there is one. Raises ValueError for invalid moods.
+        """
+        if mood not in MOOD_SCORES:
+            raise ValueError("Mood must be a number from 1 to 6.")
+        day = day or datetime.now()
+
+        entry = self.get_day_entry(user_id, day)
+        if entry:
+            self.database.cursor.execute(
+                "UPDATE MoodEntries SET text = ?, mood = ? WHERE entry_id = ?",
+                (text, mood, entry["entry_id"]),
+            )
+        else:
+            self.database.cursor.execute(
+                "INSERT INTO MoodEntries (user_id, text, date, mood) VALUES (?, ?, ?, ?)",
+                (user_id, text, day.strftime("%Y-%m-%d"), mood),
+            )
+        self.database.connection.commit()
+        action = "updated" if entry else "added"
+        MOOD_ENTRIES.inc(action=action)
+        return action
+
+    def get_entries(
+        self,
+        user_id: int,
+        day: Union[datetime, None] = None,
+        page_size: int = 10,
+        after: Union[tuple[str, int], None] = None,
+    ) -> KeysetPaginator:
+        """Pages through the patient's moods, optionally only those of one day"""
+        conditions = "user_id = ?"
+        params = [user_id]
+        if day:
+            conditions += " AND " + date_range_condition()
+            params.extend(get_date_range(day))
+
+        return KeysetPaginator(
+            self.database,
+            "date, text, mood",
+            "MoodEntries",
+            conditions,
+            params,
+            page_size=page_size,
+            after=after,
+        )
@@ -5,7 +5,11 @@ import random
 import time
 
 from database.setup import Database
+from modules.appointment_service import AppointmentService
+from modules.journal_service import JournalService
+from modules.mood_service import MoodService
 from modules.streaks_service import StreakService
+from modules.user_service import UserService
 from modules.utilities.input_utils import (
     get_new_user_email,
     get_new_username,
@@ -15,16 +19,20 @@ from modules.utilities.input_utils import (
     get_valid_date,
     get_valid_yes_or_no,
 )
+from modules.utilities.tracing import trace_span, traced
 from modules.utilities.display_utils import (
     display_choice,
+    display_pages,
     clear_terminal,
+    is_terminal,
     wait_terminal,
+    write_screen,
 )
 from modules.appointments import (
     request_appointment,
     cancel_appointment,
-    get_patient_appointments,
 )
+from modules.search import display_search
 from modules.constants import RELAXATION_RESOURCES, MOODS, SEARCH_OPTIONS, QUOTES
 from modules.user import User
 
@@ -92,6 +100,7 @@ class Patient(User):
                 return User(self.database, *clinician_data)
         return None
 
+    @traced
     def view_info(self):
         """
         Displays patient's information.
@@ -133,11 +142,7 @@ class Patient(User):
 
         try:
             # First update on the database
-            self.database.cursor.execute(
-                f"UPDATE Patients SET {attribute} = ? WHERE user_id = ?",
-                (value, self.user_id),
-            )
-            self.database.connection.commit()
+            UserService(self.database).update_user(self.user_id, attribute, value)
 
             # Then in the object if that particular attribute is stored here
             if hasattr(self, attribute):
@@ -154,12 +159,13 @@ class Patient(User):
             return True
 
         # If there is an error with the query
-        except sqlite3.OperationalError as e:
+        except (ValueError, sqlite3.OperationalError) as e:
             print(
                 f"There was an error updating the {attribute.replace('_', ' ').capitalize()}.\n Error: {e}"
             )
             return False
 
+    @traced
     def edit_self_info(self) -> bool:
         """
         Allows the patient to change their details.
@@ -250,47 +256,45 @@ class Patient(User):
             print(f"An unexpected error occurred: {e}")
             return False
 
+    @traced
     def display_previous_moods(
-        self, date: Optional[str] = None
+        self, date: Optional[str] = None, page_size: int = 10
     ) -> list[dict[str, str]]:
         """
-        Displays patient's moods, optionally filtering by a specific date.
+        Displays patient's moods a page at a time, optionally filtering by
+        a specific date. Returns the last page viewed.
         """
         clear_terminal()
-        query = "SELECT date, text, mood FROM MoodEntries WHERE user_id = ?"
-        params = [self.user_id]
 
-        if date:
-            query += " AND DATE(date) = ?"
-            params.append(date)
-
-        query += " ORDER BY date ASC"
+        def format_page(entries: list[dict[str, Any]]) -> str:
+            lines = [f"\nMood Entries for {date if date else 'all dates'}:\n"]
+            for entry in entries:
+                old_mood = MOODS[str(entry["mood"])]
+                show_moods = f"{old_mood['ansi']} {old_mood['description']}\033[00m"
+                lines.append(f"Date: {str(entry['date']).split()[0]}")
+                lines.append("Mood: " + show_moods)
+                lines.append(f"Content: {entry['text']}\n")
+            return "\n".join(lines) + "\n"
 
         try:
-            self.database.cursor.execute(query, tuple(params))
-            entries = [
-                {"date": row["date"], "text": row["text"], "mood": row["mood"]}
-                for row in self.database.cursor.fetchall()
-            ]
-
-            if entries:
-                print(f"\nMood Entries for {date if date else 'all dates'}:\n")
-                for entry in entries:
-                    old_mood = MOODS[str(entry["mood"])]
-                    show_moods = f"{old_mood['ansi']} {old_mood['description']}\033[00m"
-                    print(f"Date: {str(entry['date']).split()[0]}")
-                    print("Mood: " + show_moods)
-                    print(f"Content: {entry['text']}\n")
+            pages = MoodService(self.database).get_entries(
+                self.user_id,
+                datetime.strptime(date, "%Y-%m-%d") if date else None,
+                page_size,
+            )
 
+            if pages.page:
+                display_pages(pages, format_page)
             else:
                 print("No mood entries found for the specified date.")
 
-            return entries
+            return pages.page
 
         except sqlite3.OperationalError as e:
             print(f"Database error occurred: {e}")
             return []
 
+    @traced
     def mood_of_the_day(self) -> bool:
         """
         Manages the mood entry for the current day:
@@ -298,11 +302,8 @@ class Patient(User):
         - Creates a new mood entry if none exists.
         """
         clear_terminal()
-        self.database.cursor.execute(
-            "SELECT text, mood FROM MoodEntries WHERE user_id = ? AND DATE(date) = ?",
-            (self.user_id, datetime.now().strftime("%Y-%m-%d")),
-        )
-        entry = self.database.cursor.fetchone()
+        moods = MoodService(self.database)
+        entry = moods.get_day_entry(self.user_id)
 
         if entry:
             print("You already have an entry for today.")
@@ -368,19 +369,10 @@ class Patient(User):
             return False
         comment = comment_input()
         clear_terminal()
-        today_date = datetime.now().strftime("%Y-%m-%d")
-        query_check = (
-            "SELECT text, mood FROM MoodEntries WHERE user_id = ? AND DATE(date) = ?"
-        )
-        query_update = "UPDATE MoodEntries SET text = ?, mood = ? WHERE user_id = ? AND DATE(date) = ?"
-        query_insert = (
-            "INSERT INTO MoodEntries (user_id, text, date, mood) VALUES (?, ?, ?, ?)"
-        )
 
         try:
-            # Check if an entry already exists for today
-            self.database.cursor.execute(query_check, (self.user_id, today_date))
-            entry = self.database.cursor.fetchone()
+            # Check again, as an entry may have been added meanwhile
+            entry = moods.get_day_entry(self.user_id)
 
             if entry:
                 old_mood = MOODS[str(entry["mood"])]
@@ -390,29 +382,17 @@ class Patient(User):
                 show_new_mood = f"{new_mood['ansi']} {new_mood['description']}\033[00m"
                 print(f"\nNew entry:\nMood: {show_new_mood}\nComment: {comment}")
                 # Confirm update
-                if get_valid_yes_or_no(
+                if not get_valid_yes_or_no(
                     "Are you sure you want to replace old mood entry for today? (Y/N): "
                 ):
-                    self.database.cursor.execute(
-                        query_update, (comment, mood, self.user_id, today_date)
-                    )
-                    self.database.connection.commit()
-                    print("Mood entry updated successfully.")
-                    wait_terminal("Press enter to return to main menu.")
-                    return True
-                else:
                     print("Mood entry was not updated.")
                     wait_terminal("Press enter to return to main menu.")
                     return False
-            else:
-                # Insert new mood entry
-                self.database.cursor.execute(
-                    query_insert, (self.user_id, comment, today_date, mood)
-                )
-                self.database.connection.commit()
-                print("Mood entry added successfully.")
-                wait_terminal("Press enter to return to main menu.")
-                return True
+
+            result = moods.record_mood(self.user_id, int(mood), comment)
+            print(f"Mood entry {result} successfully.")
+            wait_terminal("Press enter to return to main menu.")
+            return True
 
         except sqlite3.Error as e:
             print(f"Database error: {e}")
@@ -421,55 +401,48 @@ class Patient(User):
             print(f"An unexpected error occurred: {e}")
             return False
 
-    def display_journal(self, date: Optional[str] = None) -> list[dict[str, str]]:
+    @traced
+    def display_journal(
+        self, date: Optional[str] = None, page_size: int = 10
+    ) -> list[dict[str, str]]:
         """
-        Displays patient's journal entries, optionally filtering by a specific date.
+        Displays patient's journal entries a page at a time, optionally
+        filtering by a specific date. Returns the last page viewed.
         """
         clear_terminal()
-        query = "SELECT date, text FROM JournalEntries WHERE user_id = ?"
-        params = [self.user_id]
-
-        if date:
-            query += " AND DATE(date) = ?"
-            params.append(date)
 
-        query += " ORDER BY date ASC"
+        def format_page(entries: list[dict[str, Any]]) -> str:
+            lines = [f"\nJournal Entries for {date if date else 'all dates'}:\n"]
+            for entry in entries:
+                lines.append(f"Date: {entry['date']}")
+                lines.append(f"Content: {entry['text']}\n")
+            return "\n".join(lines) + "\n"
 
         try:
-            self.database.cursor.execute(query, tuple(params))
-            entries = [
-                {"date": row["date"], "text": row["text"]}
-                for row in self.database.cursor.fetchall()
-            ]
-
-            if entries:
-                print(f"\nJournal Entries for {date if date else 'all dates'}:\n")
-                for entry in entries:
-                    print(f"Date: {entry['date']}")
-                    print(f"Content: {entry['text']}\n")
+            pages = JournalService(self.database).get_entries(
+                self.user_id,
+                datetime.strptime(date, "%Y-%m-%d") if date else None,
+                page_size,
+            )
+
+            if pages.page:
+                display_pages(pages, format_page)
             else:
                 print("No journal entries found for the specified date.")
 
-            return entries
+            return pages.page
 
         except sqlite3.OperationalError as e:
             print(f"Database error occurred: {e}")
             return []
 
+    @traced
     def journal(self, content: str) -> bool:
         """
         Creates a journal entry for the patient.
         """
         try:
-            self.database.cursor.execute(
-                "INSERT INTO JournalEntries (user_id, text, date) VALUES (?, ?, ?)",
-                (
-                    self.user_id,
-                    content,
-                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                ),
-            )
-            self.database.connection.commit()
+            JournalService(self.database).add_entry(self.user_id, content)
             print("Journal entry added successfully.")
             return True
         except Exception as e:
@@ -477,6 +450,7 @@ class Patient(User):
             return False
 
     @staticmethod
+    @traced
     def search_exercises(keyword: str = None):
         """
         Looks up exercises and displays them with
@@ -568,42 +542,45 @@ class Patient(User):
         if not leave:
             return False
 
-    def view_appointments(self) -> list[dict[str, Any]]:
+    @traced
+    def view_appointments(self, page_size: int = 10) -> list[dict[str, Any]]:
         """
-        View all appointments for the patient, including their status.
+        View the patient's appointments a page at a time, including their
+        status. Returns the last page viewed.
         """
 
+        def format_page(appointments: list[dict[str, Any]]) -> str:
+            lines = ["\nYour Appointments:\n"]
+            for appointment in appointments:
+                lines.append(f"ID: {appointment['appointment_id']}")
+                lines.append(f"Date: {appointment['date']}")
+                lines.append(f"Your Notes: {appointment['patient_notes']}")
+                lines.append(f"Status: {appointment['status']}")
+                lines.append("-" * 40)
+            return "\n".join(lines) + "\n"
+
         try:
-            raw_appointments = get_patient_appointments(self.database, self.user_id)
-
-            appointments = [
-                {
-                    "appointment_id": row["appointment_id"],
-                    "date": row["date"],
-                    "patient_notes": row["patient_notes"],
-                    "status": row["status"],
-                }
-                for row in raw_appointments
-            ]
-
-            if appointments:
-                print("\nYour Appointments:\n")
-                for appointment in appointments:
-                    print(f"ID: {appointment['appointment_id']}")
-                    print(f"Date: {appointment['date']}")
-                    print(f"Your Notes: {appointment['patient_notes']}")
-                    print(f"Status: {appointment['status']}")
-                    print("-" * 40)
+            pages = AppointmentService(self.database).get_patient_appointments(
+                self.user_id, page_size
+            )
+
+            if pages.page:
+                display_pages(pages, format_page)
             else:
                 print("You don't have any appointments.")
 
-            return appointments
+            return pages.page
 
         except sqlite3.OperationalError as e:
             print(f"Error viewing appointments: {e}")
             return []
 
+    def get_upcoming_appointment_ids(self) -> list[int]:
+        """Returns the ids of the patient's appointments that are yet to happen"""
+        return AppointmentService(self.database).get_upcoming_ids(self.user_id)
+
     @staticmethod
+    @traced
     def see_quotes():
         """
         See inspirational quotes after a loading animation.
@@ -611,20 +588,18 @@ class Patient(User):
 
         icon = "\U0001f381"
 
-        # Display a loading animation
-        for i in range(6):
-            clear_terminal()
-            print("Getting your present, please wait")
-            print(f"{" " * ( i % 3 )}{icon}")
-            time.sleep(0.5)
-
-        clear_terminal()
-        print(icon)
-        print("Here's a quote for you:")
+        # Display a loading animation, each frame drawn in a single write
+        if is_terminal():
+            for i in range(6):
+                write_screen(
+                    f"Getting your present, please wait\n{" " * (i % 3)}{icon}\n",
+                    clear=True,
+                )
+                time.sleep(0.5)
 
         # Print a random quote from the list
         x = random.randint(0, (len(QUOTES) - 1))
-        print(QUOTES[x])
+        write_screen(f"{icon}\nHere's a quote for you:\n{QUOTES[x]}\n", clear=True)
         return wait_terminal()
 
     def flow(self):
@@ -633,40 +608,44 @@ class Patient(User):
         """
 
         while True:
-            clear_terminal()
-            greeting = (
-                f"Hello, {self.first_name} {self.surname}! You do not have an assigned clinician."
-                if not self.clinician
-                else f"Hello, {self.first_name} {self.surname}! Your assigned clinician is {self.clinician.first_name} {self.clinician.surname}."
-            )
-            print(greeting)
-
-            # Display the current streak and position in the leaderboard
-            streak_service = StreakService(self.database)
-            streak_service.print_current_user_streak(user_id=self.user_id)
-
-            options = [
-                "View/Edit Personal Info",
-                "Record Mood of the Day",
-                "Display Previous Moods",
-                "Add Journal Entry",
-                "Read Journal Entries",
-            ]
-
-            # Add options based on whether patient has an assigned clinician
-            if self.clinician_id:
-                options.extend(
-                    ["Self-Help Exercises", "Appointments", "Get a present from Breeze"]
+            # The dashboard, up to the choice of what to do next
+            with trace_span("Patient.dashboard"):
+                clear_terminal()
+                greeting = (
+                    f"Hello, {self.first_name} {self.surname}! You do not have an assigned clinician."
+                    if not self.clinician
+                    else f"Hello, {self.first_name} {self.surname}! Your assigned clinician is {self.clinician.first_name} {self.clinician.surname}."
                 )
-            else:
-                options.extend(["Self-Help Exercises", "Get a present from Breeze"])
 
-            choice = display_choice(
-                "Please select an option:",
-                options,
-                enable_zero_quit=True,
-                zero_option_message="Log out",
-            )
+                # Display the current streak and position in the leaderboard
+                streak_service = StreakService(self.database)
+                streak = streak_service.describe_current_user_streak(
+                    user_id=self.user_id
+                )
+
+                options = [
+                    "View/Edit Personal Info",
+                    "Record Mood of the Day",
+                    "Display Previous Moods",
+                    "Add Journal Entry",
+                    "Read Journal Entries",
+                ]
+
+                # Add options based on whether patient has an assigned clinician
+                if self.clinician_id:
+                    options.extend(
+                        ["Self-Help Exercises", "Appointments", "Get a present from Breeze"]
+                    )
+                else:
+                    options.extend(["Self-Help Exercises", "Get a present from Breeze"])
+
+                # The greeting and streak are written with the menu, in one go
+                choice = display_choice(
+                    "\n".join([greeting, *streak, "Please select an option:"]),
+                    options,
+                    enable_zero_quit=True,
+                    zero_option_message="Log out",
+                )
 
             # Log out if no choice is made.
             if not choice:
@@ -763,7 +742,11 @@ class Patient(User):
                             clear_terminal()
                             selected_option = display_choice(
                                 "Would you like to:",
-                                ["View all entries", "View a particular date"],
+                                [
+                                    "View all entries",
+                                    "View a particular date",
+                                    "Search your entries and notes",
+                                ],
                                 choice_str="Your selection: ",
                                 enable_zero_quit=True,
                                 zero_option_message="Return to main menu",
@@ -773,6 +756,9 @@ class Patient(User):
                             elif selected_option == 1:
                                 clear_terminal()
                                 date = ""
+                            elif selected_option == 3:
+                                display_search(self.database, patient_id=self.user_id)
+                                return date_options()
                             else:
                                 clear_terminal()
                                 date = get_valid_date(
@@ -860,17 +846,15 @@ class Patient(User):
                                     clear_terminal()
 
                                     """Cancel appointment."""
-                                    my_appointments = self.view_appointments()
+                                    self.view_appointments()
                                     appointment_id = get_user_input_with_limited_choice(
                                         "Enter appointment ID to cancel: ",
-                                        [
-                                            appointment["appointment_id"]
-                                            for appointment in my_appointments
-                                            if appointment["date"] >= datetime.now()
-                                        ],
+                                        self.get_upcoming_appointment_ids(),
                                         "Invalid appointment ID. Please try again, keeping in mind you can only cancel appointments in the future.",
                                     )
-                                    cancel_appointment(self.database, appointment_id)
+                                    cancel_appointment(
+                                        self.database, appointment_id, self.user_id
+                                    )
                                     action = 1
 
                                 case 4:
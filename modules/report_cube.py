@@ -0,0 +1,202 @@
+"""
+An in-memory cube of appointment counts for the admin's appointment
+reports.
+
+The counts of each status are loaded once from the rollups (see
+modules/report_service.py) into a frame indexed by role, period, period
+start and user, with years and all time added up from the months. Each
+report the admin picks is then a slice of the frame rather than a query
+and a pivot. Before a report is shown, refresh reads the totals that
+changed since, from AppointmentRollupChanges, and updates just those rows.
+"""
+
+from typing import Literal, Union
+
+import pandas as pd
+
+from database.setup import Database
+from modules.report_service import get_report_periods, prune_rollup_changes
+
+INDEX = ["role", "period", "period_start", "user_id"]
+
+
+class AppointmentCube:
+    """
+    The number of appointments of each status (columns) per role ("patient"
+    or "clinician"), period ("day", "week", "month", "year" or "all"), the
+    day the period starts on and user
+    """
+
+    database: Database
+    counts: pd.DataFrame
+    users: pd.DataFrame
+    last_change_id: int
+
+    def __init__(self, db: Database) -> None:
+        self.database = db
+        self.build()
+
+    def build(self) -> None:
+        """Loads every count from the rollups"""
+        cursor = self.database.cursor
+        self.last_change_id = cursor.execute(
+            "SELECT IFNULL(MAX(change_id), 0) FROM AppointmentRollupChanges"
+        ).fetchone()
+        prune_rollup_changes(self.database)
+
+        # Tuples rather than the usual dicts, which take twice as long to
+        # make for hundreds of thousands of rows
+        plain = self.database.connection.cursor()
+        plain.row_factory = None
+        rows = plain.execute("""
+            SELECT dimension AS role, period, period_start, group_key AS user_id,
+                status, appointments
+            FROM AppointmentRollups
+            WHERE appointments != 0
+        """).fetchall()
+        counts = pd.DataFrame(rows, columns=[*INDEX, "status", "appointments"])
+        counts = counts.pivot_table(
+            index=INDEX,
+            columns="status",
+            values="appointments",
+            aggfunc="sum",
+            fill_value=0,
+        )
+        self.counts = pd.concat([counts, self.add_up_months(counts)]).sort_index()
+        self.users = self.load_users()
+
+    def load_users(self) -> pd.DataFrame:
+        """The names of the users, by id"""
+        return pd.DataFrame(
+            self.database.cursor.execute(
+                "SELECT user_id, first_name, surname FROM Users"
+            ).fetchall(),
+            columns=["user_id", "first_name", "surname"],
+        ).set_index("user_id")
+
+    @staticmethod
+    def add_up_months(counts: pd.DataFrame) -> pd.DataFrame:
+        """The counts of the years and of all time, from those of the months"""
+        if counts.empty:
+            return counts
+        months = counts.xs("month", level="period").reset_index()
+        years = months.assign(
+            period="year",
+            period_start=months["period_start"].str.slice(0, 4) + "-01-01",
+        )
+        all_time = months.assign(period="all", period_start="")
+        return (
+            pd.concat([years, all_time])
+            .groupby(INDEX)
+            .sum()
+            .rename_axis(columns=counts.columns.name)
+        )
+
+    def refresh(self) -> int:
+        """
+        Updates the counts that changed since the cube was built or last
+        refreshed, returning how many totals were read again
+        """
+        cursor = self.database.cursor
+        first_change_id, last_change_id = (
+            cursor.execute(
+                "SELECT MIN(change_id), MAX(change_id) FROM AppointmentRollupChanges "
+                + "WHERE change_id > ?",
+                (self.last_change_id,),
+            )
+            .fetchone()
+            .values()
+        )
+        if last_change_id is None:
+            return 0
+        # Changes were deleted before they were read, so start again
+        if first_change_id > self.last_change_id + 1 and self.last_change_id:
+            self.build()
+            return len(self.counts)
+
+        # Totals are set to 0 rather than deleted, so each one that changed
+        # is still there
+        rows = cursor.execute(
+            """
+            SELECT r.dimension AS role, r.period, r.period_start,
+                r.group_key AS user_id, r.status, r.appointments
+            FROM (
+                SELECT DISTINCT period, dimension, period_start, group_key
+                FROM AppointmentRollupChanges
+                WHERE change_id > ? AND change_id <= ?
+            ) c
+            JOIN AppointmentRollups r USING (period, dimension, period_start, group_key)
+            """,
+            (self.last_change_id, last_change_id),
+        ).fetchall()
+        changed = pd.DataFrame(rows, columns=[*INDEX, "status", "appointments"])
+        changed = changed.pivot_table(
+            index=INDEX,
+            columns="status",
+            values="appointments",
+            aggfunc="sum",
+            fill_value=0,
+        )
+        counts = pd.concat([self.counts.drop(changed.index, errors="ignore"), changed])
+
+        # The years and all time of the users whose months changed are added
+        # up again
+        months = changed.index[changed.index.get_level_values("period") == "month"]
+        users = set(
+            zip(months.get_level_values("role"), months.get_level_values("user_id"))
+        )
+        if users:
+            of_users = pd.MultiIndex.from_arrays(
+                [
+                    counts.index.get_level_values("role"),
+                    counts.index.get_level_values("user_id"),
+                ]
+            ).isin(users)
+            is_month = counts.index.get_level_values("period") == "month"
+            is_total = counts.index.get_level_values("period").isin(("year", "all"))
+            counts = pd.concat(
+                [
+                    counts[~(of_users & is_total)],
+                    self.add_up_months(counts[of_users & is_month]),
+                ]
+            )
+
+        self.counts = counts.fillna(0).astype("int64").sort_index().sort_index(axis=1)
+        self.users = self.load_users()
+        self.last_change_id = last_change_id
+        # Once read, so writes don't keep adding to the log between builds
+        prune_rollup_changes(self.database)
+        return len(changed)
+
+    def get_counts(
+        self,
+        role: Literal["patient", "clinician"],
+        relative_time: Literal["current", "next", "last", "none"] = "none",
+        time_period: Literal["year", "month", "week", "day", "none"] = "none",
+        user_id: Union[int, None] = None,
+    ) -> pd.DataFrame:
+        """
+        The count of each status per user in a time period, indexed by the
+        user's id and names, without the statuses or users with none
+        """
+        if time_period == "none":
+            period, start = "all", ""
+        else:
+            period, start, _ = get_report_periods(relative_time, time_period)
+            period = "year" if time_period == "year" else period
+
+        try:
+            counts = self.counts.loc[(role, period, start)]
+        except KeyError:
+            counts = self.counts.iloc[:0].droplevel(INDEX[:-1])
+        if user_id is not None:
+            counts = counts[counts.index == user_id]
+        counts = counts.loc[counts.sum(axis=1) > 0, (counts > 0).any()]
+
+        names = self.users.reindex(counts.index)
+        counts.index = pd.MultiIndex.from_arrays(
+            [counts.index, names["first_name"], names["surname"]],
+            names=["user_id", "first_name", "surname"],
+        )
+        counts.columns.name = "status"
+        return counts
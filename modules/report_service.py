@@ -0,0 +1,153 @@
+"""
+Reports read from the mood and appointment rollups, the totals by day, week
+and month kept up to date by triggers (see
+database/migrations/0004_report_rollups.py). A report over years of
+entries reads a few hundred rows of totals rather than every entry.
+"""
+
+from datetime import date, timedelta
+from typing import Any, Literal, Union
+
+from database.setup import Database
+from modules.utilities.date_utils import to_day_string
+
+ROLLUP_PERIODS = ("day", "week", "month")
+# Changes of the appointment totals kept for in-memory copies of them to
+# catch up on (see modules/report_cube.py), older ones are pruned
+CHANGES_KEPT = 100_000
+MOOD_DIMENSIONS = ("patient", "clinician", "diagnosis")
+APPOINTMENT_DIMENSIONS = ("patient", "clinician")
+
+
+def get_report_periods(
+    relative_time: Literal["current", "next", "last", "none"] = "none",
+    time_period: Literal["year", "month", "week", "day", "none"] = "none",
+    today: Union[date, None] = None,
+) -> tuple[str, Union[str, None], Union[str, None]]:
+    """
+    The rollup period that covers a report's time filter, and the first
+    and last of its periods to read, as day strings. None for all time.
+    """
+    if time_period == "none":
+        return "month", None, None
+
+    today = today or date.today()
+    step = {"current": 0, "next": 1, "last": -1, "none": 0}[relative_time]
+    if time_period == "year":
+        year = today.year + step
+        return "month", f"{year}-01-01", f"{year}-12-01"
+    if time_period == "month":
+        month = today.year * 12 + today.month - 1 + step
+        first = date(month // 12, month % 12 + 1, 1)
+        return "month", to_day_string(first), to_day_string(first)
+    if time_period == "week":
+        monday = today - timedelta(days=today.weekday()) + timedelta(weeks=step)
+        return "week", to_day_string(monday), to_day_string(monday)
+    day = today + timedelta(days=step)
+    return "day", to_day_string(day), to_day_string(day)
+
+
+def prune_rollup_changes(db: Database, kept: int = CHANGES_KEPT) -> int:
+    """
+    Deletes all but the latest changes of the appointment totals, returning
+    how many were deleted. Copies that missed them build themselves again.
+    """
+    db.cursor.execute(
+        """
+        DELETE FROM AppointmentRollupChanges
+        WHERE change_id <= (SELECT MAX(change_id) FROM AppointmentRollupChanges) - ?
+        """,
+        (kept,),
+    )
+    deleted = db.cursor.rowcount
+    db.connection.commit()
+    return deleted
+
+
+def period_condition(first: Union[str, None], last: Union[str, None]) -> str:
+    conditions = ["r.period = ?", "r.dimension = ?"]
+    if first:
+        conditions.append("r.period_start >= ?")
+    if last:
+        conditions.append("r.period_start <= ?")
+    return " AND ".join(conditions)
+
+
+class ReportService:
+    database: Database
+
+    def __init__(self, db: Database) -> None:
+        self.database = db
+
+    def get_mood_totals(
+        self,
+        dimension: Literal["patient", "clinician", "diagnosis"],
+        period: Literal["day", "week", "month"] = "month",
+        first: Union[str, None] = None,
+        last: Union[str, None] = None,
+        group_key: Union[int, str, None] = None,
+    ) -> list[dict[str, Any]]:
+        """
+        The number of moods and their average in each period from first to
+        last (period start days, inclusive), per patient, clinician or
+        diagnosis
+        """
+        if dimension not in MOOD_DIMENSIONS or period not in ROLLUP_PERIODS:
+            raise ValueError(f"There are no mood totals by {dimension} and {period}.")
+
+        condition = period_condition(first, last)
+        parameters = [period, dimension, *filter(None, (first, last))]
+        if group_key is not None:
+            condition += " AND r.group_key = ?"
+            parameters.append(group_key)
+        return self.database.cursor.execute(
+            f"""
+            SELECT r.period_start, r.group_key, r.entries,
+                ROUND(1.0 * r.mood_total / r.entries, 2) AS average_mood
+            FROM MoodRollups r
+            WHERE {condition} AND r.entries > 0
+            ORDER BY r.period_start, r.group_key
+            """,
+            parameters,
+        ).fetchall()
+
+    def get_appointment_counts(
+        self,
+        dimension: Literal["patient", "clinician"],
+        period: Literal["day", "week", "month"] = "month",
+        first: Union[str, None] = None,
+        last: Union[str, None] = None,
+        group_key: Union[int, None] = None,
+        status: Union[str, None] = None,
+    ) -> list[dict[str, Any]]:
+        """
+        The number of appointments of each status from the period starting
+        on first to the one starting on last, per patient or clinician,
+        with their names
+        """
+        if dimension not in APPOINTMENT_DIMENSIONS or period not in ROLLUP_PERIODS:
+            raise ValueError(
+                f"There are no appointment counts by {dimension} and {period}."
+            )
+
+        condition = period_condition(first, last)
+        parameters = [period, dimension, *filter(None, (first, last))]
+        if group_key is not None:
+            condition += " AND r.group_key = ?"
+            parameters.append(group_key)
+        if status is not None:
+            condition += " AND r.status = ?"
+            parameters.append(status)
+        return self.database.cursor.execute(
+            f"""
+            SELECT r.group_key AS user_id, u.first_name, u.surname, u.username,
+                r.status, SUM(r.appointments) AS appointments
+            FROM AppointmentRollups r
+            JOIN Users u ON u.user_id = r.group_key
+            WHERE {condition}
+            GROUP BY r.group_key, r.status
+            HAVING SUM(r.appointments) > 0
+            ORDER BY r.group_key, r.status
+            """,
+            parameters,
+        ).fetchall()
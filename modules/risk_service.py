@@ -0,0 +1,205 @@
+"""
+Early warning scores of patients whose moods are getting worse.
+
+A scheduled job (python main.py score-risks, see modules/headless.py)
+scores the moods of the last five weeks of each patient for three signs:
+
+    sustained drop   the average mood of the last 7 days is at least a point
+                     below that of the 4 weeks before
+    streak break     a run of at least 7 days in a row of moods has ended
+    low mood run     the latest moods, one after the other, were Low or worse
+
+Each sign found adds to the score, so 0 means none. Signs stop counting
+two weeks after a patient's last mood. The scores are kept in RiskScores
+and shown to clinicians when they log in, without working them out again.
+
+The job only reads the moods of the patients with entries added since its
+last run, and of those whose score may have changed with the days alone,
+so a nightly run reads a small part of MoodEntries.
+"""
+
+from datetime import date, datetime, time, timedelta
+from itertools import groupby
+from statistics import mean
+from typing import Any, Union
+
+from database.setup import Database
+
+JOB_NAME = "score-risks"
+RECENT_DAYS = 7
+BASELINE_DAYS = 28
+# Fewer entries than these in either window say too little about a drop
+MIN_RECENT_ENTRIES = 3
+MIN_BASELINE_ENTRIES = 7
+MIN_DROP = 1.0
+MIN_BROKEN_STREAK = 7
+# Moods of 3 (Low) and below
+LOW_MOOD = 3
+MIN_LOW_RUN = 3
+# Days after the last mood that its signs keep counting
+STALE_DAYS = 14
+# Patients whose moods are read in one query
+BATCH_SIZE = 500
+
+
+def score_moods(
+    entries: list[tuple[date, int]], today: date
+) -> tuple[float, list[str]]:
+    """
+    The score of a patient's (day, mood) entries, in date order, and the
+    signs that make it up
+    """
+    score = 0.0
+    reasons = []
+    last_day = entries[-1][0]
+    days_since = (today - last_day).days
+    if days_since > STALE_DAYS:
+        return score, reasons
+
+    recent_start = today - timedelta(days=RECENT_DAYS - 1)
+    baseline_start = recent_start - timedelta(days=BASELINE_DAYS)
+    recent = [mood for day, mood in entries if day >= recent_start]
+    baseline = [mood for day, mood in entries if baseline_start <= day < recent_start]
+    if len(recent) >= MIN_RECENT_ENTRIES and len(baseline) >= MIN_BASELINE_ENTRIES:
+        drop = mean(baseline) - mean(recent)
+        if drop >= MIN_DROP:
+            score += drop
+            reasons.append(f"mood down {drop:.1f} points from the 4 weeks before")
+
+    # A streak is still going if there's a mood for yesterday
+    if days_since > 1:
+        streak = 1
+        while (
+            streak < len(entries)
+            and (entries[-streak][0] - entries[-streak - 1][0]).days == 1
+        ):
+            streak += 1
+        if streak >= MIN_BROKEN_STREAK:
+            score += 1
+            reasons.append(f"{streak} day streak ended {days_since - 1} days ago")
+
+    low_run = 0
+    while low_run < len(entries) and entries[-low_run - 1][1] <= LOW_MOOD:
+        low_run += 1
+    if low_run >= MIN_LOW_RUN:
+        score += low_run / MIN_LOW_RUN
+        reasons.append(f"{low_run} low moods in a row")
+
+    return round(score, 2), reasons
+
+
+class RiskService:
+    database: Database
+
+    def __init__(self, db: Database) -> None:
+        self.database = db
+
+    def score_patients(self, today: Union[date, None] = None) -> dict[str, Any]:
+        """
+        Rescores the patients whose score may have changed since the last
+        run, and returns how many were scored and flagged
+        """
+        today = today or date.today()
+        cursor = self.database.cursor
+        last_run = cursor.execute(
+            "SELECT last_entry_id, ran_at FROM JobRuns WHERE job = ?", (JOB_NAME,)
+        ).fetchone()
+        # Entries added while the job runs are left for the next run
+        last_entry_id = cursor.execute(
+            "SELECT IFNULL(MAX(entry_id), 0) FROM MoodEntries"
+        ).fetchone()
+
+        user_ids = set(
+            cursor.execute(
+                "SELECT DISTINCT user_id FROM MoodEntries "
+                + "WHERE entry_id > ? AND entry_id <= ?",
+                (last_run["last_entry_id"] if last_run else 0, last_entry_id),
+            ).fetchall()
+        )
+        if last_run:
+            # Moods of the day may have been changed rather than added and,
+            # from one day to another, signs start and expire with the days
+            # alone, for anyone whose signs still count. ran_at is the day
+            # last scored, which --date can put before or after today.
+            last_day = last_run["ran_at"].date()
+            since = (
+                today
+                if last_day == today
+                else min(last_day, today) - timedelta(days=STALE_DAYS + 1)
+            )
+            user_ids.update(
+                cursor.execute(
+                    "SELECT user_id FROM RiskScores WHERE last_entry_date >= ?",
+                    (since.isoformat(),),
+                ).fetchall()
+            )
+
+        first_day = today - timedelta(days=RECENT_DAYS + BASELINE_DAYS - 1)
+        scored_at = datetime.now()
+        flagged = 0
+        ordered = sorted(user_ids)
+        for start in range(0, len(ordered), BATCH_SIZE):
+            batch = ordered[start : start + BATCH_SIZE]
+            rows = cursor.execute(
+                f"""
+                SELECT user_id, substr(date, 1, 10) AS day, mood
+                FROM MoodEntries
+                WHERE user_id IN ({", ".join("?" * len(batch))})
+                    AND date >= ? AND date < ?
+                ORDER BY user_id, date
+                """,
+                (
+                    *batch,
+                    first_day.isoformat(),
+                    (today + timedelta(days=1)).isoformat(),
+                ),
+            ).fetchall()
+
+            scores = []
+            for user_id, user_rows in groupby(rows, key=lambda row: row["user_id"]):
+                entries = [
+                    (date.fromisoformat(row["day"]), row["mood"]) for row in user_rows
+                ]
+                score, reasons = score_moods(entries, today)
+                flagged += score > 0
+                scores.append(
+                    (user_id, score, "; ".join(reasons), entries[-1][0].isoformat())
+                )
+            cursor.executemany(
+                "INSERT OR REPLACE INTO RiskScores "
+                + "(user_id, score, reasons, last_entry_date, scored_at) "
+                + "VALUES (?, ?, ?, ?, ?)",
+                [(*score, scored_at) for score in scores],
+            )
+            # Patients without recent moods have nothing to score
+            unscored = set(batch).difference(score[0] for score in scores)
+            cursor.executemany(
+                "DELETE FROM RiskScores WHERE user_id = ?",
+                [(user_id,) for user_id in unscored],
+            )
+
+        cursor.execute(
+            "INSERT OR REPLACE INTO JobRuns (job, last_entry_id, ran_at) "
+            + "VALUES (?, ?, ?)",
+            (JOB_NAME, last_entry_id, datetime.combine(today, time())),
+        )
+        self.database.connection.commit()
+        return {
+            "patients_scored": len(ordered),
+            "flagged": flagged,
+            "last_entry_id": last_entry_id,
+        }
+
+    def get_flagged_patients(self, clinician_id: int) -> list[dict[str, Any]]:
+        """A clinician's patients with a score, highest first"""
+        return self.database.cursor.execute(
+            """
+            SELECT u.user_id, u.first_name, u.surname, r.score, r.reasons
+            FROM Patients p
+            JOIN RiskScores r ON r.user_id = p.user_id
+            JOIN Users u ON u.user_id = p.user_id
+            WHERE p.clinician_id = ? AND r.score > 0
+            ORDER BY r.score DESC
+            """,
+            (clinician_id,),
+        ).fetchall()
@@ -0,0 +1,173 @@
+import sqlite3
+from typing import Any, Union
+
+from database.setup import Database
+from modules.utilities.display_utils import clear_terminal, display_choice
+
+HIGHLIGHT_START = "\033[1m"
+HIGHLIGHT_END = "\033[0m"
+
+
+def to_match_query(keywords: str) -> str:
+    """
+    Turns free text into an FTS5 query that matches entries containing all
+    the words, quoting each so punctuation can't break the query syntax.
+    A trailing * keeps its meaning of a prefix search.
+    """
+    terms = []
+    for word in keywords.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def search_entries(
+    database: Database,
+    keywords: str,
+    patient_id: Union[int, None] = None,
+    clinician_id: Union[int, None] = None,
+    page: int = 1,
+    page_size: int = 10,
+) -> tuple[list[dict[str, Any]], bool]:
+    """
+    Searches journal entries, mood comments and appointment notes, best
+    matches first, returning one page of results and whether there are more.
+
+    Patients (patient_id) search their own entries and the notes they left
+    on appointments; clinicians (clinician_id) search their caseload's
+    entries and both sets of notes on their own appointments.
+    """
+    match_query = to_match_query(keywords)
+    if not match_query or (patient_id is None) == (clinician_id is None):
+        return [], False
+
+    if patient_id is not None:
+        owner = "user_id = :owner"
+        appointment_owner = "a.user_id = :owner"
+        # Clinician notes are private to the clinician
+        appointment_match = f"patient_notes : ({match_query})"
+        appointment_column = 0
+        owner_id = patient_id
+    else:
+        owner = "user_id IN (SELECT user_id FROM Patients WHERE clinician_id = :owner)"
+        appointment_owner = "a.clinician_id = :owner"
+        appointment_match = match_query
+        appointment_column = -1
+        owner_id = clinician_id
+
+    query = f"""
+        SELECT 'Journal' AS source, j.user_id, j.date AS "date [datetime]",
+        snippet(JournalSearch, 0, :start, :end, '...', 12) AS snippet, s.rank
+        FROM JournalSearch AS s JOIN JournalEntries AS j ON j.entry_id = s.rowid
+        WHERE JournalSearch MATCH :match AND j.{owner}
+
+        UNION ALL
+
+        SELECT 'Mood' AS source, m.user_id, m.date AS "date [datetime]",
+        snippet(MoodSearch, 0, :start, :end, '...', 12) AS snippet, s.rank
+        FROM MoodSearch AS s JOIN MoodEntries AS m ON m.entry_id = s.rowid
+        WHERE MoodSearch MATCH :match AND m.{owner}
+
+        UNION ALL
+
+        SELECT 'Appointment' AS source, a.user_id, a.date AS "date [datetime]",
+        snippet(AppointmentSearch, {appointment_column}, :start, :end, '...', 12) AS snippet, s.rank
+        FROM AppointmentSearch AS s JOIN Appointments AS a
+        ON a.appointment_id = s.rowid
+        WHERE AppointmentSearch MATCH :appointment_match AND {appointment_owner}
+
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+    """
+
+    try:
+        results = database.cursor.execute(
+            query,
+            {
+                "match": match_query,
+                "appointment_match": appointment_match,
+                "owner": owner_id,
+                "start": HIGHLIGHT_START,
+                "end": HIGHLIGHT_END,
+                # Fetch one extra row to know whether there is a next page
+                "limit": page_size + 1,
+                "offset": (page - 1) * page_size,
+            },
+        ).fetchall()
+        return results[:page_size], len(results) > page_size
+    except sqlite3.OperationalError as e:
+        print(f"Search failed: {e}")
+        return [], False
+
+
+def display_search(
+    database: Database,
+    patient_id: Union[int, None] = None,
+    clinician_id: Union[int, None] = None,
+    page_size: int = 10,
+) -> bool:
+    """
+    Asks for keywords and shows the matching entries a page at a time,
+    including the patient's name when a clinician is searching
+    """
+    clear_terminal()
+    keywords = input("Enter the words to search for (or 0 to go back): ").strip()
+    if not keywords or keywords == "0":
+        return False
+
+    names = {}
+    page = 1
+    while True:
+        clear_terminal()
+        results, has_next = search_entries(
+            database, keywords, patient_id, clinician_id, page, page_size
+        )
+
+        if clinician_id is not None:
+            # Looked up from the results, as notes on the clinician's
+            # appointments stay theirs after a patient moves to another
+            unnamed = {result["user_id"] for result in results}.difference(names)
+            names.update(
+                (row["user_id"], f"{row['first_name']} {row['surname']}")
+                for row in database.cursor.execute(
+                    f"""
+                    SELECT user_id, first_name, surname FROM Users
+                    WHERE user_id IN ({", ".join("?" * len(unnamed))})
+                    """,
+                    list(unnamed),
+                ).fetchall()
+            )
+
+        if not results:
+            print(f"No entries found matching '{keywords}'.")
+        else:
+            print(f"Results for '{keywords}' (page {page}):\n")
+            for result in results:
+                name = names.get(result["user_id"])
+                owner = f" - {name}" if name else ""
+                print(f"{result['source']} - {result['date'].date()}{owner}")
+                print(f"{result['snippet']}\n")
+
+        options = []
+        if has_next:
+            options.append("Next page")
+        if page > 1:
+            options.append("Previous page")
+        options.append("New search")
+
+        choice = display_choice(
+            "Would you like to:",
+            options,
+            enable_zero_quit=True,
+            zero_option_message="Go back",
+        )
+        if choice == 0:
+            return False
+        elif options[choice - 1] == "Next page":
+            page += 1
+        elif options[choice - 1] == "Previous page":
+            page -= 1
+        else:
+            return display_search(database, patient_id, clinician_id, page_size)
@@ -0,0 +1,203 @@
+"""
+Serves Breeze to many users from a single process.
+
+Each TCP connection (telnet or nc) gets its own session with the same menus
+and role flows as main.py. The flows are blocking code built on input()
+and print(), so every session runs in a worker thread, and sys.stdin and
+sys.stdout are replaced by proxies that route each thread's reads and
+writes to its own connection. The asyncio event loop only moves lines
+between the sockets and the sessions.
+
+Sessions share one pool of database connections, and the modules one of
+them loads on demand (pandas, the role screens) are already loaded for
+the others.
+
+From the repository root:
+    python -m modules.server [--host 127.0.0.1] [--port 8023] [--max-sessions 200]
+"""
+
+import asyncio
+import queue
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from database.pool import ConnectionPool, PoolTimeout
+from modules.session import run_session, say_goodbye
+
+# The session of the current worker thread, if it runs one
+_current = threading.local()
+
+
+class SessionIO:
+    """
+    The terminal of one connected user. Writes are buffered and sent in one
+    go when flushed, which input() does before every prompt.
+    """
+
+    def __init__(
+        self, loop: asyncio.AbstractEventLoop, writer: asyncio.StreamWriter
+    ) -> None:
+        self.loop = loop
+        self.writer = writer
+        self.lines = queue.SimpleQueue()
+        self.buffer = []
+
+    def write(self, text: str) -> int:
+        self.buffer.append(text)
+        return len(text)
+
+    def flush(self) -> None:
+        if self.buffer:
+            # Telnet clients expect a carriage return with every newline
+            data = "".join(self.buffer).replace("\n", "\r\n").encode()
+            self.buffer.clear()
+            try:
+                self.loop.call_soon_threadsafe(self.writer.write, data)
+            except RuntimeError:
+                # The event loop has stopped, so has the connection
+                pass
+
+    def isatty(self) -> bool:
+        # Telnet clients understand the escape codes that clear the screen
+        return True
+
+    def readline(self) -> str:
+        """Waits for the next line the user sends, or "" once they've left"""
+        self.flush()
+        return self.lines.get()
+
+    def feed(self, line: str) -> None:
+        self.lines.put(line.rstrip("\r\n") + "\n")
+
+    def hang_up(self) -> None:
+        # input() raises EOFError on an empty line, which ends the session
+        self.lines.put("")
+
+
+class ThreadStream:
+    """
+    Stands in for sys.stdin or sys.stdout, forwarding everything to the
+    session of the current thread, or to the original stream outside them
+    """
+
+    def __init__(self, original) -> None:
+        self.original = original
+
+    def __getattr__(self, name: str):
+        return getattr(getattr(_current, "session", None) or self.original, name)
+
+
+def run_session_thread(pool: ConnectionPool, session: SessionIO) -> None:
+    _current.session = session
+    try:
+        with pool.connection() as db:
+            run_session(db)
+        say_goodbye()
+    except EOFError:
+        # The user disconnected, or the server is shutting down
+        pass
+    except PoolTimeout:
+        print("Breeze is busy at the moment, please try again later.")
+    except Exception:
+        traceback.print_exc(file=sys.__stderr__)
+        print("\nSomething went wrong, please reconnect.")
+    finally:
+        session.flush()
+        _current.session = None
+
+
+class SessionServer:
+    def __init__(self, pool: ConnectionPool, max_sessions: int) -> None:
+        self.pool = pool
+        self.max_sessions = max_sessions
+        self.executor = ThreadPoolExecutor(max_sessions, "session")
+        self.sessions: set[SessionIO] = set()
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        if len(self.sessions) >= self.max_sessions:
+            writer.write(b"Breeze is busy at the moment, please try again later.\r\n")
+            await writer.drain()
+            writer.close()
+            return
+
+        loop = asyncio.get_running_loop()
+        session = SessionIO(loop, writer)
+        self.sessions.add(session)
+
+        async def read_lines() -> None:
+            while line := await reader.readline():
+                session.feed(line.decode(errors="replace"))
+            session.hang_up()
+
+        reading = asyncio.create_task(read_lines())
+        try:
+            await loop.run_in_executor(
+                self.executor, run_session_thread, self.pool, session
+            )
+        finally:
+            # Ends the session if the server stops before the user quits
+            session.hang_up()
+            self.sessions.discard(session)
+            reading.cancel()
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def hang_up_all(self) -> None:
+        for session in list(self.sessions):
+            session.hang_up()
+
+
+async def serve(host: str, port: int, server: SessionServer) -> None:
+    listener = await asyncio.start_server(server.handle_connection, host, port)
+    address = listener.sockets[0].getsockname()
+    print(f"Serving Breeze on {address[0]}:{address[1]}", flush=True)
+    try:
+        # Connections are accepted in the background until Ctrl+C cancels this
+        await asyncio.Future()
+    finally:
+        # Sessions waiting for input end, so their connections close before
+        # the listener waits for them
+        server.hang_up_all()
+        listener.close()
+        await listener.wait_closed()
+
+
+def main(host: str, port: int, database: str, max_sessions: int) -> None:
+    pool = ConnectionPool(database, size=max_sessions)
+    server = SessionServer(pool, max_sessions)
+    sys.stdin = ThreadStream(sys.stdin)
+    sys.stdout = ThreadStream(sys.stdout)
+    try:
+        asyncio.run(serve(host, port, server))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.executor.shutdown()
+        sys.stdin = sys.stdin.original
+        sys.stdout = sys.stdout.original
+        pool.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8023)
+    parser.add_argument("--database", default="breeze.db")
+    parser.add_argument(
+        "--max-sessions",
+        type=int,
+        default=200,
+        help="Users served at once, each with a thread and a database connection",
+    )
+    args = parser.parse_args()
+    main(args.host, args.port, args.database, args.max_sessions)
@@ -0,0 +1,50 @@
+from database.setup import Database
+from modules.login import login, signup
+from modules.emergency import display_emergency_numbers
+from modules.utilities.display_utils import (
+    display_choice,
+    clear_terminal,
+    wait_terminal,
+)
+
+
+def run_session(db: Database) -> None:
+    """
+    Shows the welcome screen and the log in menu, then runs the flow of
+    whoever logs in, until the user quits. Used by main.py for the local
+    terminal and by modules/server.py for each connected user.
+    """
+    clear_terminal()
+    print("Welcome to Breeze, your Mental Health and Wellbeing partner!\n")
+    display_emergency_numbers()
+    run = True
+    while run:
+        selection = display_choice(
+            "\nPlease select an option to continue:",
+            ["Log In", "Sign Up"],
+            enable_zero_quit=True,
+            zero_option_message="Quit",
+        )
+        if selection == 0:
+            run = False
+            continue
+        if selection == 2:
+            signup(db)
+            continue
+        user = login(db)
+        if user:
+            if user.is_active:
+                run = user.flow()
+            else:
+                print(
+                    "Your account is currently inactive. Please contact an administrator."
+                )
+                wait_terminal("Press enter to log out.")
+
+            # NOTE: if flow returns True -> login screen
+            # if flow returns False -> quits app
+
+
+def say_goodbye() -> None:
+    clear_terminal()
+    print("\nThanks for using Breeze. Goodbye!")
@@ -11,14 +11,16 @@ class StreakService:
         self.database = db
         self.mood_streaks = self.get_all_user_mood_streaks()
 
-    def print_current_user_streak(self, user_id: int) -> None:
+    def describe_current_user_streak(self, user_id: int) -> list[str]:
+        """The lines about the user's streak shown on their dashboard"""
+        lines = []
         streak = self.mood_streaks[user_id]
         position = self.get_current_user_position(streak)
         ties = self.get_current_user_ties(streak)
         if streak == 0:
-            print("You need to log your mood to start a streak.")
+            lines.append("You need to log your mood to start a streak.")
         else:
-            print(
+            lines.append(
                 f"You have logged your mood for {streak} {"day" if streak == 1 else "days"} in a row."
             )
 
@@ -34,14 +36,15 @@ class StreakService:
                 else ""
             )
 
-            print(f"{position_string}{tie_string}.")
+            lines.append(f"{position_string}{tie_string}.")
 
             if position == 1:
-                print("Continue logging your mood daily to maintain your lead!")
+                lines.append("Continue logging your mood daily to maintain your lead!")
             else:
-                print(
+                lines.append(
                     "Continue registering your mood daily to advance in the leaderboard!"
                 )
+        return lines
 
     def get_current_user_position(self, streak: int) -> int:
         """
@@ -1,6 +1,7 @@
 import sqlite3
 from typing import Any
 from database.setup import Database
+from modules.user_service import UserService
 
 
 class User:
@@ -42,11 +43,7 @@ class User:
 
         try:
             # First update on the database
-            self.database.cursor.execute(
-                f"UPDATE Users SET {attribute} = ? WHERE user_id = ?",
-                (value, self.user_id),
-            )
-            self.database.connection.commit()
+            UserService(self.database).update_user(self.user_id, attribute, value)
 
             # Then in the object if that particular attribute is stored here
             if hasattr(self, attribute):
@@ -64,7 +61,7 @@ class User:
             return True
 
         # If there is an error with the query
-        except sqlite3.OperationalError as e:
+        except (ValueError, sqlite3.OperationalError) as e:
             print(
                 f"There was an error updating the {attribute.replace('_', ' ').capitalize()}.\n Error: {e}"
             )
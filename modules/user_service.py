@@ -0,0 +1,96 @@
+from typing import Any, Union
+
+from database.setup import Database
+from modules.utilities.metrics import LOGINS
+
+# Attributes that can be changed, and the table that stores them
+USER_ATTRIBUTES = ("username", "password", "first_name", "surname", "email", "is_active")
+PATIENT_ATTRIBUTES = ("emergency_email", "date_of_birth", "diagnosis", "clinician_id")
+
+
+class UserService:
+    """
+    Looks up and updates users without any terminal input or output, for
+    the flows of every role and for other front ends.
+    """
+
+    database: Database
+
+    def __init__(self, db: Database) -> None:
+        self.database = db
+
+    def authenticate(self, username: str, password: str) -> Union[dict[str, Any], None]:
+        """Returns the basic details of the user with these credentials, if any"""
+        user = self.database.cursor.execute(
+            """
+            SELECT user_id, username, first_name, surname, email, role, is_active
+            FROM Users
+            WHERE username = :username AND password = :password
+            """,
+            {"username": username, "password": password},
+        ).fetchone()
+        LOGINS.inc(result="success" if user else "failure")
+        return user
+
+    def get_user(self, user_id: int) -> Union[dict[str, Any], None]:
+        """Returns a user with their patient details, if they have any"""
+        return self.database.cursor.execute(
+            """
+            SELECT u.user_id, username, first_name, surname, email, is_active,
+                role, emergency_email, date_of_birth, diagnosis, clinician_id
+            FROM Users u
+            LEFT JOIN Patients p ON u.user_id = p.user_id
+            WHERE u.user_id = ?
+            """,
+            (user_id,),
+        ).fetchone()
+
+    def update_user(self, user_id: int, attribute: str, value: Any) -> None:
+        """
+        Updates one attribute of a user in whichever table stores it.
+
+        Raises ValueError for attributes that can't be changed or users that
+        don't exist, and lets database errors through.
+        """
+        if attribute in USER_ATTRIBUTES:
+            table = "Users"
+        elif attribute in PATIENT_ATTRIBUTES:
+            table = "Patients"
+        else:
+            raise ValueError(f"Attribute {attribute} cannot be changed.")
+
+        # The attribute is one of the names above, so safe to format in
+        self.database.cursor.execute(
+            f"UPDATE {table} SET {attribute} = ? WHERE user_id = ?",
+            (value, user_id),
+        )
+        if self.database.cursor.rowcount == 0:
+            self.database.connection.rollback()
+            raise ValueError(f"There is no user with ID {user_id} in {table}.")
+        self.database.connection.commit()
+
+    def assign_clinician(self, patient_id: int, clinician_id: int) -> None:
+        """Assigns a patient to an active clinician, raising ValueError if not possible"""
+        users = {
+            user["user_id"]: user
+            for user in self.database.cursor.execute(
+                "SELECT user_id, role, is_active FROM Users WHERE user_id IN (?, ?)",
+                (patient_id, clinician_id),
+            ).fetchall()
+        }
+        patient = users.get(patient_id)
+        clinician = users.get(clinician_id)
+        if not patient or patient["role"] != "patient":
+            raise ValueError(f"There is no patient with ID {patient_id}.")
+        if not clinician or clinician["role"] != "clinician":
+            raise ValueError(f"There is no clinician with ID {clinician_id}.")
+        if not clinician["is_active"]:
+            raise ValueError(f"Clinician {clinician_id} is not active.")
+        self.update_user(patient_id, "clinician_id", clinician_id)
+
+    def delete_user(self, user_id: int) -> bool:
+        """Deletes a user and, through cascades, all their data"""
+        self.database.cursor.execute("DELETE FROM Users WHERE user_id = ?", (user_id,))
+        deleted = self.database.cursor.rowcount > 0
+        self.database.connection.commit()
+        return deleted
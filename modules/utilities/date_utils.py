@@ -0,0 +1,50 @@
+from datetime import date, datetime, timedelta
+from typing import Literal, Union
+
+
+def to_day_string(day: Union[date, datetime]) -> str:
+    """
+    Formats a date as YYYY-MM-DD for comparing against stored dates.
+
+    Dates are stored both as "YYYY-MM-DD HH:MM:SS" and in ISO format with
+    a "T", and both sort after their day string and before the next one,
+    so day strings make bounds that work for either format.
+    """
+    return day.strftime("%Y-%m-%d")
+
+
+def get_date_range(
+    day: Union[date, datetime],
+    time_period: Literal["day", "week", "month"] = "day",
+) -> tuple[str, str]:
+    """
+    Returns the half-open range [start, end) of the day, week (Monday to
+    Sunday) or month containing the given day, as day strings
+    """
+    if isinstance(day, datetime):
+        day = day.date()
+
+    if time_period == "day":
+        start = day
+        end = day + timedelta(days=1)
+    elif time_period == "week":
+        start = day - timedelta(days=day.weekday())
+        end = start + timedelta(days=7)
+    elif time_period == "month":
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+    else:
+        raise ValueError(f"Unknown time period '{time_period}'.")
+
+    return to_day_string(start), to_day_string(end)
+
+
+def date_range_condition(column: str = "date") -> str:
+    """
+    Returns a WHERE condition for a half-open date range, to be used with
+    the two values from get_date_range.
+
+    Unlike DATE(date) = ?, comparing the bare column lets SQLite use an
+    index on it instead of scanning every row.
+    """
+    return f"{column} >= ? AND {column} < ?"
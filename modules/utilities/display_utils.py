@@ -1,5 +1,14 @@
+import math
 import os
+import sys
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass
 from datetime import datetime
+from functools import cache
+from typing import Any, Literal, Union
+
+# Moves the cursor home, then clears the screen and the scrollback, like `clear`
+CLEAR_SCREEN = "\033[H\033[2J\033[3J"
 
 
 def display_choice(
@@ -16,11 +25,11 @@ def display_choice(
     Optionally allows the user to quit (or another screen via callback) by entering 0.
     """
 
-    print(header)
-    for i, option in enumerate(options):
-        print(f"[{i + 1}] {option}")
+    lines = [header]
+    lines.extend(f"[{i + 1}] {option}" for i, option in enumerate(options))
     if enable_zero_quit:
-        print(f"[0] {zero_option_message}")
+        lines.append(f"[0] {zero_option_message}")
+    write_screen("\n".join(lines) + "\n")
     while True:
         choice = input(choice_str)
         if choice.isnumeric() and 1 <= int(choice) <= len(options):
@@ -39,19 +48,221 @@ def display_dict(dict: dict[str, any]) -> None:
     """
     Displays a dictionary in a clean way.
     """
-    for key, value in dict.items():
-        print(
+    write_screen(
+        "".join(
             f"{key.replace('_', ' ').capitalize()}: "
-            + f"{value.date() if isinstance(value, datetime) else value}"
+            + f"{value.date() if isinstance(value, datetime) else value}\n"
+            for key, value in dict.items()
         )
+    )
 
 
-def clear_terminal():
-    # Check if the operating system is Windows
+def display_pages(pages, format_page: Callable[[list], str]) -> None:
+    """
+    Shows the current page of a KeysetPaginator, as text from format_page,
+    and, when there is more than one page, lets the user move forwards and
+    backwards through them. Each page is written with its menu in one go.
+    """
+    while True:
+        text = format_page(pages.page)
+
+        options = []
+        if pages.has_next:
+            options.append("Next page")
+        if pages.has_previous:
+            options.append("Previous page")
+        if not options:
+            write_screen(text)
+            return
+
+        choice = display_choice(
+            f"{text}Page {pages.page_number}:",
+            options,
+            enable_zero_quit=True,
+            zero_option_message="Continue",
+        )
+        if choice == 0:
+            return
+
+        clear_terminal()
+        if options[choice - 1] == "Next page":
+            pages.next_page()
+        else:
+            pages.previous_page()
+
+
+@dataclass
+class TableColumn:
+    """How to show one column of a table, see render_table"""
+
+    header: str
+    format: Callable[[Any], str] = str
+    align: Literal["left", "right"] = "left"
+    max_width: int = 40
+
+
+def is_missing(value: Any) -> bool:
+    """Whether a cell has no value, None or NaN from pandas or numpy"""
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def format_cell(column: TableColumn, value: Any) -> str:
+    """Formats a value, showing missing values as blanks and cutting long ones"""
+    if is_missing(value):
+        return ""
+    text = column.format(value)
+    if len(text) > column.max_width:
+        return text[: column.max_width - 3] + "..."
+    return text
+
+
+def render_table(
+    rows: Iterable[Sequence],
+    columns: Sequence[TableColumn],
+    separator: str = "  ",
+    show_headers: bool = True,
+) -> Iterator[str]:
+    """
+    Yields the lines of a table with one column per TableColumn, taking the
+    values of each row in order.
+
+    Every cell is formatted once, in the same pass that finds the column
+    widths, and lines are only built as they are yielded. For long tables,
+    pass one page of rows at a time (see display_table).
+    """
+    widths = [len(column.header) if show_headers else 0 for column in columns]
+    cells = []
+    for row in rows:
+        row_cells = []
+        for i, (column, value) in enumerate(zip(columns, row)):
+            cell = format_cell(column, value)
+            if len(cell) > widths[i]:
+                widths[i] = len(cell)
+            row_cells.append(cell)
+        cells.append(row_cells)
+
+    def justify(row_cells: list[str]) -> str:
+        parts = [
+            cell.rjust(widths[i]) if columns[i].align == "right"
+            # The last column isn't padded, to avoid trailing spaces
+            else cell if i == len(row_cells) - 1
+            else cell.ljust(widths[i])
+            for i, cell in enumerate(row_cells)
+        ]
+        return separator.join(parts)
+
+    if show_headers:
+        yield justify([column.header for column in columns])
+        yield separator.join("-" * width for width in widths)
+    for row_cells in cells:
+        yield justify(row_cells)
+
+
+def sort_rows(rows: list[Sequence], column: int, descending: bool = False) -> None:
+    """Sorts rows in place by one column, with missing values last"""
+    present = [row for row in rows if not is_missing(row[column])]
+    missing = [row for row in rows if is_missing(row[column])]
+    present.sort(key=lambda row: row[column], reverse=descending)
+    rows[:] = present + missing
+
+
+def display_table(
+    rows: Iterable[Sequence],
+    columns: Sequence[TableColumn],
+    title: Union[str, None] = None,
+    page_size: int = 25,
+    sort_by: Union[int, None] = None,
+) -> None:
+    """
+    Displays a table one page at a time. When there is more than one page
+    the user can move between them or sort by any column before continuing.
+    """
+    rows = list(rows)
+    if sort_by is not None:
+        sort_rows(rows, sort_by)
+
+    page = 0
+    pages = max(1, -(-len(rows) // page_size))
+    while True:
+        start = page * page_size
+        lines = [title] if title else []
+        lines.extend(render_table(rows[start : start + page_size], columns))
+        if pages > 1:
+            lines.append(
+                f"Rows {start + 1}-{min(start + page_size, len(rows))} of {len(rows)}"
+            )
+        write_screen("\n".join(lines) + "\n")
+        if pages == 1:
+            return
+
+        options = []
+        if page < pages - 1:
+            options.append("Next page")
+        if page > 0:
+            options.append("Previous page")
+        options.append("Sort by a column")
+        choice = display_choice(
+            f"Page {page + 1} of {pages}:",
+            options,
+            enable_zero_quit=True,
+            zero_option_message="Continue",
+        )
+        if choice == 0:
+            return
+
+        clear_terminal()
+        if options[choice - 1] == "Next page":
+            page += 1
+        elif options[choice - 1] == "Previous page":
+            page -= 1
+        else:
+            column = display_choice(
+                "Sort by:", [column.header for column in columns]
+            )
+            descending = display_choice("Order:", ["Ascending", "Descending"]) == 2
+            sort_rows(rows, column - 1, descending)
+            page = 0
+            clear_terminal()
+
+
+def is_terminal() -> bool:
+    """Whether output goes to a terminal rather than a pipe or a file"""
+    return sys.stdout.isatty()
+
+
+@cache
+def enable_ansi() -> None:
+    """
+    The Windows console only understands escape codes once virtual terminal
+    processing is on, which running any command enables. Done once.
+    """
     if os.name == "nt":
-        os.system("cls")
-    else:
-        os.system("clear")
+        os.system("")
+
+
+def write_screen(text: str, clear: bool = False) -> None:
+    """
+    Writes a whole screen to the terminal in a single write, optionally
+    clearing it first, instead of one write per printed line
+    """
+    if clear:
+        clear_terminal()
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+def clear_terminal():
+    """
+    Clears the screen with ANSI escape codes rather than starting a `clear`
+    process. The codes stay in stdout's buffer, so they reach the terminal
+    in the same write as the next screen.
+
+    Does nothing when output isn't a terminal, so pipes and logs don't fill
+    up with escape codes.
+    """
+    if is_terminal():
+        enable_ansi()
+        sys.stdout.write(CLEAR_SCREEN)
 
 
 def wait_terminal(
@@ -5,6 +5,19 @@ from collections.abc import Iterable
 
 from database.setup import Database
 
+EMAIL_PATTERN = re.compile(r"^\S+@\S+\.\S+$")
+NAME_PATTERN = re.compile(r"^[A-Za-zÀ-ÖØ-öø-ÿĀ-ž]+([ '-][A-Za-zÀ-ÖØ-öø-ÿĀ-ž]+)*$")
+
+
+def validate_email(email: str) -> str:
+    """
+    Check that an email has a valid format and return it, raising a
+    ValueError with a message for the user otherwise
+    """
+    if EMAIL_PATTERN.match(email) is None:
+        raise ValueError("Invalid email format. Please try again.")
+    return email
+
 
 def get_valid_email(prompt: str, existing_emails: Union[list[str], None] = None) -> str:
     """
@@ -15,11 +28,42 @@ def get_valid_email(prompt: str, existing_emails: Union[list[str], None] = None)
         if existing_emails and email in existing_emails:
             print("Email already exists. Please try again.")
             continue
-        elif re.match(r"^\S+@\S+\.\S+$", email) is None:
-            print("Invalid email format. Please try again.")
+        try:
+            return validate_email(email)
+        except ValueError as e:
+            print(e)
             continue
-        else:
-            return email
+
+
+def validate_date(
+    date: str,
+    min_date: datetime,
+    max_date: datetime,
+    min_date_message: Union[str, None] = None,
+    max_date_message: Union[str, None] = None,
+) -> datetime:
+    """
+    Parse a DD-MM-YYYY date within the given bounds and return it, raising
+    a ValueError with a message for the user otherwise
+    """
+    try:
+        valid_date = datetime.strptime(date, "%d-%m-%Y")
+    except ValueError:
+        raise ValueError("Invalid date format. Please try again.")
+
+    if valid_date > max_date:
+        raise ValueError(
+            max_date_message
+            if max_date_message
+            else f"Input date must be before {max_date.date()}, please try again."
+        )
+    elif valid_date < min_date:
+        raise ValueError(
+            min_date_message
+            if min_date_message
+            else f"Input date must be after {min_date.date()}, please try again."
+        )
+    return valid_date
 
 
 def get_valid_date(
@@ -39,25 +83,11 @@ def get_valid_date(
         if allow_blank and not date:
             return None
         try:
-            valid_date = datetime.strptime(date, "%d-%m-%Y")
-            if valid_date > max_date:
-                print(
-                    max_date_message
-                    if max_date_message
-                    else f"Input date must be before {max_date.date()}, please try again."
-                )
-                continue
-            elif valid_date < min_date:
-                print(
-                    min_date_message
-                    if min_date_message
-                    else f"Input date must be after {min_date.date()}, please try again."
-                )
-                continue
-            else:
-                return valid_date
-        except Exception:
-            print("Invalid date format. Please try again.")
+            return validate_date(
+                date, min_date, max_date, min_date_message, max_date_message
+            )
+        except ValueError as e:
+            print(e)
             continue
 
 
@@ -76,6 +106,35 @@ def get_valid_yes_or_no(prompt: str = "Your input (Y/N): ") -> bool:
             continue
 
 
+def validate_string(
+    value: str,
+    max_len: int = 250,
+    min_len: int = 0,
+    is_name: bool = False,
+    allow_spaces: bool = True,
+) -> str:
+    """
+    Check a string against the length, name and spacing rules used by
+    get_valid_string and return it, raising a ValueError with a message
+    for the user otherwise
+    """
+    if len(value) < min_len or len(value) > max_len:
+        raise ValueError(
+            f"Invalid input. Please try again. Input must be between {min_len} and {max_len} characters."
+        )
+    if is_name:
+        # Check that the name only contains letters, spaces, hyphens, and apostrophes
+        if NAME_PATTERN.match(value) is None:
+            raise ValueError(
+                "Your input contains invalid characters. Please try again."
+            )
+        if value.count(" ") > 3:
+            raise ValueError("You can't input more than three names. Please try again.")
+    elif not allow_spaces and " " in value:
+        raise ValueError("Your input can't contain spaces. Please try again.")
+    return value
+
+
 def get_valid_string(
     prompt: str,
     max_len: int = 250,
@@ -92,31 +151,10 @@ def get_valid_string(
     """
     while True:
         value = input(prompt)
-        if len(value) >= min_len and len(value) <= max_len:
-            if is_name:
-                # Check that the name only contains letters, spaces, hyphens, and apostrophes
-                if re.match(
-                    r"^[A-Za-zÀ-ÖØ-öø-ÿĀ-ž]+([ '-][A-Za-zÀ-ÖØ-öø-ÿĀ-ž]+)*$", value
-                ):
-                    if value.count(" ") <= 3:
-                        return value
-                    else:
-                        print(
-                            "You can't input more than three names. Please try again."
-                        )
-                else:
-                    print("Your input contains invalid characters. Please try again.")
-                    continue
-            else:
-                if allow_spaces or " " not in value:
-                    return value
-                else:
-                    print("Your input can't contain spaces. Please try again.")
-                    continue
-        else:
-            print(
-                f"Invalid input. Please try again. Input must be between {min_len} and {max_len} characters."
-            )
+        try:
+            return validate_string(value, max_len, min_len, is_name, allow_spaces)
+        except ValueError as e:
+            print(e)
             continue
 
 
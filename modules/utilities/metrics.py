@@ -0,0 +1,214 @@
+"""
+Operational counters of a running Breeze deployment, in the Prometheus
+text format.
+
+The metrics are defined here and updated by the flows, services and the
+database layer. They are off, and cost one attribute check per update,
+unless BREEZE_METRICS is set: 1 writes them to metrics.prom, any other
+value names the file. The file is rewritten every BREEZE_METRICS_INTERVAL
+seconds (15) and on exit, atomically, so node_exporter's textfile
+collector can pick it up. The HTTP API also serves them on GET /metrics
+when started with --metrics (see modules/api.py).
+
+    breeze_logins_total{result}              success, failure
+    breeze_signups_total{result}             success, failure
+    breeze_mood_entries_total{action}        added, updated
+    breeze_journal_entries_total
+    breeze_appointment_requests_total{result}  requested, failed
+    breeze_emails_total{result}              sent, failed
+    breeze_email_queue_depth                 emails waiting on the mail server
+    breeze_email_send_seconds                histogram
+    breeze_db_connections_open
+    breeze_db_lock_waits_total{lock}         pool, writer
+    breeze_db_lock_wait_seconds_total{lock}
+    breeze_db_lock_timeouts_total            "database is locked" errors
+    breeze_cache_requests_total{cache,result}  hit, miss
+    breeze_api_requests_total{method,status}
+"""
+
+import atexit
+import os
+import threading
+import time
+from typing import Union
+
+# Unset or 0 turns metrics off, 1 writes them to the default file
+METRICS_FILE = os.environ.get("BREEZE_METRICS", "")
+if METRICS_FILE in ("0", "1"):
+    METRICS_FILE = "metrics.prom" if METRICS_FILE == "1" else ""
+WRITE_INTERVAL = float(os.environ.get("BREEZE_METRICS_INTERVAL", "15"))
+
+
+def escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple[str, ...], values: tuple) -> str:
+    labels = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if value == int(value) else repr(value)
+
+
+class Registry:
+    """The metrics of the process, and whether they are being kept"""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.metrics: list["Metric"] = []
+        self.lock = threading.Lock()
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for metric in self.metrics:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        # Written aside and renamed, so readers never see half a file
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            file.write(self.render())
+        os.replace(temporary, path)
+
+    def enable(self, path: Union[str, None] = None) -> None:
+        """Starts keeping the metrics and, given a path, writing them to it"""
+        self.enabled = True
+        if not path:
+            return
+
+        def write_periodically() -> None:
+            while True:
+                time.sleep(WRITE_INTERVAL)
+                try:
+                    self.write(path)
+                except OSError as e:
+                    print(f"Could not write the metrics to {path}: {e}")
+
+        threading.Thread(target=write_periodically, daemon=True).start()
+        atexit.register(self.write, path)
+
+
+registry = Registry()
+
+
+class Metric:
+    kind: str
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        # Values by the values of their labels, in the order of self.labels
+        self.values: dict[tuple, float] = {} if labels else {(): 0}
+        registry.metrics.append(self)
+
+    def key(self, labels: dict[str, object]) -> tuple:
+        return tuple(labels[name] for name in self.labels)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{format_labels(self.labels, key)} {format_number(value)}"
+            for key, value in self.values.items()
+        ]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        if not registry.enabled:
+            return
+        key = self.key(labels)
+        with registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: object) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...]) -> None:
+        super().__init__(name, help)
+        self.buckets = (*buckets, float("inf"))
+        self.counts = [0] * len(self.buckets)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        if not registry.enabled:
+            return
+        with registry.lock:
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[index] += 1
+                    break
+            self.total += value
+
+    def samples(self) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(
+                f'{self.name}_bucket{{le="{format_number(bound)}"}} {cumulative}'
+            )
+        lines.append(f"{self.name}_sum {format_number(self.total)}")
+        lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+
+LOGINS = Counter("breeze_logins_total", "Login attempts.", ("result",))
+SIGNUPS = Counter("breeze_signups_total", "Registrations.", ("result",))
+MOOD_ENTRIES = Counter(
+    "breeze_mood_entries_total", "Moods of the day recorded.", ("action",)
+)
+JOURNAL_ENTRIES = Counter("breeze_journal_entries_total", "Journal entries added.")
+APPOINTMENT_REQUESTS = Counter(
+    "breeze_appointment_requests_total", "Appointments requested.", ("result",)
+)
+EMAILS = Counter("breeze_emails_total", "Emails sent.", ("result",))
+# Emails are sent as they are written, so the queue is those still sending
+EMAIL_QUEUE_DEPTH = Gauge(
+    "breeze_email_queue_depth", "Emails waiting on the mail server."
+)
+EMAIL_SEND_SECONDS = Histogram(
+    "breeze_email_send_seconds",
+    "Time taken to send an email.",
+    (0.25, 0.5, 1, 2, 5, 10, 30),
+)
+DB_CONNECTIONS_OPEN = Gauge("breeze_db_connections_open", "Open database connections.")
+DB_LOCK_WAITS = Counter(
+    "breeze_db_lock_waits_total",
+    "Waits for a pooled connection or the API's writer lock.",
+    ("lock",),
+)
+DB_LOCK_WAIT_SECONDS = Counter(
+    "breeze_db_lock_wait_seconds_total", "Time spent in those waits.", ("lock",)
+)
+# SQLite waits for its own lock silently, only giving up is seen
+DB_LOCK_TIMEOUTS = Counter(
+    "breeze_db_lock_timeouts_total", "Statements that gave up on SQLite's lock."
+)
+CACHE_REQUESTS = Counter(
+    "breeze_cache_requests_total", "Cache lookups.", ("cache", "result")
+)
+API_REQUESTS = Counter(
+    "breeze_api_requests_total", "HTTP API requests.", ("method", "status")
+)
+
+if METRICS_FILE:
+    registry.enable(METRICS_FILE)
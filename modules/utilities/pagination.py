@@ -0,0 +1,91 @@
+from typing import Any, Union
+
+from database.setup import Database
+
+
+class KeysetPaginator:
+    """
+    Pages through a query ordered by (date, key), fetching each page with
+    a seek past the last row of the previous one rather than an OFFSET.
+
+    With an index on the filter columns and date, every page costs the same
+    no matter how far into the history it is, and only one page of rows is
+    held in memory at a time.
+    """
+
+    database: Database
+    page_size: int
+    page: list[dict[str, Any]]
+    has_next: bool
+
+    def __init__(
+        self,
+        database: Database,
+        columns: str,
+        source: str,
+        conditions: str,
+        params: Union[list, tuple] = (),
+        date_column: str = "date",
+        key_column: str = "entry_id",
+        page_size: int = 10,
+        after: Union[tuple[str, int], None] = None,
+    ):
+        self.database = database
+        self.page_size = page_size
+        self.params = list(params)
+        self.date_column = date_column
+        self.key_column = key_column
+
+        # The raw date string is selected for the seek, as the datetime the
+        # converter returns doesn't always match the stored format
+        self.query = (
+            f"SELECT {columns}, CAST({date_column} AS TEXT) AS page_date, "
+            + f"{key_column} AS page_key FROM {source} WHERE {conditions}"
+        )
+
+        # Keys of the last row before each page, None for the first page.
+        # Stateless callers (see modules/api.py) start after a given row.
+        self.page_starts: list[Union[tuple[str, int], None]] = [after]
+        self.page = self.fetch_page(after)
+
+    def fetch_page(self, after: Union[tuple[str, int], None]) -> list[dict[str, Any]]:
+        query = self.query
+        params = list(self.params)
+        if after:
+            query += f" AND ({self.date_column}, {self.key_column}) > (?, ?)"
+            params.extend(after)
+        query += f" ORDER BY {self.date_column}, {self.key_column} LIMIT ?"
+        # Fetch one extra row to know whether there is a next page
+        params.append(self.page_size + 1)
+
+        rows = self.database.cursor.execute(query, params).fetchall()
+        self.has_next = len(rows) > self.page_size
+        return rows[: self.page_size]
+
+    @property
+    def page_number(self) -> int:
+        return len(self.page_starts)
+
+    @property
+    def has_previous(self) -> bool:
+        return len(self.page_starts) > 1
+
+    @property
+    def next_start(self) -> Union[tuple[str, int], None]:
+        """Keys of the last row of the page, which the next page starts after"""
+        if self.has_next:
+            return (self.page[-1]["page_date"], self.page[-1]["page_key"])
+        return None
+
+    def next_page(self) -> list[dict[str, Any]]:
+        if self.has_next:
+            last = self.page[-1]
+            self.page_starts.append((last["page_date"], last["page_key"]))
+            self.page = self.fetch_page(self.page_starts[-1])
+        return self.page
+
+    def previous_page(self) -> list[dict[str, Any]]:
+        if self.has_previous:
+            self.page_starts.pop()
+            self.page = self.fetch_page(self.page_starts[-1])
+        return self.page
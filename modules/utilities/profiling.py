@@ -0,0 +1,236 @@
+"""
+Profiling of terminal sessions, to find out why a screen is slow.
+
+    python main.py --profile [--flow NAME ...] [--profiler both]
+                   [--interval-ms 5] [--memory] [--output-dir profiles]
+
+Without --flow the whole session is profiled, otherwise only the calls of
+the named flows, by the names tracing uses (see tracing.py), such as
+Clinician.flow_patient_dashboard or Admin.view_table. Time spent waiting
+in input() is left out, so the profile shows what the user waited for.
+
+When the session ends, the profiles are written to the output directory:
+    <stamp>.pstats      cProfile, read with `python -m pstats` or snakeviz
+    <stamp>.collapsed   sampled stacks, one "a;b;c count" line per stack,
+                        for flamegraph.pl or speedscope
+    <stamp>.memory.txt  with --memory, the peak traced memory of each
+                        profiled call and the allocation sites at the
+                        highest peak, from tracemalloc
+
+tracemalloc slows Python down a lot, so the times measured with --memory
+are only comparable with each other.
+"""
+
+import argparse
+import builtins
+import cProfile
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any, Union
+
+from modules.utilities.tracing import call_hooks, traced_names
+
+PROFILERS = ("both", "cprofile", "sampling")
+# Frames kept by tracemalloc for each allocation
+MEMORY_FRAMES = 10
+
+
+class SessionProfiler:
+    """
+    Profiles the calls it is started and stopped around, on the thread that
+    starts it. Nested calls are part of the outermost one.
+    """
+
+    def __init__(self, profiler: str, interval: float, memory: bool) -> None:
+        self.interval = interval
+        self.memory = memory
+        self.profile = (
+            cProfile.Profile(self.busy_clock) if profiler != "sampling" else None
+        )
+        self.sampling = profiler != "cprofile"
+        self.stacks: Counter[str] = Counter()
+        self.depth = 0
+        self.calls = 0
+        self.thread_id = threading.get_ident()
+        # The clock stops while input() waits
+        self.waited = 0.0
+        self.waiting_since: Union[float, None] = None
+        self.finished = threading.Event()
+        # Peak traced bytes of each call, and the allocations at the highest
+        self.peaks: list[tuple[str, int]] = []
+        self.peak_snapshot: Union[tracemalloc.Snapshot, None] = None
+
+    def busy_clock(self) -> float:
+        if self.waiting_since is not None:
+            return self.waiting_since - self.waited
+        return time.perf_counter() - self.waited
+
+    def install(self) -> None:
+        original_input = builtins.input
+
+        def paused_input(prompt: object = "") -> str:
+            if self.waiting_since is not None:
+                return original_input(prompt)
+            self.waiting_since = time.perf_counter()
+            try:
+                return original_input(prompt)
+            finally:
+                self.waited += time.perf_counter() - self.waiting_since
+                self.waiting_since = None
+
+        builtins.input = paused_input
+        if self.sampling:
+            threading.Thread(target=self.sample, daemon=True).start()
+        if self.memory:
+            tracemalloc.start(MEMORY_FRAMES)
+
+    def start(self) -> None:
+        self.depth += 1
+        if self.depth > 1:
+            return
+        self.calls += 1
+        if self.memory:
+            tracemalloc.reset_peak()
+        if self.profile:
+            self.profile.enable()
+
+    def stop(self, name: str) -> None:
+        self.depth -= 1
+        if self.depth:
+            return
+        if self.profile:
+            self.profile.disable()
+        if self.memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            if not self.peaks or peak > max(size for _, size in self.peaks):
+                self.peak_snapshot = tracemalloc.take_snapshot()
+            self.peaks.append((name, peak))
+
+    def around(self, name: str) -> Callable[[Callable[[], Any]], Any]:
+        """A hook for tracing that profiles the calls of a flow"""
+
+        def hook(call: Callable[[], Any]) -> Any:
+            self.start()
+            try:
+                return call()
+            finally:
+                self.stop(name)
+
+        return hook
+
+    def sample(self) -> None:
+        """Counts the stacks of the profiled thread while it is busy"""
+        while not self.finished.wait(self.interval):
+            if not self.depth or self.waiting_since is not None:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_qualname} ({os.path.basename(code.co_filename)})"
+                )
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, directory: str) -> list[str]:
+        """Writes the profiles, returning the paths written"""
+        self.finished.set()
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.join(directory, f"{datetime.now():%Y%m%d-%H%M%S}")
+        written = []
+
+        if self.profile:
+            self.profile.dump_stats(f"{stem}.pstats")
+            written.append(f"{stem}.pstats")
+        if self.stacks:
+            with open(f"{stem}.collapsed", "w") as file:
+                file.writelines(
+                    f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+                )
+            written.append(f"{stem}.collapsed")
+        if self.peaks:
+            with open(f"{stem}.memory.txt", "w") as file:
+                file.write("Peak traced memory of each profiled call:\n")
+                file.writelines(
+                    f"{peak / 1024:12.1f} KB  {name}\n" for name, peak in self.peaks
+                )
+                file.write("\nAllocations alive at the end of the highest call:\n")
+                statistics = self.peak_snapshot.statistics("traceback")
+                for statistic in statistics[:20]:
+                    file.write(
+                        f"\n{statistic.size / 1024:.1f} KB in {statistic.count} blocks\n"
+                    )
+                    file.writelines(
+                        f"{line}\n"
+                        for line in statistic.traceback.format(limit=MEMORY_FRAMES)
+                    )
+            written.append(f"{stem}.memory.txt")
+        return written
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="main.py --profile",
+        description="Profile a terminal session of Breeze.",
+    )
+    parser.add_argument("--profile", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--flow",
+        action="append",
+        help="Only profile the calls of this flow, such as Admin.view_table "
+        + "(can be given more than once)",
+    )
+    parser.add_argument("--profiler", choices=PROFILERS, default="both")
+    parser.add_argument(
+        "--interval-ms", type=float, default=5, help="Time between stack samples"
+    )
+    parser.add_argument(
+        "--memory", action="store_true", help="Record allocation peaks (slow)"
+    )
+    parser.add_argument("--output-dir", default="profiles")
+    return parser
+
+
+def main(argv: list[str], run_session: Callable[[], None]) -> int:
+    """Runs a terminal session under the profilers the arguments ask for"""
+    args = build_parser().parse_args(argv)
+    profiler = SessionProfiler(args.profiler, args.interval_ms / 1000, args.memory)
+    profiler.install()
+
+    try:
+        if args.flow:
+            for name in args.flow:
+                call_hooks[name] = profiler.around(name)
+            run_session()
+        else:
+            profiler.start()
+            try:
+                run_session()
+            finally:
+                profiler.stop("session")
+    finally:
+        # Also when the session crashes, as that may be what's being looked into
+        written = profiler.write(args.output_dir)
+    if args.flow and not profiler.calls:
+        print(
+            f"\n{', '.join(args.flow)} didn't run, so nothing was profiled. "
+            + f"Flows that can be profiled: {', '.join(traced_names)}",
+            file=sys.stderr,
+        )
+        return 1
+    profiled = (
+        f"{profiler.calls} calls of {', '.join(args.flow)}"
+        if args.flow
+        else "the session"
+    )
+    print(f"\nProfiled {profiled}, written to:", file=sys.stderr)
+    for path in written:
+        print(f"  {path}", file=sys.stderr)
+    return 0
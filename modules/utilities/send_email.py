@@ -1,7 +1,10 @@
 import smtplib
 import ssl
+import time
 from email.message import EmailMessage
 
+from modules.utilities.metrics import EMAIL_QUEUE_DEPTH, EMAIL_SEND_SECONDS, EMAILS
+
 
 def send_email(recipient: str, subject: str, body: str) -> bool:
     """
@@ -16,6 +19,8 @@ def send_email(recipient: str, subject: str, body: str) -> bool:
     server = "smtp.gmail.com"
     port = "465"
 
+    EMAIL_QUEUE_DEPTH.inc()
+    started = time.perf_counter()
     try:
         # Create message
         message = EmailMessage()
@@ -30,8 +35,13 @@ def send_email(recipient: str, subject: str, body: str) -> bool:
             server.login(username, password)
             server.send_message(message)
 
+        EMAILS.inc(result="sent")
         return True
     except Exception as e:
         print(f"Your email didn't send: {e}")
+        EMAILS.inc(result="failed")
         # Return False as email was not sent
         return False
+    finally:
+        EMAIL_QUEUE_DEPTH.dec()
+        EMAIL_SEND_SECONDS.observe(time.perf_counter() - started)
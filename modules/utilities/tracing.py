@@ -0,0 +1,294 @@
+"""
+Tracing of how long each screen takes to respond, leaving out the time
+spent waiting for the user to type.
+
+Screens are the methods decorated with @traced, and blocks run in a
+trace_span. When BREEZE_TRACE names a file (or is 1, for traces.jsonl),
+every span is appended to it as a line of JSON when it ends:
+
+    {"span": "Patient.mood_of_the_day", "parent": null,
+     "start": "2024-01-01T12:00:00", "wall_ms": 5312.4, "input_ms": 5290.1,
+     "busy_ms": 22.3, "sql_ms": 3.1, "queries": 4, "rows": 2, "bytes": 96,
+     "statements": [["SELECT ...", 2, 2.5], ...]}
+
+busy_ms is the wall time less the time spent in input(). The SQL figures
+come from database/instrumentation.py, which tracing turns on, and cover
+the statements run by the span and the spans within it. "statements" are
+the ones that took the longest. The file rotates once it reaches
+BREEZE_TRACE_MAX_KB (1024), keeping 3 old files.
+
+Show the slowest screens and the queries behind them with:
+    python -m modules.utilities.tracing [traces.jsonl] [--top 10] [--span NAME]
+"""
+
+import builtins
+import json
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import cache, partial, wraps
+from typing import Any, Union
+
+# Unset or 0 turns tracing off, 1 traces to the default file
+TRACE_FILE = os.environ.get("BREEZE_TRACE", "")
+if TRACE_FILE in ("0", "1"):
+    TRACE_FILE = "traces.jsonl" if TRACE_FILE == "1" else ""
+# Statements written with each span, those that took the longest
+STATEMENTS_KEPT = 5
+
+# The spans open in the current thread, innermost last
+_local = threading.local()
+_original_input = builtins.input
+# Names of the traced functions, and functions to run their calls through
+# by name (see modules/utilities/profiling.py)
+traced_names: list[str] = []
+call_hooks: dict[str, Callable[[Callable[[], Any]], Any]] = {}
+
+
+@dataclass
+class Span:
+    name: str
+    parent: Union[str, None]
+    start: datetime = field(default_factory=datetime.now)
+    started: float = field(default_factory=time.perf_counter)
+    input_wait: float = 0
+    sql_time: float = 0
+    queries: int = 0
+    rows: int = 0
+    size: int = 0
+    # Calls and seconds of each statement
+    statements: dict[str, list] = field(default_factory=dict)
+
+    def to_record(self, wall: float) -> dict[str, Any]:
+        slowest = sorted(
+            self.statements.items(), key=lambda item: item[1][1], reverse=True
+        )[:STATEMENTS_KEPT]
+        return {
+            "span": self.name,
+            "parent": self.parent,
+            "start": self.start.isoformat(timespec="seconds"),
+            "wall_ms": round(wall * 1000, 2),
+            "input_ms": round(self.input_wait * 1000, 2),
+            "busy_ms": round((wall - self.input_wait) * 1000, 2),
+            "sql_ms": round(self.sql_time * 1000, 2),
+            "queries": self.queries,
+            "rows": self.rows,
+            "bytes": self.size,
+            "statements": [
+                [statement, calls, round(seconds * 1000, 2)]
+                for statement, (calls, seconds) in slowest
+            ],
+        }
+
+
+def open_spans() -> list[Span]:
+    if not hasattr(_local, "spans"):
+        _local.spans = []
+    return _local.spans
+
+
+def on_query(statement: str, elapsed: float, rows: int, size: int) -> None:
+    """Adds an execution to every span open in the thread that ran it"""
+    for span in getattr(_local, "spans", ()):
+        span.sql_time += elapsed
+        span.queries += 1
+        span.rows += rows
+        span.size += size
+        totals = span.statements.setdefault(statement, [0, 0.0])
+        totals[0] += 1
+        totals[1] += elapsed
+
+
+def traced_input(prompt: object = "") -> str:
+    """input(), with the time spent waiting taken off the open spans"""
+    started = time.perf_counter()
+    try:
+        return _original_input(prompt)
+    finally:
+        waited = time.perf_counter() - started
+        for span in getattr(_local, "spans", ()):
+            span.input_wait += waited
+
+
+@cache
+def enable() -> None:
+    """Starts timing input() and listening to queries, once"""
+    from database.instrumentation import get_query_stats
+
+    builtins.input = traced_input
+    get_query_stats().listeners.append(on_query)
+
+
+@cache
+def get_trace_log():
+    # logging is only imported when tracing
+    import logging
+    from logging.handlers import RotatingFileHandler
+
+    handler = RotatingFileHandler(
+        TRACE_FILE,
+        maxBytes=int(os.environ.get("BREEZE_TRACE_MAX_KB", "1024")) * 1024,
+        backupCount=3,
+        delay=True,
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log = logging.getLogger("breeze.trace")
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    return log
+
+
+@contextmanager
+def trace_span(name: str) -> Iterator[None]:
+    """Traces a block as a span with the given name, if tracing is on"""
+    if not TRACE_FILE:
+        yield
+        return
+
+    enable()
+    spans = open_spans()
+    span = Span(name, spans[-1].name if spans else None)
+    spans.append(span)
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - span.started
+        spans.pop()
+        get_trace_log().info(json.dumps(span.to_record(wall)))
+
+
+def traced(function: Callable) -> Callable:
+    """Traces every call of a function or method as a span named after it"""
+    name = function.__qualname__
+    traced_names.append(name)
+
+    def call(*args, **kwargs):
+        if not TRACE_FILE:
+            return function(*args, **kwargs)
+        with trace_span(name):
+            return function(*args, **kwargs)
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        hook = call_hooks.get(name)
+        if hook:
+            return hook(partial(call, *args, **kwargs))
+        return call(*args, **kwargs)
+
+    return wrapper
+
+
+def read_spans(path: str) -> Iterator[dict[str, Any]]:
+    """The spans in a trace file and its rotated copies, oldest first"""
+    for suffix in (".3", ".2", ".1", ""):
+        if not os.path.exists(path + suffix):
+            continue
+        with open(path + suffix) as trace:
+            for line in trace:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash
+                    continue
+
+
+def percentile(values: list[float], percent: int) -> float:
+    import statistics
+
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def decimals(digits: int) -> Callable[[float], str]:
+    return lambda value: f"{value:.{digits}f}"
+
+
+def print_report(path: str, top: int, only: Union[str, None] = None) -> None:
+    from modules.utilities.display_utils import TableColumn, render_table
+
+    spans_by_name: dict[str, list[dict[str, Any]]] = {}
+    for span in read_spans(path):
+        if not only or span["span"] == only:
+            spans_by_name.setdefault(span["span"], []).append(span)
+    if not spans_by_name:
+        print(f"No spans in {path}.")
+        return
+
+    screens = []
+    for name, spans in spans_by_name.items():
+        busy = [span["busy_ms"] for span in spans]
+        screens.append(
+            (
+                name,
+                len(spans),
+                percentile(busy, 50),
+                percentile(busy, 95),
+                max(busy),
+                sum(span["sql_ms"] for span in spans) / len(spans),
+                sum(span["queries"] for span in spans) / len(spans),
+                sum(span["bytes"] for span in spans) / len(spans) / 1024,
+            )
+        )
+    screens.sort(key=lambda screen: screen[3], reverse=True)
+
+    print("Screens by p95 busy time (ms, averages per call):\n")
+    columns = [
+        TableColumn("Span", max_width=50),
+        TableColumn("Calls", align="right"),
+        TableColumn("p50", decimals(1), "right"),
+        TableColumn("p95", decimals(1), "right"),
+        TableColumn("Max", decimals(1), "right"),
+        TableColumn("SQL", decimals(1), "right"),
+        TableColumn("Queries", decimals(1), "right"),
+        TableColumn("KB", decimals(1), "right"),
+    ]
+    for line in render_table(screens, columns):
+        print(line)
+
+    statement_columns = [
+        TableColumn("Statement", max_width=90),
+        TableColumn("Calls", decimals(1), "right"),
+        TableColumn("ms", decimals(2), "right"),
+    ]
+    for name, *_ in screens[:top]:
+        spans = spans_by_name[name]
+        totals: dict[str, list[float]] = {}
+        for span in spans:
+            for statement, calls, ms in span["statements"]:
+                total = totals.setdefault(statement, [0, 0])
+                total[0] += calls
+                total[1] += ms
+        if not totals:
+            continue
+        print(f"\nQueries behind {name} (per call):\n")
+        rows = sorted(
+            (
+                (statement, calls / len(spans), ms / len(spans))
+                for statement, (calls, ms) in totals.items()
+            ),
+            key=lambda row: row[2],
+            reverse=True,
+        )
+        for line in render_table(rows[:STATEMENTS_KEPT], statement_columns):
+            print(line)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Show the slowest screens in a Breeze trace file."
+    )
+    parser.add_argument("file", nargs="?", default=TRACE_FILE or "traces.jsonl")
+    parser.add_argument(
+        "--top", type=int, default=5, help="Screens whose queries are shown"
+    )
+    parser.add_argument("--span", help="Only this span")
+    args = parser.parse_args()
+    print_report(args.file, args.top, args.span)